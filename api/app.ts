@@ -6,9 +6,21 @@ import fs from 'fs';
 import http from 'http';
 import https from 'https';
 import { spawn, type ChildProcessWithoutNullStreams } from 'child_process';
+import readline from 'readline';
+import type { Readable } from 'stream';
 import archiver from 'archiver';
 import { v4 as uuidv4 } from 'uuid';
 import cors from 'cors';
+import { GeneratorService } from './generatorService.js';
+import { JobScheduler, estimateJobCost, type Admission, type JobCost, type JobPriority } from './scheduler.js';
+import {
+    TELEMETRY_FD,
+    emptyTelemetry,
+    parseTelemetryLine,
+    recordTelemetry,
+    summarizeTelemetry,
+    type JobTelemetry
+} from './telemetry.js';
 
 const app = express();
 
@@ -101,6 +113,15 @@ type JobSettings = {
   formats?: Record<string, string>;
   musicFile?: string;
   textOverlay?: TextOverlay;
+  // 'preview' renders ~360p at reduced fps with ultrafast encoding
+  renderProfile?: string;
+  previewResolution?: number;
+  previewFps?: number;
+  // autoFinal previews also cache full-size preprocessed frames for the final render
+  warmFinalFrames?: boolean;
+  // Granted by the scheduler when the job starts
+  cpuBudget?: number;
+  memoryBudgetMB?: number;
 };
 
 interface Job {
@@ -116,40 +137,46 @@ interface Job {
   error?: string;
   process?: ChildProcessWithoutNullStreams; 
   progress?: Record<string, number>; // Store progress per format
+  // Stage timings, encoders, memory and cache hit rates reported by the generator
+  telemetry?: JobTelemetry;
+  priority: JobPriority;
+  owner: string;
+  cost: JobCost;
+  startedAt?: number;
+  finishedAt?: number;
+  admission?: Admission;
+  mode: 'preview' | 'final';
+  // Preview jobs: queue the full-quality render once the preview is done
+  autoFinal?: boolean;
+  finalRenderProfile?: string;
+  finalJobId?: string;
+  previewJobId?: string;
 }
 
 const jobs: Record<string, Job> = {};
-const queue: string[] = [];
-let isProcessing = false;
 
-// Queue Processor
-async function processQueue() {
-    console.log(`[DEBUG] processQueue called. isProcessing: ${isProcessing}, queue: ${queue.length}, queue contents: ${queue.join(', ')}`);
-    if (isProcessing || queue.length === 0) return;
-    
-    const jobId = queue.shift();
-    if (!jobId) return;
-    
-    const job = jobs[jobId];
-    if (!job || job.status === 'canceled') {
-        processQueue();
-        return;
-    }
-
-    isProcessing = true;
-    job.status = 'running';
-    job.progress = {
-        '9x16': 0,
-        '1x1': 0,
-        '4x5': 0,
-        '16x9': 0
-    };
-    
-    // Create output dir
-    if (!fs.existsSync(job.outputDir)) fs.mkdirSync(job.outputDir, { recursive: true });
-
-    console.log(`Starting job ${jobId}`);
+// Several jobs run at once when their estimated cores/memory fit the machine
+// (SCHEDULER_CORES, SCHEDULER_MEMORY_MB, SCHEDULER_MAX_JOBS override the defaults)
+const envNumber = (name: string) => {
+    const value = Number(process.env[name]);
+    return Number.isFinite(value) && value > 0 ? value : undefined;
+};
+// Round-robin owner, derived on the server: an identity set by auth middleware
+// (req.user) when there is one, otherwise the client address
+const requestOwner = (req: Request) => {
+    const user = (req as Request & { user?: { id?: unknown } }).user;
+    if (user && user.id !== undefined && user.id !== null) return `user:${String(user.id)}`;
+    return `ip:${req.ip || req.socket.remoteAddress || 'unknown'}`;
+};
+const scheduler = new JobScheduler({
+    cores: envNumber('SCHEDULER_CORES'),
+    memoryMB: envNumber('SCHEDULER_MEMORY_MB'),
+    maxJobs: envNumber('SCHEDULER_MAX_JOBS'),
+    maxWaitMs: envNumber('SCHEDULER_MAX_WAIT_MS')
+});
 
+// Generator command: bundled exe in production, python script in dev
+function resolveGeneratorCommand(): { cmd: string; baseArgs: string[] } {
     // Determine python command (python or python3) or exe
     const isWin = process.platform === 'win32';
     
@@ -168,9 +195,6 @@ async function processQueue() {
     console.log("Bundled Exe Prod:", bundledExeProd);
     console.log("Resources Path:", resourcesPath);
 
-    let cmd = '';
-    let args: string[] = [];
-    
     // Script path for dev mode
     const scriptPath = path.join(process.cwd(), 'api', 'generator', 'generator.py');
 
@@ -178,51 +202,191 @@ async function processQueue() {
 
     if (!isDev && fs.existsSync(bundledExe)) {
         console.log("Using local bundled generator.exe");
-        cmd = bundledExe;
-        args = [
-            '--images', ...job.images,
-            '--id', job.propertyId,
-            '--output', job.outputDir,
-            '--settings', JSON.stringify(job.settings)
-        ];
-    } else if (!isDev && fs.existsSync(bundledExeProd)) {
-         console.log("Using prod bundled generator.exe");
-         cmd = bundledExeProd;
-         args = [
-            '--images', ...job.images,
-            '--id', job.propertyId,
-            '--output', job.outputDir,
-            '--settings', JSON.stringify(job.settings)
-        ];
-    } else {
-        // Fallback to python script
-        console.log("Using python script");
-        
-        // Use full Python path on Windows
-        const pythonPath = isWin 
-            ? 'C:\\Users\\User\\AppData\\Local\\Programs\\Python\\Python311\\python.exe'
-            : 'python3';
-        
-        // If we are here in prod, it means generator.exe is missing!
-        console.error("CRITICAL: Generator executable not found!");
-        console.log("Job images:", job.images);
-        console.log("Job images count:", job.images.length);
-        
-        // Fix: pass images as comma-separated or ensure proper array spreading
-        args = [
-            scriptPath,
-            '--images', ...job.images,
-            '--id', job.propertyId,
-            '--output', job.outputDir,
-            '--settings', JSON.stringify(job.settings)
-        ];
-        cmd = pythonPath;
+        return { cmd: bundledExe, baseArgs: [] };
+    }
+    if (!isDev && fs.existsSync(bundledExeProd)) {
+        console.log("Using prod bundled generator.exe");
+        return { cmd: bundledExeProd, baseArgs: [] };
+    }
+    // Fallback to python script
+    console.log("Using python script");
+    
+    // Use full Python path on Windows
+    const pythonPath = isWin 
+        ? 'C:\\Users\\User\\AppData\\Local\\Programs\\Python\\Python311\\python.exe'
+        : 'python3';
+    
+    // If we are here in prod, it means generator.exe is missing!
+    console.error("CRITICAL: Generator executable not found!");
+    return { cmd: pythonPath, baseArgs: [scriptPath] };
+}
+
+// Warm generator service: one long-lived python process keeps imports, fonts
+// and its worker pool between jobs. GENERATOR_MODE=spawn starts a fresh
+// generator process per job instead.
+const useGeneratorService = process.env.GENERATOR_MODE !== 'spawn';
+let generatorService: GeneratorService | undefined;
+
+function getGeneratorService(): GeneratorService {
+    if (!generatorService) {
+        const { cmd, baseArgs } = resolveGeneratorCommand();
+        generatorService = new GeneratorService(cmd, [...baseArgs, '--jobs', String(scheduler.maxJobs)]);
+    }
+    return generatorService;
+}
+
+// Store the generator result on the job and zip its files
+async function finishJob(job: Job, result: { status?: string; files?: string[]; message?: string } | null) {
+    try {
+        if (result && result.status === 'success') {
+            job.files = result.files;
+            
+            // Create ZIP
+            const zipName = `${job.propertyId}_${job.mode === 'preview' ? 'preview' : 'output'}.zip`;
+            const zipPath = path.join(job.outputDir, zipName);
+            
+            await createZip(job.outputDir, job.files!, zipPath);
+            job.zipFile = zipPath;
+            job.status = 'done';
+            if (job.mode === 'preview' && job.autoFinal) queueFinalRender(job);
+        } else {
+            job.status = 'error';
+            job.error = result?.message || 'Unknown python error (no JSON result)';
+        }
+    } catch (e) {
+        job.status = 'error';
+        job.error = 'Failed to parse generator output: ' + e;
+    }
+}
+
+function runWithService(job: Job) {
+    console.log(`Submitting job ${job.id} to generator service (${job.images.length} images)`);
+    getGeneratorService().submit({
+        id: job.id,
+        images: job.images,
+        propertyId: job.propertyId,
+        output: job.outputDir,
+        settings: job.settings
+    }, {
+        onProgress: (fmt, pct) => {
+            if (job.progress && job.progress[fmt] !== undefined) {
+                job.progress[fmt] = pct;
+            }
+        },
+        onTelemetry: (event) => {
+            if (job.telemetry) recordTelemetry(job.telemetry, event);
+        },
+        onResult: async (event) => {
+            if (job.status !== 'canceled') {
+                await finishJob(job, event);
+            }
+            releaseJob(job);
+        }
+    });
+}
+
+// Full-quality render of a finished preview: same uploads and settings, normal priority.
+// The preview cached full-size frames (warmFinalFrames), so its preprocessing is cache hits.
+function queueFinalRender(preview: Job) {
+    const finalId = uuidv4();
+    // The scheduler grants the final its own budget when it starts
+    const settings: JobSettings = {
+        ...preview.settings,
+        renderProfile: preview.finalRenderProfile,
+        warmFinalFrames: undefined,
+        cpuBudget: undefined,
+        memoryBudgetMB: undefined
+    };
+    const job: Job = {
+        id: finalId,
+        status: 'queued',
+        images: preview.images,
+        settings,
+        propertyId: preview.propertyId,
+        createdAt: Date.now(),
+        outputDir: path.join(OUTPUTS_DIR, finalId),
+        priority: 'normal',
+        owner: preview.owner,
+        cost: estimateJobCost(preview.images.length, settings, scheduler.cores),
+        mode: 'final',
+        previewJobId: preview.id
+    };
+    jobs[finalId] = job;
+    preview.finalJobId = finalId;
+    scheduler.enqueue(finalId, job.owner, job.priority, job.cost);
+    console.log(`[DEBUG] Preview ${preview.id} done, queued final render ${finalId}`);
+}
+
+// Give the job's grant back and start whatever fits now
+function releaseJob(job: Job) {
+    if (!job.finishedAt) job.finishedAt = Date.now();
+    scheduler.release(job.id);
+    processQueue();
+}
+
+// Queue Processor
+function processQueue() {
+    for (const admission of scheduler.admit()) {
+        const job = jobs[admission.id];
+        if (!job || job.status === 'canceled') {
+            scheduler.release(admission.id);
+            continue;
+        }
+        console.log(`[Scheduler] Admitting job ${job.id} (${job.priority}, owner ${job.owner}): ${admission.cores} cores, ${admission.memoryMB} MB, waited ${admission.waitedMs} ms - ${admission.reason}`);
+        startJob(job, admission);
+    }
+}
+
+function startJob(job: Job, admission: Admission) {
+    const jobId = job.id;
+    job.status = 'running';
+    job.startedAt = Date.now();
+    job.admission = admission;
+    job.settings = { ...job.settings, cpuBudget: admission.cores, memoryBudgetMB: admission.memoryMB };
+    job.progress = {
+        '9x16': 0,
+        '1x1': 0,
+        '4x5': 0,
+        '16x9': 0
+    };
+    job.telemetry = emptyTelemetry();
+    
+    // Create output dir
+    if (!fs.existsSync(job.outputDir)) fs.mkdirSync(job.outputDir, { recursive: true });
+
+    console.log(`Starting job ${jobId}`);
+
+    if (useGeneratorService) {
+        runWithService(job);
+        return;
     }
 
+    const { cmd, baseArgs } = resolveGeneratorCommand();
+    console.log("Job images:", job.images);
+    console.log("Job images count:", job.images.length);
+    const args = [
+        ...baseArgs,
+        '--images', ...job.images,
+        '--id', job.propertyId,
+        '--output', job.outputDir,
+        '--settings', JSON.stringify(job.settings)
+    ];
+
     console.log(`Executing: ${cmd} ${args.length > 5 ? args.slice(0, 5).join(' ') + ' ...' : args.join(' ')}`);
 
-    const child = spawn(cmd, args);
+    // Telemetry JSON lines arrive on their own pipe (fd 3), apart from logs and progress
+    const child = spawn(cmd, args, {
+        stdio: ['pipe', 'pipe', 'pipe', 'pipe'],
+        env: { ...process.env, GENERATOR_TELEMETRY_FD: String(TELEMETRY_FD) }
+    }) as ChildProcessWithoutNullStreams;
     job.process = child;
+    const telemetryStream = child.stdio[TELEMETRY_FD] as Readable | null;
+    if (telemetryStream) {
+        readline.createInterface({ input: telemetryStream }).on('line', (line) => {
+            const event = parseTelemetryLine(line);
+            if (event && job.telemetry) recordTelemetry(job.telemetry, event);
+        });
+    }
 
     let stdout = '';
     let stderr = '';
@@ -231,8 +395,7 @@ async function processQueue() {
         console.error(`[Job ${jobId}] Failed to spawn python process: ${err}`);
         job.status = 'error';
         job.error = `Failed to spawn python process: ${err.message}`;
-        isProcessing = false;
-        processQueue();
+        releaseJob(job);
     });
 
     child.stdout.on('data', (data) => {
@@ -249,7 +412,11 @@ async function processQueue() {
         const lines = str.split('\n');
         for (const line of lines) {
             const progressMatch = line.match(/::PROGRESS::(.*?)::(\d+)/);
-            if (progressMatch && job.progress) {
+            if (line.includes('::TELEMETRY::')) {
+                // Fallback channel when the generator cannot write to fd 3
+                const event = parseTelemetryLine(line);
+                if (event && job.telemetry) recordTelemetry(job.telemetry, event);
+            } else if (progressMatch && job.progress) {
                 const fmt = progressMatch[1];
                 const pct = parseInt(progressMatch[2]);
                 if (job.progress[fmt] !== undefined) {
@@ -264,44 +431,24 @@ async function processQueue() {
 
     child.on('close', async (code) => {
         job.process = undefined;
-        isProcessing = false;
 
         if (code === 0) {
-            try {
-                // Parse stdout for last JSON line
-                const lines = stdout.trim().split('\n');
-                // Find the line that looks like JSON result
-                let result = null;
-                for (let i = lines.length - 1; i >= 0; i--) {
-                    try {
-                        const parsed = JSON.parse(lines[i]);
-                        if (parsed.status) {
-                            result = parsed;
-                            break;
-                        }
-                    } catch (error) {
-                        void error;
+            // Parse stdout for last JSON line
+            const lines = stdout.trim().split('\n');
+            // Find the line that looks like JSON result
+            let result = null;
+            for (let i = lines.length - 1; i >= 0; i--) {
+                try {
+                    const parsed = JSON.parse(lines[i]);
+                    if (parsed.status) {
+                        result = parsed;
+                        break;
                     }
+                } catch (error) {
+                    void error;
                 }
-                
-                if (result && result.status === 'success') {
-                    job.files = result.files;
-                    
-                    // Create ZIP
-                    const zipName = `${job.propertyId}_output.zip`;
-                    const zipPath = path.join(job.outputDir, zipName);
-                    
-                    await createZip(job.outputDir, job.files!, zipPath);
-                    job.zipFile = zipPath;
-                    job.status = 'done';
-                } else {
-                    job.status = 'error';
-                    job.error = result?.message || 'Unknown python error (no JSON result)';
-                }
-            } catch (e) {
-                job.status = 'error';
-                job.error = 'Failed to parse generator output: ' + e;
             }
+            await finishJob(job, result);
         } else {
             if (job.status !== 'canceled') {
                 job.status = 'error';
@@ -309,8 +456,7 @@ async function processQueue() {
             }
         }
         
-        // Trigger next job
-        processQueue();
+        releaseJob(job);
     });
 }
 
@@ -324,7 +470,9 @@ function createZip(sourceDir: string, files: string[], outPath: string): Promise
         
         archive.pipe(output);
         files.forEach(f => {
-            archive.file(path.join(sourceDir, f), { name: f });
+            // H.264/AAC is already compressed: store MP4s, deflate the rest
+            const store = /\.(mp4|m4a|mov)$/i.test(f);
+            archive.file(path.join(sourceDir, f), { name: f, store });
         });
         archive.finalize();
     });
@@ -559,6 +707,18 @@ app.post('/api/generate', upload.fields([{ name: 'images', maxCount: 100 }, { na
         console.log("Image files (after fix):", files);
         console.log("Image count:", files.length);
 
+        // Preview: mode=preview (or renderProfile "preview"), high priority unless lowered
+        const isPreview = req.body.mode === 'preview' || settings.renderProfile === 'preview';
+        const finalRenderProfile = settings.renderProfile === 'preview' ? undefined : settings.renderProfile;
+        if (isPreview) settings.renderProfile = 'preview';
+        const autoFinal = isPreview && ['true', '1', 'yes'].includes(String(req.body.autoFinal));
+        if (autoFinal) settings.warmFinalFrames = true;
+        // Clients may lower a job's priority; only previews run high
+        const requested = req.body.priority;
+        const priority: JobPriority = requested === 'low' || requested === 'normal'
+            ? requested
+            : (isPreview ? 'high' : 'normal');
+        const owner = requestOwner(req);
         const job: Job = {
             id: jobId,
             status: 'queued',
@@ -566,13 +726,19 @@ app.post('/api/generate', upload.fields([{ name: 'images', maxCount: 100 }, { na
             settings: { ...settings, musicFile, textOverlay: normalizedTextOverlay },
             propertyId,
             createdAt: Date.now(),
-            outputDir: path.join(OUTPUTS_DIR, jobId)
+            outputDir: path.join(OUTPUTS_DIR, jobId),
+            priority,
+            owner,
+            cost: estimateJobCost(files.length, settings, scheduler.cores),
+            mode: isPreview ? 'preview' : 'final',
+            autoFinal,
+            finalRenderProfile
         };
 
         jobs[jobId] = job;
-        queue.push(jobId);
+        scheduler.enqueue(jobId, owner, priority, job.cost);
         
-        console.log(`[DEBUG] Job ${jobId} added. Queue: ${queue.length}, isProcessing: ${isProcessing}`);
+        console.log(`[DEBUG] Job ${jobId} added (${priority}, owner ${owner}, work ${job.cost.work}, useful cores ${job.cost.usefulCores})`);
         processQueue(); 
 
         res.json({ jobId });
@@ -592,10 +758,31 @@ app.get('/api/jobs/:id', (req, res) => {
         files: job.files,
         zipFile: job.zipFile ? path.basename(job.zipFile) : undefined,
         error: job.error,
-        progress: job.progress
+        progress: job.progress,
+        mode: job.mode,
+        // Preview <-> automatically queued final render
+        finalJobId: job.finalJobId,
+        previewJobId: job.previewJobId,
+        priority: job.priority,
+        owner: job.owner,
+        cost: job.cost,
+        // Time in queue and running so far (or in total once finished)
+        waitMs: (job.startedAt ?? job.finishedAt ?? Date.now()) - job.createdAt,
+        runMs: job.startedAt ? (job.finishedAt ?? Date.now()) - job.startedAt : undefined,
+        admission: job.admission,
+        scheduler: scheduler.describe(job.id),
+        telemetry: job.telemetry && {
+            ...job.telemetry,
+            summary: summarizeTelemetry(job.telemetry)
+        }
     });
 });
 
+// Scheduler capacity, running jobs and the queue in admission order
+app.get('/api/scheduler', (req, res) => {
+    res.json(scheduler.stats());
+});
+
 // 3. Download Artifacts
 app.get('/api/jobs/:id/download/:filename', (req, res) => {
     const job = jobs[req.params.id];
@@ -641,15 +828,19 @@ app.post('/api/jobs/:id/cancel', (req, res) => {
     const job = jobs[req.params.id];
     if (!job) return res.status(404).json({ error: 'Job not found' });
     
-    if (job.status === 'running' && job.process) {
+    if (job.status === 'running' && useGeneratorService) {
+        // The service answers with a canceled result, which starts the next job
+        job.status = 'canceled';
+        getGeneratorService().cancel(job.id);
+    } else if (job.status === 'running' && job.process) {
+        // The close handler releases its grant and starts the next job
         job.process.kill();
         job.status = 'canceled';
-        isProcessing = false;
-        setTimeout(processQueue, 100); 
     } else if (job.status === 'queued') {
         job.status = 'canceled';
-        const idx = queue.indexOf(job.id);
-        if (idx > -1) queue.splice(idx, 1);
+        job.finishedAt = Date.now();
+        scheduler.remove(job.id);
+        processQueue();
     }
     
     res.json({ status: 'canceled' });
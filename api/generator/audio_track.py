@@ -0,0 +1,124 @@
+"""Job-level music track: decoded, looped, volume-scaled and AAC-encoded once.
+
+Every format of a job has the same length and music, so generate_slideshow
+renders the final track a single time with ffmpeg (-stream_loop to cover the
+video, volume filter, AAC) and the format encoders mux it with -acodec copy.
+Tracks are cached under AUDIO_CACHE_DIR keyed by (music content hash, volume,
+duration), so re-renders of the same listing skip audio entirely; the oldest
+tracks are dropped past AUDIO_CACHE_MAX_FILES.
+
+    python audio_track.py stats    # tracks / bytes on disk
+    python audio_track.py clear    # drop every cached track
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import subprocess as sp
+from moviepy.config import get_setting
+from frame_cache import content_hash
+
+# Bump whenever render_track produces a different track for the same input
+AUDIO_VERSION = 1
+# Same sample format moviepy's write_audiofile used per format
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "slideshow-audio-cache")
+DEFAULT_MAX_FILES = 64
+
+
+def cache_dir():
+    return os.path.join(os.environ.get("AUDIO_CACHE_DIR") or DEFAULT_CACHE_DIR, f"v{AUDIO_VERSION}")
+
+
+def track_key(music_file, volume, duration):
+    raw = f"{content_hash(music_file)}:{volume:.4f}:{duration:.3f}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def render_track(music_file, volume, duration, out_path):
+    """Loop/trim music_file to `duration` seconds at `volume` and encode it to AAC."""
+    cmd = [get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error', '-nostdin',
+           '-stream_loop', '-1', '-i', music_file, '-t', f"{duration:.3f}", '-vn']
+    if volume != 1.0:
+        cmd.extend(['-af', f"volume={volume:.4f}"])
+    cmd.extend(['-ar', str(SAMPLE_RATE), '-ac', str(CHANNELS), '-c:a', 'aac', '-f', 'mp4', out_path])
+    popen_params = {"stdout": sp.DEVNULL, "stderr": sp.PIPE}
+    if os.name == "nt":
+        popen_params["creationflags"] = 0x08000000  # CREATE_NO_WINDOW
+    proc = sp.run(cmd, **popen_params)
+    if proc.returncode != 0:
+        raise IOError(f"ffmpeg audio render failed for {music_file}: {proc.stderr.decode('utf-8', errors='replace').strip()}")
+
+
+def _tracks():
+    root = cache_dir()
+    if not os.path.isdir(root):
+        return []
+    tracks = []
+    for name in os.listdir(root):
+        if not name.endswith(".m4a"):
+            continue
+        path = os.path.join(root, name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        tracks.append((st.st_mtime, st.st_size, path))
+    return tracks
+
+
+def evict(max_files=None):
+    """Drop the least recently used tracks past max_files."""
+    if max_files is None:
+        max_files = int(os.environ.get("AUDIO_CACHE_MAX_FILES", str(DEFAULT_MAX_FILES)))
+    tracks = sorted(_tracks())
+    removed = 0
+    for _, _, path in tracks[:max(0, len(tracks) - max_files)]:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def prepare_track(music_file, volume, duration):
+    """(path, "hit" | "miss") of the cached AAC track for this job's music, rendered on a miss."""
+    key = track_key(music_file, volume, duration)
+    path = os.path.join(cache_dir(), f"{key}.m4a")
+    try:
+        os.utime(path)
+        print(f"DEBUG: audio track cache hit {key[:12]}")
+        return path, "hit"
+    except FileNotFoundError:
+        pass
+    os.makedirs(cache_dir(), exist_ok=True)
+    # Render beside the entry and rename, so concurrent jobs never mux a partial track
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir(), suffix=".tmp")
+    os.close(fd)
+    try:
+        render_track(music_file, volume, duration, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    print(f"DEBUG: audio track rendered {key[:12]} ({duration:.2f}s, volume {volume})")
+    evict()
+    return path, "miss"
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "stats":
+        tracks = _tracks()
+        print(json.dumps({"dir": cache_dir(), "tracks": len(tracks), "bytes": sum(size for _, size, _ in tracks)}))
+    elif command == "clear":
+        shutil.rmtree(cache_dir(), ignore_errors=True)
+        print(json.dumps({"cleared": cache_dir()}))
+    else:
+        print(f"Unknown command: {command} (expected stats or clear)")
+        sys.exit(1)
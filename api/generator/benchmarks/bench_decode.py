@@ -0,0 +1,99 @@
+"""Decode + preprocess time and peak RSS with reduced (draft) decoding on vs off.
+
+Run from the repo root:  python api/generator/benchmarks/bench_decode.py [WxH] [count]
+A synthetic corpus of camera-sized JPEGs and PNGs is written to a temp dir;
+corpus generation and each mode run in their own child process, because
+Linux carries ru_maxrss across exec and the parent's peak would leak in.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import resource
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from PIL import Image
+
+from preprocess import preprocess_images
+
+TARGETS = [(1080, 1920), (1080, 1080)]
+
+
+def make_corpus(directory, width, height, count, queue=None):
+    rng = np.random.default_rng(7)
+    paths = []
+    for i in range(count):
+        # Smooth gradients plus noise compress like photos, unlike pure noise
+        gx = np.linspace(0, 255, width, dtype=np.float32)[np.newaxis, :, np.newaxis]
+        gy = np.linspace(0, 255, height, dtype=np.float32)[:, np.newaxis, np.newaxis]
+        noise = rng.normal(0, 12, size=(height, width, 3)).astype(np.float32)
+        pixels = np.clip((gx + gy) / 2 + noise + i * 10, 0, 255).astype(np.uint8)
+        ext = 'png' if i % 4 == 3 else 'jpg'
+        path = os.path.join(directory, f"src_{i}.{ext}")
+        Image.fromarray(pixels).save(path, quality=90)
+        paths.append(path)
+    if queue is not None:
+        queue.put(paths)
+    return paths
+
+
+def _run_mode(paths, out_dir, reduced, queue):
+    start = time.perf_counter()
+    for w, h in TARGETS:
+        target_dir = os.path.join(out_dir, f"{w}x{h}")
+        os.makedirs(target_dir, exist_ok=True)
+        preprocess_images(paths, target_dir, w, h, reduced_decode=reduced)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux
+    queue.put({"seconds": round(elapsed, 3), "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)})
+
+
+def _compare(out_dir_a, out_dir_b):
+    worst = 0.0
+    for w, h in TARGETS:
+        sub = f"{w}x{h}"
+        for name in sorted(os.listdir(os.path.join(out_dir_a, sub))):
+            a = np.asarray(Image.open(os.path.join(out_dir_a, sub, name)), dtype=np.float32)
+            b = np.asarray(Image.open(os.path.join(out_dir_b, sub, name)), dtype=np.float32)
+            worst = max(worst, float(np.abs(a - b).mean()))
+    return round(worst, 3)
+
+
+def run(width=4032, height=3024, count=6):
+    work = tempfile.mkdtemp(prefix="bench_decode_")
+    try:
+        corpus_dir = os.path.join(work, "corpus")
+        os.makedirs(corpus_dir)
+        ctx = multiprocessing.get_context("spawn")
+        queue = ctx.Queue()
+        proc = ctx.Process(target=make_corpus, args=(corpus_dir, width, height, count, queue))
+        proc.start()
+        paths = queue.get()
+        proc.join()
+        results = {}
+        for label, reduced in (("full", False), ("reduced", True)):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_run_mode, args=(paths, os.path.join(work, label), reduced, queue))
+            proc.start()
+            proc.join()
+            if proc.exitcode != 0:
+                raise RuntimeError(f"{label} run failed with exit code {proc.exitcode}")
+            results[label] = queue.get()
+        results["mean_abs_diff_max"] = _compare(os.path.join(work, "full"), os.path.join(work, "reduced"))
+        results["speedup"] = round(results["full"]["seconds"] / results["reduced"]["seconds"], 2)
+        print(json.dumps({"source": f"{width}x{height}", "count": count, "targets": TARGETS, "results": results}, indent=2))
+        return results
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    size = sys.argv[1] if len(sys.argv) > 1 else "4032x3024"
+    image_count = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    w, h = (int(v) for v in size.lower().split("x"))
+    run(w, h, image_count)
@@ -0,0 +1,80 @@
+"""Frames/sec of panorama / Ken Burns frame sources.
+
+Run from the repo root:  python api/generator/benchmarks/bench_panzoom.py [WxH] [frames]
+Compares the legacy moviepy set_position + CompositeVideoClip pan against
+PanZoomSource (integer pan, sub-pixel pan, zoom in, zoom out) on a synthetic
+wide photo. The integer pan is expected to match the legacy frames exactly.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from PIL import Image
+
+from generator import make_panorama_clip
+
+DURATION = 3.0
+
+MODES = {
+    "moviepy_pan": {"native": False},
+    "native_pan": {"native": True},
+    "native_subpixel_pan": {"native": True, "subpixel": True},
+    "native_zoom_in": {"native": True, "zoom": "in"},
+    "native_zoom_out": {"native": True, "zoom": "out"},
+}
+
+
+def synthetic_photo(width, height):
+    rng = np.random.default_rng(3)
+    # Wider than any output format so every target pans horizontally
+    return rng.integers(0, 256, size=(height, width * 2, 3), dtype=np.uint8)
+
+
+def measure(clip, frames, repeats=3):
+    """Best-of-`repeats` frames/sec; frames are copied so views are not free."""
+    times = [DURATION * i / frames for i in range(frames)]
+    best = None
+    for _ in range(repeats):
+        outputs = []
+        start = time.perf_counter()
+        for t in times:
+            outputs.append(np.array(clip.get_frame(t), dtype=np.uint8))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return frames / best if best else float('inf'), outputs
+
+
+def run(width=1080, height=1920, frames=30):
+    work = tempfile.mkdtemp(prefix="bench_panzoom_")
+    try:
+        photo_path = os.path.join(work, "photo.png")
+        Image.fromarray(synthetic_photo(width, height)).save(photo_path)
+        results = []
+        reference = None
+        for name, options in MODES.items():
+            # Decode and the one-time resize happen here, outside the timed loop
+            clip = make_panorama_clip(photo_path, DURATION, width, height, **options)
+            fps, outputs = measure(clip, frames)
+            entry = {"mode": name, "fps": round(fps, 1)}
+            if name == "moviepy_pan":
+                reference = outputs
+            elif name == "native_pan":
+                entry["mismatched_px"] = sum(int(np.any(a != b, axis=2).sum()) for a, b in zip(reference, outputs))
+            results.append(entry)
+        print(json.dumps({"size": f"{width}x{height}", "frames": frames, "results": results}, indent=2))
+        return results
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    size = sys.argv[1] if len(sys.argv) > 1 else "1080x1920"
+    frame_count = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    w, h = (int(v) for v in size.lower().split("x"))
+    run(w, h, frame_count)
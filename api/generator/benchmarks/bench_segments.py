@@ -0,0 +1,76 @@
+"""Wall time of one format rendered whole vs split into time segments.
+
+Run from the repo root:  python api/generator/benchmarks/bench_segments.py [segments] [images]
+Renders a single 9x16 format from synthetic photos, first as one task, then
+with segmentsPerFormat chunks joined by the concat demuxer. Speedup needs
+spare cores (expect ~1x on a single-CPU machine); frame counts must match.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess as sp
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from PIL import Image
+from moviepy.config import get_setting
+
+from generator import generate_slideshow
+
+BASE_SETTINGS = {
+    "fps": 30,
+    "secondsPerImage": 3.0,
+    "transition": "fade",
+    "transitionDuration": 0.8,
+    "platforms": {"tiktok": True},
+    "formats": {"tiktok": "9x16"},
+    "preferHardwareEncode": False,
+    "frameCache": False,
+}
+
+
+def synthetic_photos(work, count):
+    rng = np.random.default_rng(11)
+    paths = []
+    for i in range(count):
+        base = rng.integers(0, 256, size=(24, 40, 3), dtype=np.uint8)
+        path = os.path.join(work, f"photo{i}.jpg")
+        Image.fromarray(base).resize((2400, 1600), Image.Resampling.BICUBIC).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def frame_count(path):
+    proc = sp.run([get_setting("FFMPEG_BINARY"), '-i', path, '-map', '0:v', '-f', 'null', '-'],
+                  stdout=sp.DEVNULL, stderr=sp.PIPE)
+    lines = [l for l in proc.stderr.decode('utf-8', errors='replace').replace('\r', '\n').split('\n') if l.startswith('frame=')]
+    return int(lines[-1].split('=')[1].split()[0]) if lines else None
+
+
+def run(segments=4, image_count=8):
+    work = tempfile.mkdtemp(prefix="bench_segments_")
+    try:
+        images = synthetic_photos(work, image_count)
+        results = {}
+        for label, extra in (("whole", {"segmentParallel": False}), ("segmented", {"segmentsPerFormat": segments})):
+            out_dir = os.path.join(work, label)
+            start = time.perf_counter()
+            files = generate_slideshow(images, "bench", out_dir, dict(BASE_SETTINGS, **extra))
+            elapsed = time.perf_counter() - start
+            results[label] = {"seconds": round(elapsed, 2), "frames": frame_count(os.path.join(out_dir, files[0]))}
+        results["speedup"] = round(results["whole"]["seconds"] / results["segmented"]["seconds"], 2)
+        print(json.dumps({"segments": segments, "images": image_count, "cpus": os.cpu_count(),
+                          "results": results}, indent=2))
+        return results
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    segment_count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    photo_count = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    run(segment_count, photo_count)
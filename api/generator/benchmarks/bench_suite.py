@@ -0,0 +1,431 @@
+"""Reproducible benchmark suite: micro-benchmarks and end-to-end sweeps on synthetic corpora.
+
+Run from the repo root:
+    python api/generator/benchmarks/bench_suite.py micro [--quick] [--groups preprocess,transitions,text,encode]
+    python api/generator/benchmarks/bench_suite.py sweep [--quick] [--grid] [--dims transition,fps] [--corpus listing]
+    python api/generator/benchmarks/bench_suite.py all [--quick]
+    python api/generator/benchmarks/bench_suite.py compare BASELINE.json RESULTS.json [--threshold 0.1]
+
+micro times preprocess_image per source shape and handoff, every function in
+transitions.py (and the native compositor), create_pil_text_clip and the
+encode path on its own. sweep renders whole jobs with generate_slideshow,
+varying one of formats / transition / fps / text / workers at a time around
+a base job (--grid: every combination) and records the generator's telemetry
+stage timings per run. Everything runs offline and CPU-only (libx264, no
+encoder probe, frame cache off); inputs come from corpus.py with fixed seeds.
+
+Results are JSON (--out, default stdout) with the environment they ran in.
+--baseline FILE, or the compare command, reports every entry whose median
+time moved by more than --threshold; compare exits 1 when something regressed.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import itertools
+import statistics
+import subprocess as sp
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import PIL
+from PIL import Image
+import moviepy
+from moviepy.editor import ImageClip
+from moviepy.config import get_setting
+
+from generator import generate_slideshow, create_pil_text_clip, build_text_overlay
+from preprocess import preprocess_image
+from compositor import NATIVE_TRANSITIONS, native_transition
+from ffmpeg_writer import write_clip
+from transitions import (
+    slide_transition, zoom_transition, wipe_transition, circle_transition, pixelate_transition,
+    spin_transition, fly_transition, page_curl_transition, ripple_transition
+)
+from corpus import SHAPES, make_corpus, shape_image, synthetic_photo, CORPUS_VERSION
+
+RESULTS_VERSION = 1
+TRANSITION_SECONDS = 0.8
+GROUPS = ("preprocess", "transitions", "text", "encode")
+
+# Every function in transitions.py, with the direction generate_format uses first
+TRANSITION_FUNCTIONS = {
+    "slide_transition": lambda c1, c2, d: slide_transition(c1, c2, d, 'left'),
+    "zoom_transition": lambda c1, c2, d: zoom_transition(c1, c2, d, 'in'),
+    "wipe_transition": lambda c1, c2, d: wipe_transition(c1, c2, d, 'left'),
+    "circle_transition": lambda c1, c2, d: circle_transition(c1, c2, d, 'open'),
+    "pixelate_transition": lambda c1, c2, d: pixelate_transition(c1, c2, d),
+    "spin_transition": lambda c1, c2, d: spin_transition(c1, c2, d, 'in'),
+    "fly_transition": lambda c1, c2, d: fly_transition(c1, c2, d, 'in'),
+    "page_curl_transition": lambda c1, c2, d: page_curl_transition(c1, c2, d),
+    "ripple_transition": lambda c1, c2, d: ripple_transition(c1, c2, d),
+}
+NATIVE_CASES = ("fade", "slide_left", "wipe_left", "circle_open", "zoom_in", "spin_in", "fly_in", "page_curl", "ripple")
+
+LISTING_TEXT = {
+    "enabled": True,
+    "text": "ულამაზესი ბინა ვაკეში 3 ოთახი 120 კვ.მ სასწრაფოდ იყიდება",
+    "title": "Vake, Tbilisi",
+    "price": "$185,000",
+    "showLogo": True,
+}
+
+BASE_SETTINGS = {
+    "secondsPerImage": 3.0,
+    "transitionDuration": TRANSITION_SECONDS,
+    "renderProfile": "fast_parallel",
+    "preferHardwareEncode": False,
+    "frameCache": False,
+}
+FORMAT_SETS = {
+    "9x16": {"tiktok": "9x16"},
+    "3-formats": {"tiktok": "9x16", "instagram": "4x5", "facebook": "1x1"},
+    "4-formats": {"tiktok": "9x16", "instagram": "4x5", "facebook": "1x1", "youtube": "16x9"},
+}
+
+
+def sweep_dimensions(quick):
+    """{dimension: values}; the first value of each is the base job."""
+    cpus = os.cpu_count() or 1
+    workers = sorted({cpus, 1}, reverse=True)
+    if quick:
+        return {"formats": ["9x16", "3-formats"], "transition": ["fade", "cut"], "fps": [12],
+                "text": [True, False], "workers": workers}
+    return {"formats": ["3-formats", "9x16", "4-formats"],
+            "transition": ["fade", "cut", "slide_left", "circle_open", "ripple"],
+            "fps": [30, 24], "text": [True, False], "workers": workers}
+
+
+def measure(fn, repeat, warmup=1, units=None):
+    """Median / min wall seconds of fn() over `repeat` runs (after `warmup` untimed ones)."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    result = {"median": round(statistics.median(samples), 5), "min": round(min(samples), 5), "runs": len(samples)}
+    if units:
+        result["rate"] = round(units / statistics.median(samples), 2)
+    return result
+
+
+def environment():
+    ffmpeg = get_setting("FFMPEG_BINARY")
+    try:
+        ffmpeg_version = sp.run([ffmpeg, '-version'], stdout=sp.PIPE, stderr=sp.DEVNULL).stdout.decode('utf-8', 'replace').splitlines()[0]
+    except (OSError, IndexError):
+        ffmpeg_version = None
+    try:
+        commit = sp.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                        stdout=sp.PIPE, stderr=sp.DEVNULL).stdout.decode().strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "moviepy": moviepy.__version__,
+        "ffmpeg": ffmpeg_version,
+        "commit": commit,
+        "corpus": CORPUS_VERSION,
+    }
+
+
+def synthetic_clip(width, height, seed, duration=TRANSITION_SECONDS):
+    image = Image.fromarray(synthetic_photo(width * 2, height * 2, seed)).resize((width, height))
+    return ImageClip(np.asarray(image)).set_duration(duration)
+
+
+def render_frames(clip, frames):
+    for i in range(frames):
+        clip.get_frame(clip.duration * i / frames)
+
+
+# --- micro-benchmarks -------------------------------------------------------
+
+def bench_preprocess(work, quick, repeat):
+    shapes = ["landscape", "panorama", "screenshot"] if quick else list(SHAPES)
+    modes = [("jpeg", False), ("memory", True)] if quick else [("jpeg", False), ("jpeg", True), ("memory", False), ("memory", True)]
+    results = {}
+    for shape in shapes:
+        path = shape_image(shape)
+        for handoff, reduced in modes:
+            out_dir = os.path.join(work, "preprocess")
+            os.makedirs(out_dir, exist_ok=True)
+            variant = handoff + ("-reduced" if reduced else "")
+            results[f"preprocess_image/{shape}/{variant}"] = measure(
+                lambda: preprocess_image(path, out_dir, 1080, 1920, reduced_decode=reduced, handoff=handoff), repeat)
+    return results
+
+
+def bench_transitions(quick, repeat):
+    width, height = (540, 960) if quick else (1080, 1920)
+    frames = 6 if quick else 12
+    c1 = synthetic_clip(width, height, 1)
+    c2 = synthetic_clip(width, height, 2)
+    results = {}
+    for name, build in TRANSITION_FUNCTIONS.items():
+        results[f"transitions/{name}"] = measure(
+            lambda: render_frames(build(c1, c2, TRANSITION_SECONDS), frames), repeat, units=frames)
+    for name in NATIVE_CASES:
+        if name in NATIVE_TRANSITIONS:
+            results[f"compositor/{name}"] = measure(
+                lambda: render_frames(native_transition(c1, c2, TRANSITION_SECONDS, name), frames), repeat, units=frames)
+    return results
+
+
+def bench_text(quick, repeat):
+    cases = {
+        "latin": "Spacious 3 bedroom apartment in Vake, 120 sq.m",
+        "georgian": LISTING_TEXT["text"],
+    }
+    results = {}
+    for name, text in cases.items():
+        results[f"create_pil_text_clip/{name}"] = measure(
+            lambda: create_pil_text_clip(text, 60, "white", 2, 1080, 1920, "center", 1500), repeat)
+    results["build_text_overlay/listing"] = measure(lambda: build_text_overlay(LISTING_TEXT, 1080, 1920), repeat)
+    return results
+
+
+def bench_encode(work, quick, repeat):
+    """The encode path alone: a still frame costs nothing to composite."""
+    frames = 24 if quick else 90
+    cases = {
+        "encode/libx264-veryfast-1080x1920": ((1080, 1920), 30, "veryfast", "22"),
+        "encode/libx264-ultrafast-360x640": ((360, 640), 12, "ultrafast", "28"),
+    }
+    results = {}
+    for name, ((width, height), fps, preset, crf) in cases.items():
+        clip = synthetic_clip(width, height, 3, duration=frames / float(fps))
+        out_path = os.path.join(work, "encode.mp4")
+        results[name] = measure(lambda: write_clip(clip, out_path, fps, "libx264", preset, ffmpeg_params=["-crf", crf]),
+                                repeat, units=frames)
+    return results
+
+
+def run_micro(work, quick, repeat, groups):
+    results = {}
+    if "preprocess" in groups:
+        results.update(bench_preprocess(work, quick, repeat))
+    if "transitions" in groups:
+        results.update(bench_transitions(quick, repeat))
+    if "text" in groups:
+        results.update(bench_text(quick, repeat))
+    if "encode" in groups:
+        results.update(bench_encode(work, quick, repeat))
+    return results
+
+
+# --- end-to-end sweeps ------------------------------------------------------
+
+def sweep_configs(dimensions, grid=False, vary=None):
+    """Dimension dicts to run: the base job plus one change at a time (or the full grid)."""
+    names = list(dimensions)
+    if grid:
+        return [dict(zip(names, values)) for values in itertools.product(*(dimensions[n] for n in names))]
+    base = {name: values[0] for name, values in dimensions.items()}
+    configs = [base]
+    for name in names:
+        if vary and name not in vary:
+            continue
+        for value in dimensions[name][1:]:
+            configs.append(dict(base, **{name: value}))
+    return configs
+
+
+def config_id(config):
+    parts = []
+    for name, value in config.items():
+        if isinstance(value, bool):
+            value = "on" if value else "off"
+        parts.append(f"{name}={value}")
+    return ",".join(parts)
+
+
+def job_settings(config, quick):
+    formats = FORMAT_SETS[config["formats"]]
+    settings = dict(BASE_SETTINGS,
+                    fps=config["fps"],
+                    transition=config["transition"],
+                    platforms={platform_id: True for platform_id in formats},
+                    formats=formats,
+                    cpuBudget=config["workers"],
+                    textOverlay=LISTING_TEXT if config["text"] else {"enabled": False})
+    if quick:
+        settings["secondsPerImage"] = 1.5
+    return settings
+
+
+def run_job(images, settings, work):
+    """Wall seconds of one generate_slideshow call plus the telemetry it emitted."""
+    out_dir = tempfile.mkdtemp(prefix="job_", dir=work)
+    telemetry_path = os.path.join(out_dir, "telemetry.jsonl")
+    # Forked pool workers inherit the descriptor (see telemetry.py)
+    fd = os.open(telemetry_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+    os.set_inheritable(fd, True)
+    previous = os.environ.get("GENERATOR_TELEMETRY_FD")
+    os.environ["GENERATOR_TELEMETRY_FD"] = str(fd)
+    job_events = []
+    try:
+        start = time.perf_counter()
+        generate_slideshow(images, "bench", out_dir, settings, telemetry_sink=job_events.append)
+        elapsed = time.perf_counter() - start
+    finally:
+        os.close(fd)
+        if previous is None:
+            os.environ.pop("GENERATOR_TELEMETRY_FD", None)
+        else:
+            os.environ["GENERATOR_TELEMETRY_FD"] = previous
+    with open(telemetry_path, "r", encoding="utf-8") as handle:
+        events = [json.loads(line) for line in handle if line.strip()]
+    shutil.rmtree(out_dir, ignore_errors=True)
+    return elapsed, [e for e in events if e.get("event") == "format"], job_events[-1] if job_events else None
+
+
+def run_sweep(work, quick, repeat, corpus, grid=False, vary=None):
+    images = make_corpus(corpus, 4 if quick else None)
+    results = {}
+    for config in sweep_configs(sweep_dimensions(quick), grid, vary):
+        settings = job_settings(config, quick)
+        samples = []
+        formats = job = None
+        for _ in range(max(1, repeat)):
+            elapsed, formats, job = run_job(images, settings, work)
+            samples.append(elapsed)
+        stages = {}
+        for event in formats:
+            for stage, seconds in event.get("stages", {}).items():
+                stages[stage] = round(stages.get(stage, 0.0) + seconds, 3)
+        frames = sum(event.get("frames", 0) for event in formats)
+        median = statistics.median(samples)
+        key = config_id(config)
+        results[key] = {
+            "config": config,
+            "median": round(median, 3),
+            "min": round(min(samples), 3),
+            "runs": len(samples),
+            "frames": frames,
+            "rate": round(frames / median, 2) if median else None,
+            # Stage seconds summed over the last run's format tasks (worker time, not wall time)
+            "stages": stages,
+            "jobStages": job.get("stages") if job else None,
+            "encoders": sorted({event.get("encoder") for event in formats if event.get("encoder")}),
+            "peakRssMB": max([event.get("peakRssMB") or 0 for event in formats] or [0]),
+        }
+        print(f"DEBUG: bench {key}: {results[key]['median']}s ({results[key]['rate']} frames/s)")
+    return {"corpus": corpus, "images": len(images), "runs": results}
+
+
+# --- baseline comparison ----------------------------------------------------
+
+def flat_timings(results):
+    timings = {}
+    for name, entry in (results.get("micro") or {}).items():
+        timings[f"micro/{name}"] = entry["median"]
+    for name, entry in ((results.get("sweep") or {}).get("runs") or {}).items():
+        timings[f"sweep/{name}"] = entry["median"]
+    return timings
+
+
+def compare(baseline, current, threshold=0.1):
+    """Entries whose median time changed by more than `threshold` (a fraction) against the baseline."""
+    before = flat_timings(baseline)
+    after = flat_timings(current)
+    regressions, improvements = [], []
+    unchanged = 0
+    for name in sorted(set(before) & set(after)):
+        if not before[name]:
+            continue
+        ratio = after[name] / before[name]
+        entry = {"name": name, "baseline": before[name], "current": after[name], "ratio": round(ratio, 3)}
+        if ratio > 1 + threshold:
+            regressions.append(entry)
+        elif ratio < 1 - threshold:
+            improvements.append(entry)
+        else:
+            unchanged += 1
+    env_before = dict(baseline.get("environment") or {}, quick=(baseline.get("options") or {}).get("quick"))
+    env_after = dict(current.get("environment") or {}, quick=(current.get("options") or {}).get("quick"))
+    return {
+        "threshold": threshold,
+        "regressions": regressions,
+        "improvements": improvements,
+        "unchanged": unchanged,
+        "onlyInBaseline": sorted(set(before) - set(after)),
+        "onlyInCurrent": sorted(set(after) - set(before)),
+        # Timings from different machines or toolchains are not comparable
+        "environmentChanges": {key: [env_before.get(key), env_after.get(key)]
+                               for key in ("quick", "cpus", "machine", "python", "numpy", "pillow", "moviepy", "ffmpeg", "corpus")
+                               if env_before.get(key) != env_after.get(key)},
+    }
+
+
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generator benchmark suite")
+    parser.add_argument("command", choices=["micro", "sweep", "all", "compare"])
+    parser.add_argument("files", nargs="*", help="compare: BASELINE.json RESULTS.json")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, fewer configurations")
+    parser.add_argument("--repeat", type=int, help="timed runs per entry (default: micro 3, sweep 1)")
+    parser.add_argument("--groups", default=",".join(GROUPS), help="micro groups to run")
+    parser.add_argument("--grid", action="store_true", help="sweep every combination instead of one change at a time")
+    parser.add_argument("--dims", help="sweep: only vary these dimensions")
+    parser.add_argument("--corpus", default="listing", help="sweep corpus (see corpus.py)")
+    parser.add_argument("--out", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="compare the results against this earlier results file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change reported by compare")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        if len(args.files) != 2:
+            parser.error("compare needs BASELINE.json and RESULTS.json")
+        report = compare(load_json(args.files[0]), load_json(args.files[1]), args.threshold)
+        print(json.dumps(report, indent=2))
+        sys.exit(1 if report["regressions"] else 0)
+
+    # Generator DEBUG output goes to stderr; stdout is left for the results JSON
+    original_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    work = tempfile.mkdtemp(prefix="bench_suite_")
+    started = time.time()
+    results = {"version": RESULTS_VERSION, "environment": environment(),
+               "options": {"quick": args.quick, "repeat": args.repeat, "grid": args.grid}}
+    try:
+        if args.command in ("micro", "all"):
+            groups = [g.strip() for g in args.groups.split(",") if g.strip() in GROUPS]
+            results["micro"] = run_micro(work, args.quick, args.repeat or 3, groups)
+        if args.command in ("sweep", "all"):
+            vary = [d.strip() for d in args.dims.split(",")] if args.dims else None
+            results["sweep"] = run_sweep(work, args.quick, args.repeat or 1, args.corpus, args.grid, vary)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+        sys.stdout = original_stdout
+    results["seconds"] = round(time.time() - started, 1)
+    if args.baseline:
+        results["comparison"] = compare(load_json(args.baseline), results, args.threshold)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+        print(f"DEBUG: results written to {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
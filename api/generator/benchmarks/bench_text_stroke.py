@@ -0,0 +1,134 @@
+"""Micro-benchmark: legacy (2s+1)² stroke redraw vs single-pass mask dilation.
+
+Run from the repo root:  python api/generator/benchmarks/bench_text_stroke.py
+Prints per-line render time for both paths and the max per-channel pixel
+difference, and exits non-zero if the outputs drift apart anywhere outside
+the glyph overlaps that legacy spaced drawing got wrong.
+"""
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from fonts import load_font
+from text_layout import get_glyph_metrics, stroke_layer
+
+MAX_ALLOWED_DIFF = 2
+
+CASES = [
+    ("ულამაზესი ბინა ვაკეში", 60, 2, 0),
+    ("$120,000", 80, 3, 0),
+    ("$120,000", 80, 3, 6),
+    ("ffff", 80, 3, 1),
+    ("+995 555 123 456", 40, 1, 0),
+    ("LUMINAVIDS", 30, 1, 0),
+]
+
+
+def legacy_draw(img, value, x, y, font, fill, stroke, stroke_fill, spacing):
+    draw = ImageDraw.Draw(img)
+    if spacing <= 0:
+        for offset_x in range(-stroke, stroke + 1):
+            for offset_y in range(-stroke, stroke + 1):
+                draw.text((x + offset_x, y + offset_y), value, font=font, fill=stroke_fill)
+        draw.text((x, y), value, font=font, fill=fill)
+        return
+    metrics = get_glyph_metrics(font)
+    current_x = x
+    for ch in value:
+        for offset_x in range(-stroke, stroke + 1):
+            for offset_y in range(-stroke, stroke + 1):
+                draw.text((current_x + offset_x, y + offset_y), ch, font=font, fill=stroke_fill)
+        draw.text((current_x, y), ch, font=font, fill=fill)
+        current_x += metrics.width(ch) + spacing
+
+
+def dilated_draw(img, value, x, y, font, fill, stroke, stroke_fill, spacing):
+    img.alpha_composite(stroke_layer(img.size, value, x, y, font, spacing, stroke, stroke_fill))
+    draw = ImageDraw.Draw(img)
+    if spacing <= 0:
+        draw.text((x, y), value, font=font, fill=fill)
+        return
+    metrics = get_glyph_metrics(font)
+    current_x = x
+    for ch in value:
+        draw.text((current_x, y), ch, font=font, fill=fill)
+        current_x += metrics.width(ch) + spacing
+
+
+def overlap_mask(size, value, x, y, font, stroke, spacing):
+    """Pixels where legacy drew a later glyph's stroke over an earlier glyph's fill.
+
+    Only spaced text is drawn glyph by glyph, so elsewhere the mask is empty.
+    Both sides are taken at any coverage and grown by a pixel for antialiasing.
+    """
+    mask = np.zeros((size[1], size[0]), dtype=bool)
+    if spacing <= 0:
+        return mask
+    metrics = get_glyph_metrics(font)
+    grow = ImageFilter.MaxFilter(2 * stroke + 3)
+    fills = []
+    current_x = x
+    for ch in value:
+        glyph = Image.new('L', size, 0)
+        ImageDraw.Draw(glyph).text((current_x, y), ch, font=font, fill=255)
+        fills.append(glyph)
+        current_x += metrics.width(ch) + spacing
+    later_strokes = np.zeros_like(mask)
+    for glyph in reversed(fills):
+        mask |= (np.asarray(glyph.filter(ImageFilter.MaxFilter(3))) > 0) & later_strokes
+        later_strokes |= np.asarray(glyph.filter(grow)) > 0
+    return mask
+
+
+def time_it(fn, repeat):
+    start = time.perf_counter()
+    result = None
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def run(repeat=10):
+    results = []
+    worst = 0
+    for text, size, stroke, spacing in CASES:
+        font = load_font(None, None, text, size)
+        canvas = (1080, int(size * 1.6) + 2 * stroke)
+
+        def render(fn):
+            img = Image.new('RGBA', canvas, (0, 0, 0, 0))
+            fn(img, text, 54, stroke + 4, font, 'white', stroke, 'black', spacing)
+            return img
+
+        old_t, old_img = time_it(lambda: render(legacy_draw), repeat)
+        new_t, new_img = time_it(lambda: render(dilated_draw), repeat)
+        diff = np.abs(np.asarray(old_img, dtype=np.int16) - np.asarray(new_img, dtype=np.int16))
+        # Spaced glyphs used to have each stroke drawn over the previous glyph's
+        # fill; judge drift by the max over every pixel away from that overlap.
+        overlap = overlap_mask(canvas, text, 54, stroke + 4, font, stroke, spacing)
+        drift = int(diff.max(axis=2)[~overlap].max())
+        worst = max(worst, drift)
+        results.append({
+            "text": text,
+            "size": size,
+            "stroke": stroke,
+            "spacing": spacing,
+            "legacy_ms": round(old_t * 1000, 2),
+            "dilated_ms": round(new_t * 1000, 2),
+            "speedup": round(old_t / new_t, 1) if new_t else None,
+            "max_diff": int(diff.max()),
+            "overlap_px": int(overlap.sum()),
+            "max_diff_outside_overlap": drift,
+        })
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    return worst <= MAX_ALLOWED_DIFF
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
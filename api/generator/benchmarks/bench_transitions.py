@@ -0,0 +1,96 @@
+"""Frames/sec of each transition: moviepy CompositeVideoClip path vs TransitionCompositor.
+
+Run from the repo root:  python api/generator/benchmarks/bench_transitions.py [WxH] [frames]
+Sources are synthetic still frames, so the numbers isolate compositing cost.
+Also reports how many pixels differ between the two paths and by how much
+on average (fade is expected to differ: the moviepy path has no crossfade
+and shows the incoming clip; zoom/spin/fly resample bilinearly instead of
+moviepy's bicubic rotate + LANCZOS resize).
+"""
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from moviepy.editor import ImageClip, concatenate_videoclips
+
+import generator  # noqa: F401  (Image.ANTIALIAS shim used by moviepy's resize)
+from compositor import NATIVE_TRANSITIONS, native_transition
+from transitions import (
+    slide_transition, wipe_transition, circle_transition,
+    page_curl_transition, ripple_transition, zoom_transition,
+    spin_transition, fly_transition
+)
+
+DURATION = 0.8
+
+MOVIEPY_PATHS = {
+    "fade": lambda c1, c2, d: concatenate_videoclips([c1, c2], method="compose", padding=-d),
+    "slide_left": lambda c1, c2, d: slide_transition(c1, c2, d, 'left'),
+    "slide_up": lambda c1, c2, d: slide_transition(c1, c2, d, 'up'),
+    "wipe_left": lambda c1, c2, d: wipe_transition(c1, c2, d, 'left'),
+    "wipe_down": lambda c1, c2, d: wipe_transition(c1, c2, d, 'down'),
+    "circle_open": lambda c1, c2, d: circle_transition(c1, c2, d, 'open'),
+    "circle_close": lambda c1, c2, d: circle_transition(c1, c2, d, 'close'),
+    "page_curl": lambda c1, c2, d: page_curl_transition(c1, c2, d),
+    "ripple": lambda c1, c2, d: ripple_transition(c1, c2, d),
+    "zoom_in": lambda c1, c2, d: zoom_transition(c1, c2, d, 'in'),
+    "zoom_out": lambda c1, c2, d: zoom_transition(c1, c2, d, 'out'),
+    "spin_in": lambda c1, c2, d: spin_transition(c1, c2, d, 'in'),
+    "spin_out": lambda c1, c2, d: spin_transition(c1, c2, d, 'out'),
+    "fly_in": lambda c1, c2, d: fly_transition(c1, c2, d, 'in'),
+    "fly_out": lambda c1, c2, d: fly_transition(c1, c2, d, 'out'),
+}
+
+
+def synthetic_clip(width, height, seed):
+    # Smooth gradients with mild noise: photo-like, so resampling differences stay meaningful
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    phase = rng.uniform(0, 2 * np.pi, size=3)
+    channels = [127 + 100 * np.sin(xx / (60 + 20 * c) + yy / (90 + 15 * c) + phase[c]) for c in range(3)]
+    frame = np.stack(channels, axis=2) + rng.normal(0, 6, size=(height, width, 3))
+    return ImageClip(np.clip(frame, 0, 255).astype(np.uint8)).set_duration(DURATION)
+
+
+def measure_fps(clip, frames):
+    times = [DURATION * i / frames for i in range(frames)]
+    outputs = []
+    start = time.perf_counter()
+    for t in times:
+        outputs.append(np.array(clip.get_frame(t), dtype=np.uint8))
+    elapsed = time.perf_counter() - start
+    return frames / elapsed if elapsed else float('inf'), outputs
+
+
+def run(width=1080, height=1920, frames=12):
+    c1 = synthetic_clip(width, height, 1)
+    c2 = synthetic_clip(width, height, 2)
+    results = []
+    for name, build in MOVIEPY_PATHS.items():
+        if name not in NATIVE_TRANSITIONS:
+            continue
+        moviepy_fps, moviepy_frames = measure_fps(build(c1, c2, DURATION), frames)
+        native_fps, native_frames = measure_fps(native_transition(c1, c2, DURATION, name), frames)
+        mismatched = sum(int(np.any(a != b, axis=2).sum()) for a, b in zip(moviepy_frames, native_frames))
+        mean_diff = float(np.mean([np.abs(a.astype(np.int16) - b).mean() for a, b in zip(moviepy_frames, native_frames)]))
+        results.append({
+            "transition": name,
+            "moviepy_fps": round(moviepy_fps, 1),
+            "native_fps": round(native_fps, 1),
+            "speedup": round(native_fps / moviepy_fps, 1) if moviepy_fps else None,
+            "mismatched_px": mismatched,
+            "mean_abs_diff": round(mean_diff, 3),
+        })
+    print(json.dumps({"size": f"{width}x{height}", "frames": frames, "results": results}, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    size = sys.argv[1] if len(sys.argv) > 1 else "1080x1920"
+    frame_count = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    w, h = (int(v) for v in size.lower().split("x"))
+    run(w, h, frame_count)
@@ -0,0 +1,76 @@
+"""Encode throughput: moviepy write_videofile vs the pipelined ffmpeg writer.
+
+Run from the repo root:  python api/generator/benchmarks/bench_writer.py [WxH] [seconds] [producers]
+The clip is a chain of native fades between synthetic photos, so every frame
+costs real compositing work. Both paths must produce byte-identical files.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from moviepy.editor import ImageClip, concatenate_videoclips
+
+from compositor import native_transition
+from ffmpeg_writer import write_clip
+
+FPS = 30
+SEGMENT = 1.0
+
+
+def synthetic_clip(width, height, seconds):
+    rng = np.random.default_rng(5)
+    photos = [ImageClip(rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)).set_duration(SEGMENT)
+              for _ in range(4)]
+    parts = []
+    for i in range(max(1, int(seconds / SEGMENT))):
+        parts.append(native_transition(photos[i % 4], photos[(i + 1) % 4], SEGMENT, "fade"))
+    return concatenate_videoclips(parts, method="compose")
+
+
+def file_md5(path):
+    with open(path, 'rb') as handle:
+        return hashlib.md5(handle.read()).hexdigest()
+
+
+def run(width=1080, height=1920, seconds=4.0, producers=1):
+    clip = synthetic_clip(width, height, seconds)
+    work = tempfile.mkdtemp(prefix="bench_writer_")
+    try:
+        results = {}
+        for label in ("moviepy", "pipelined"):
+            out_path = os.path.join(work, f"{label}.mp4")
+            start = time.perf_counter()
+            if label == "moviepy":
+                clip.write_videofile(out_path, fps=FPS, codec="libx264", audio=False, preset="veryfast",
+                                     ffmpeg_params=["-crf", "22"], logger=None)
+            else:
+                write_clip(clip, out_path, FPS, "libx264", "veryfast", ffmpeg_params=["-crf", "22"],
+                           producers=producers)
+            elapsed = time.perf_counter() - start
+            results[label] = {
+                "seconds": round(elapsed, 2),
+                "fps": round(int(clip.duration * FPS) / elapsed, 1),
+                "md5": file_md5(out_path),
+            }
+        results["identical"] = results["moviepy"]["md5"] == results["pipelined"]["md5"]
+        results["speedup"] = round(results["moviepy"]["seconds"] / results["pipelined"]["seconds"], 2)
+        print(json.dumps({"size": f"{width}x{height}", "seconds": seconds, "producers": producers,
+                          "cpus": os.cpu_count(), "results": results}, indent=2))
+        return results
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    size = sys.argv[1] if len(sys.argv) > 1 else "1080x1920"
+    clip_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 4.0
+    producer_count = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    w, h = (int(v) for v in size.lower().split("x"))
+    run(w, h, clip_seconds, producer_count)
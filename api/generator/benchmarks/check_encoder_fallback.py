@@ -0,0 +1,160 @@
+"""Encoder probe ordering and fallback against a stub ffmpeg.
+
+Run from the repo root:  python api/generator/benchmarks/check_encoder_fallback.py
+FFMPEG_BINARY points at a stub that passes h264_nvenc's probe instantly (so
+it probes fastest and is tried first by the balanced profile) and hands all
+other calls to the real ffmpeg. One-format jobs then run in two scenarios:
+
+- broken: the first real NVENC encode fails and so does every probe after
+  it. The job falls back to libx264 and NVENC is marked broken; the next job
+  does not start NVENC.
+- transient: only the first real NVENC encode fails (as with NVENC's session
+  limit); later ones are served by libx264 under NVENC's name. NVENC is not
+  marked broken and the next job encodes with it. A fast_parallel job (CPU
+  first) does not start NVENC at all.
+
+Prints the checks as JSON; exits 1 when one fails.
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import imageio_ffmpeg
+
+STUB = """#!{python}
+import os
+import sys
+import json
+
+args = sys.argv[1:]
+with open({log!r}, "a", encoding="utf-8") as handle:
+    handle.write(json.dumps(args) + "\\n")
+failed_once = os.path.exists({marker!r})
+if "h264_nvenc" in args:
+    if args[-2:] == ["null", "-"]:
+        # The probe: a GPU is there until a broken one has failed
+        sys.exit(1 if {mode!r} == "broken" and failed_once else 0)
+    if not failed_once:
+        open({marker!r}, "w").close()
+        sys.stderr.write("[h264_nvenc @ 0x0] OpenEncodeSessionEx failed: out of memory (10)\\n")
+        sys.exit(1)
+    # Later real encodes: libx264 stands in for the GPU
+    args = [a for a in args if a not in ("-cq", "23", "-rc", "vbr", "-b:v", "0")]
+    args = ["libx264" if a == "h264_nvenc" else "veryfast" if a == "p4" else a for a in args]
+os.execv({ffmpeg!r}, [{ffmpeg!r}] + args)
+"""
+
+SETTINGS = {
+    "fps": 6,
+    "secondsPerImage": 1.0,
+    "transition": "fade",
+    "transitionDuration": 0.4,
+    "platforms": {"tiktok": True},
+    "formats": {"tiktok": "9x16"},
+    "preferHardwareEncode": True,
+    "renderProfile": "balanced",
+    "frameCache": False,
+}
+
+
+def nvenc_encodes(log_path):
+    """Real (non-probe) NVENC invocations the stub has seen so far."""
+    if not os.path.exists(log_path):
+        return 0
+    with open(log_path, "r", encoding="utf-8") as handle:
+        calls = [json.loads(line) for line in handle if line.strip()]
+    return sum(1 for args in calls if "h264_nvenc" in args and args[-2:] != ["null", "-"])
+
+
+def encoders_used(formats):
+    return sorted({e.get("encoder") for e in formats})
+
+
+def install_stub(work, mode):
+    """Point FFMPEG_BINARY (and a fresh probe cache) at a stub for this scenario; returns its call log."""
+    directory = os.path.join(work, mode)
+    os.makedirs(directory)
+    log_path = os.path.join(directory, "calls.jsonl")
+    stub_path = os.path.join(directory, "ffmpeg")
+    with open(stub_path, "w", encoding="utf-8") as handle:
+        handle.write(STUB.format(python=sys.executable, log=log_path, marker=os.path.join(directory, "failed"), mode=mode,
+                                 ffmpeg=imageio_ffmpeg.get_ffmpeg_exe()))
+    os.chmod(stub_path, 0o755)
+    os.environ["FFMPEG_BINARY"] = stub_path
+    os.environ["ENCODER_PROBE_CACHE"] = os.path.join(directory, "probe.json")
+    return log_path
+
+
+def broken_scenario(work, images):
+    from moviepy.config import change_settings
+    from encoders import probe_encoders, working_encoders
+    from bench_suite import run_job
+
+    log_path = install_stub(work, "broken")
+    change_settings({"FFMPEG_BINARY": os.environ["FFMPEG_BINARY"]})
+    checks = {}
+    working = working_encoders(cpu_preset="faster")
+    checks["nvenc probed fastest"] = bool(working) and working[0] == "h264_nvenc"
+    checks["libx264 still listed"] = "libx264" in working
+    _, formats, _ = run_job(images, dict(SETTINGS), work)
+    first_attempts = nvenc_encodes(log_path)
+    checks["job 1 tried nvenc"] = first_attempts > 0
+    checks["job 1 fell back to libx264"] = encoders_used(formats) == ["libx264"]
+    checks["nvenc marked broken"] = probe_encoders().get("h264_nvenc", {}).get("ok") is False
+    checks["nvenc dropped from working"] = "h264_nvenc" not in working_encoders()
+    _, formats, _ = run_job(images, dict(SETTINGS), work)
+    checks["job 2 skipped nvenc"] = nvenc_encodes(log_path) == first_attempts
+    checks["job 2 used libx264"] = encoders_used(formats) == ["libx264"]
+    return checks
+
+
+def transient_scenario(work, images):
+    from moviepy.config import change_settings
+    from encoders import probe_encoders
+    from bench_suite import run_job
+
+    log_path = install_stub(work, "transient")
+    change_settings({"FFMPEG_BINARY": os.environ["FFMPEG_BINARY"]})
+    checks = {}
+    _, formats, _ = run_job(images, dict(SETTINGS), work)
+    checks["job 1 tried nvenc"] = nvenc_encodes(log_path) == 1
+    checks["job 1 fell back to libx264"] = encoders_used(formats) == ["libx264"]
+    checks["nvenc not marked broken"] = probe_encoders().get("h264_nvenc", {}).get("ok") is True
+    _, formats, _ = run_job(images, dict(SETTINGS), work)
+    checks["job 2 used nvenc"] = encoders_used(formats) == ["h264_nvenc"]
+    before = nvenc_encodes(log_path)
+    _, formats, _ = run_job(images, dict(SETTINGS, renderProfile="fast_parallel"), work)
+    checks["fast_parallel kept CPU first"] = nvenc_encodes(log_path) == before and encoders_used(formats) == ["libx264"]
+    return checks
+
+
+def main():
+    work = tempfile.mkdtemp(prefix="encoder_fallback_")
+    # moviepy reads FFMPEG_BINARY when it is first imported, so set it before the generator loads
+    install_stub(os.path.join(work, "import"), "none")
+
+    from corpus import make_corpus
+
+    # Generator DEBUG output goes to stderr; stdout is left for the checks JSON
+    original_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    report = {}
+    try:
+        images = make_corpus("small", 2)
+        report["broken"] = broken_scenario(work, images)
+        report["transient"] = transient_scenario(work, images)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+        sys.stdout = original_stdout
+
+    ok = all(value for checks in report.values() for value in checks.values())
+    print(json.dumps({"ok": ok, "checks": report}, indent=2))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
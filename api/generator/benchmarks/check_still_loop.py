@@ -0,0 +1,109 @@
+"""Still-loop encoding (stillLoopEncode) against the single-pipe output.
+
+Run from the repo root:  python api/generator/benchmarks/check_still_loop.py
+Renders one 1x1 format with music from square photos (static bodies) and a
+landscape (a pan), with and without stillLoopEncode, as one task and split
+into segments. The pieced file must decode without errors and match the
+single-pipe render in video frame count and timestamps, and its audio
+packets (muxed with -acodec copy) must be identical, so A/V stay aligned.
+Prints the comparison as JSON; exits 1 when a check fails.
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess as sp
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image
+from moviepy.config import get_setting
+
+from generator import generate_slideshow
+from corpus import synthetic_photo, shape_image
+
+SETTINGS = {
+    "fps": 12,
+    "secondsPerImage": 2.5,
+    "transition": "fade",
+    "transitionDuration": 0.5,
+    "platforms": {"facebook": True},
+    "formats": {"facebook": "1x1"},
+    "preferHardwareEncode": False,
+    "frameCache": False,
+}
+VARIANTS = {
+    "whole": {"segmentParallel": False},
+    "segmented": {"segmentsPerFormat": 2},
+}
+
+
+def photos(work):
+    paths = []
+    for seed in range(3):
+        path = os.path.join(work, f"square{seed}.jpg")
+        Image.fromarray(synthetic_photo(1600, 1600, seed=200 + seed)).save(path, quality=90)
+        paths.append(path)
+    return paths[:2] + [shape_image("landscape")] + paths[2:]
+
+
+def music(work):
+    path = os.path.join(work, "music.m4a")
+    sp.run([get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'sine=frequency=440:duration=2',
+            '-c:a', 'aac', path], check=True)
+    return path
+
+
+def packets(path):
+    """Per-stream (pts, hash) lines from framemd5: decoded video frames, audio packets as stored."""
+    proc = sp.run([get_setting("FFMPEG_BINARY"), '-v', 'error', '-i', path, '-map', '0', '-c:a', 'copy', '-f', 'framemd5', '-'],
+                  stdout=sp.PIPE, stderr=sp.PIPE)
+    streams = {}
+    for line in proc.stdout.decode('utf-8', errors='replace').splitlines():
+        if line.startswith('#') or not line.strip():
+            continue
+        fields = [f.strip() for f in line.split(',')]
+        streams.setdefault(int(fields[0]), []).append((int(fields[2]), fields[5]))
+    return streams, proc.stderr.decode('utf-8', errors='replace').strip()
+
+
+def render(images, settings, out_dir):
+    names = generate_slideshow(images, "still", out_dir, settings)
+    return os.path.join(out_dir, names[0])
+
+
+def main():
+    work = tempfile.mkdtemp(prefix="still_loop_")
+    original_stdout = sys.stdout
+    # Generator DEBUG output goes to stderr; stdout is left for the checks JSON
+    sys.stdout = sys.stderr
+    report = {}
+    try:
+        images = photos(work)
+        base = dict(SETTINGS, musicFile=music(work))
+        for name, extra in VARIANTS.items():
+            pipe_streams, _ = packets(render(images, dict(base, **extra), os.path.join(work, name, "pipe")))
+            still_streams, errors = packets(render(images, dict(base, stillLoopEncode=True, **extra),
+                                                   os.path.join(work, name, "still")))
+            pipe_video, still_video = pipe_streams.get(0, []), still_streams.get(0, [])
+            report[name] = {
+                "frames": [len(pipe_video), len(still_video)],
+                "decodes cleanly": not errors,
+                "same frame count": len(pipe_video) == len(still_video) > 0,
+                "same video timestamps": [pts for pts, _ in pipe_video] == [pts for pts, _ in still_video],
+                "same audio packets": bool(pipe_streams.get(1)) and pipe_streams.get(1) == still_streams.get(1),
+                "identical frames": sum(1 for a, b in zip(pipe_video, still_video) if a[1] == b[1]),
+            }
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+        sys.stdout = original_stdout
+
+    ok = all(value for checks in report.values() for key, value in checks.items()
+             if key not in ("frames", "identical frames"))
+    print(json.dumps({"ok": ok, "checks": report}, indent=2))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
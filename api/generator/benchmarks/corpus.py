@@ -0,0 +1,108 @@
+"""Deterministic synthetic photo corpora for the benchmarks.
+
+Run from the repo root:  python api/generator/benchmarks/corpus.py [name] [count]
+Images are smooth gradients with soft shapes and sensor-like noise, so they
+compress and resample like photos (pure noise does not). Sizes, aspect ratios
+and file types cover what listings upload: camera landscapes and portraits,
+squares, screenshots (PNG), panoramas and small thumbnails. A corpus is
+written once per (name, count, CORPUS_VERSION) under BENCH_CORPUS_DIR (or
+the temp dir) and reused by later runs.
+"""
+import os
+import sys
+import json
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# Bump when the generated pixels change, so stale corpora are not compared
+CORPUS_VERSION = 1
+
+# name: (width, height, file type)
+SHAPES = {
+    "landscape": (4032, 3024, "jpg"),
+    "portrait": (3024, 4032, "jpg"),
+    "square": (2048, 2048, "jpg"),
+    "screenshot": (1920, 1080, "png"),
+    "panorama": (6000, 2000, "jpg"),
+    "tall": (1080, 2400, "png"),
+    "small": (800, 600, "jpg"),
+}
+
+# Shape sequences, cycled to the requested image count
+CORPORA = {
+    # A typical listing: mostly camera landscapes, one portrait and one panorama
+    "listing": ["landscape", "landscape", "portrait", "landscape", "panorama", "landscape", "square", "landscape"],
+    "mixed": list(SHAPES),
+    "phone": ["portrait", "tall", "portrait", "portrait"],
+    "small": ["small", "screenshot", "small", "small"],
+}
+DEFAULT_COUNTS = {"listing": 8, "mixed": 7, "phone": 4, "small": 4}
+
+
+def corpus_root():
+    return os.path.join(os.environ.get("BENCH_CORPUS_DIR") or os.path.join(tempfile.gettempdir(), "slideshow-bench-corpus"),
+                        f"v{CORPUS_VERSION}")
+
+
+def synthetic_photo(width, height, seed):
+    """uint8 RGB array that resamples and compresses like a photo."""
+    rng = np.random.default_rng(seed)
+    # Low-frequency structure at 1/16 scale, upsampled: cheap even for panoramas
+    small_w, small_h = max(8, width // 16), max(8, height // 16)
+    yy, xx = np.mgrid[0:small_h, 0:small_w].astype(np.float32)
+    phase = rng.uniform(0, 2 * np.pi, size=3)
+    channels = [127 + 90 * np.sin(xx / (9 + 3 * c) + yy / (13 + 2 * c) + phase[c]) for c in range(3)]
+    base = np.stack(channels, axis=2)
+    for _ in range(6):
+        # Soft blobs stand in for objects and windows
+        cx, cy = rng.uniform(0, small_w), rng.uniform(0, small_h)
+        radius = rng.uniform(2, max(3, min(small_w, small_h) / 3))
+        blob = np.exp(-((xx - cx) ** 2 + (yy - cy) ** 2) / (2 * radius ** 2))[..., np.newaxis]
+        base = base * (1 - blob) + rng.uniform(0, 255, size=3) * blob
+    image = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8)).resize((width, height), Image.Resampling.BICUBIC)
+    pixels = np.asarray(image, dtype=np.int16)
+    noise = rng.integers(-6, 7, size=(height, width, 1), dtype=np.int16)
+    return np.clip(pixels + noise, 0, 255).astype(np.uint8)
+
+
+def make_corpus(name="listing", count=None):
+    """Paths of the named corpus (written on first use)."""
+    shapes = CORPORA[name]
+    count = int(count or DEFAULT_COUNTS.get(name, len(shapes)))
+    directory = os.path.join(corpus_root(), f"{name}_{count}")
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index in range(count):
+        shape = shapes[index % len(shapes)]
+        width, height, ext = SHAPES[shape]
+        path = os.path.join(directory, f"{index:02d}_{shape}.{ext}")
+        if not os.path.exists(path):
+            tmp_path = path + ".tmp"
+            Image.fromarray(synthetic_photo(width, height, seed=1000 + index)).save(
+                tmp_path, format="PNG" if ext == "png" else "JPEG", quality=90)
+            os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+def shape_image(shape):
+    """One image of the given shape (for per-shape micro-benchmarks)."""
+    directory = os.path.join(corpus_root(), "shapes")
+    os.makedirs(directory, exist_ok=True)
+    width, height, ext = SHAPES[shape]
+    path = os.path.join(directory, f"{shape}.{ext}")
+    if not os.path.exists(path):
+        tmp_path = path + ".tmp"
+        Image.fromarray(synthetic_photo(width, height, seed=sorted(SHAPES).index(shape))).save(
+            tmp_path, format="PNG" if ext == "png" else "JPEG", quality=90)
+        os.replace(tmp_path, path)
+    return path
+
+
+if __name__ == "__main__":
+    corpus_name = sys.argv[1] if len(sys.argv) > 1 else "listing"
+    image_count = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    corpus_paths = make_corpus(corpus_name, image_count)
+    print(json.dumps({"corpus": corpus_name, "dir": os.path.dirname(corpus_paths[0]), "images": corpus_paths}, indent=2))
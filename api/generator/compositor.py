@@ -0,0 +1,245 @@
+import math
+import threading
+import numpy as np
+from PIL import Image
+from moviepy.editor import VideoClip
+
+from masks import get_mask_geometry
+
+# transition name -> (kind, variant); aliases mirror the fallbacks in generate_format
+NATIVE_TRANSITIONS = {
+    "fade": ("fade", None),
+    "blur_crossfade": ("fade", None),
+    "slide_left": ("slide", "left"),
+    "slide_right": ("slide", "right"),
+    "slide_up": ("slide", "up"),
+    "slide_down": ("slide", "down"),
+    "wipe_left": ("wipe", "left"),
+    "wipe_right": ("wipe", "right"),
+    "wipe_up": ("wipe", "up"),
+    "wipe_down": ("wipe", "down"),
+    "luma_wipe": ("wipe", "left"),
+    "directional_blur_wipe": ("wipe", "right"),
+    "circle_open": ("circle", "open"),
+    "circle_close": ("circle", "close"),
+    "page_curl": ("page_curl", None),
+    "ripple": ("ripple", None),
+    "zoom_in": ("zoom", "in"),
+    "zoom_out": ("zoom", "out"),
+    "spin_in": ("spin", "in"),
+    "spin_out": ("spin", "out"),
+    "cube3d": ("spin", "in"),
+    "flip3d": ("spin", "out"),
+    "fly_in": ("fly", "in"),
+    "fly_out": ("fly", "out"),
+}
+
+TRANSFORM_KINDS = ("zoom", "spin", "fly")
+
+
+def as_uint8_frame(frame):
+    # moviepy composites can hand back float frames; its writer truncates them the same way
+    if frame.dtype != np.uint8:
+        return frame.astype(np.uint8)
+    return frame
+
+
+class TransitionCompositor:
+    """Two-source transition renderer writing into a reused uint8 frame.
+
+    Replaces a CompositeVideoClip of two clips with direct array work:
+    slicing for slides/wipes, per-row span copies for shaped masks (circle,
+    page curl, ripple), one integer lerp for fades and one resample of the
+    visible layer region for zoom/spin/fly. Buffers are per thread, and a returned frame is
+    only valid until the next render() call on the same thread.
+    """
+
+    def __init__(self, transition_type, width, height, duration):
+        self.kind, self.variant = NATIVE_TRANSITIONS[transition_type]
+        self.width = width
+        self.height = height
+        self.duration = duration if duration > 0 else 0.01
+        self.geometry = get_mask_geometry(width, height)
+        self._local = threading.local()
+
+    def _buffers(self):
+        local = self._local
+        if not hasattr(local, 'out'):
+            local.out = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+            local.scratch = None
+        return local
+
+    def render(self, frame1, frame2, t):
+        buffers = self._buffers()
+        out = buffers.out
+        progress = min(1.0, max(0.0, t / self.duration))
+        frame1 = as_uint8_frame(frame1)
+        frame2 = as_uint8_frame(frame2)
+        if self.kind == "fade":
+            return self._fade(frame1, frame2, progress, buffers)
+        if self.kind == "slide":
+            return self._slide(frame1, frame2, progress, out)
+        if self.kind == "wipe":
+            return self._wipe(frame1, frame2, progress, out)
+        if self.kind in TRANSFORM_KINDS:
+            return self._transform(frame1, frame2, progress, out)
+        if self.kind == "circle":
+            x0, x1, inverted = self.geometry.circle_spans(self.variant, progress)
+            base, masked = frame1, frame2
+        elif self.kind == "page_curl":
+            w, h = self.width, self.height
+            limit = (w + h) * (1 - progress * 1.5) + (w + h) * 0.25
+            x0, x1, inverted = self.geometry.page_curl_spans(limit)
+            # Outgoing page is the masked layer here
+            base, masked = frame2, frame1
+        else:
+            x0, x1, inverted = self.geometry.ripple_spans(progress, t)
+            base, masked = frame1, frame2
+        if inverted:
+            base, masked = masked, base
+        np.copyto(out, base)
+        for y, start, stop in zip(range(self.height), x0.tolist(), x1.tolist()):
+            if stop > start:
+                out[y, start:stop] = masked[y, start:stop]
+        return out
+
+    def _fade(self, frame1, frame2, progress, buffers):
+        weight = int(round(progress * 256))
+        if weight <= 0:
+            np.copyto(buffers.out, frame1)
+            return buffers.out
+        if weight >= 256:
+            np.copyto(buffers.out, frame2)
+            return buffers.out
+        if buffers.scratch is None:
+            buffers.scratch = (
+                np.empty((self.height, self.width, 3), dtype=np.uint16),
+                np.empty((self.height, self.width, 3), dtype=np.uint16),
+            )
+        acc, tmp = buffers.scratch
+        np.multiply(frame1, 256 - weight, out=acc, dtype=np.uint16)
+        np.multiply(frame2, weight, out=tmp, dtype=np.uint16)
+        acc += tmp
+        acc += 128
+        acc >>= 8
+        np.copyto(buffers.out, acc, casting='unsafe')
+        return buffers.out
+
+    def _slide(self, frame1, frame2, progress, out):
+        w, h = self.width, self.height
+        # Same integer offsets the set_position lambdas produced
+        if self.variant == 'left':
+            offsets = (int(-w * progress), int(w * (1 - progress)))
+        elif self.variant == 'right':
+            offsets = (int(w * progress), int(-w * (1 - progress)))
+        elif self.variant == 'up':
+            offsets = (int(-h * progress), int(h * (1 - progress)))
+        else:
+            offsets = (int(h * progress), int(-h * (1 - progress)))
+        horizontal = self.variant in ('left', 'right')
+        out.fill(0)
+        for frame, offset in zip((frame1, frame2), offsets):
+            size = w if horizontal else h
+            src_start = max(0, -offset)
+            dst_start = max(0, offset)
+            length = size - abs(offset)
+            if length <= 0:
+                continue
+            if horizontal:
+                out[:, dst_start:dst_start + length] = frame[:, src_start:src_start + length]
+            else:
+                out[dst_start:dst_start + length] = frame[src_start:src_start + length]
+        return out
+
+    def _wipe(self, frame1, frame2, progress, out):
+        w, h = self.width, self.height
+        np.copyto(out, frame1)
+        if self.variant == 'left':  # Reveal from right
+            start_x = int(w * (1 - progress))
+            out[:, start_x:] = frame2[:, start_x:]
+        elif self.variant == 'right':
+            end_x = int(w * progress)
+            out[:, :end_x] = frame2[:, :end_x]
+        elif self.variant == 'up':
+            start_y = int(h * (1 - progress))
+            out[start_y:] = frame2[start_y:]
+        else:
+            end_y = int(h * progress)
+            out[:end_y] = frame2[:end_y]
+        return out
+
+
+    def layer_geometry(self, progress):
+        """(scale, angle, x, y) of the moving layer, as the moviepy versions placed it.
+
+        The layer is int(w * scale) x int(h * scale) with its top-left at (x, y);
+        `angle` is the counter-clockwise rotation applied before scaling.
+        """
+        w, h = self.width, self.height
+        growing = self.variant == 'in'
+        scale = 0.01 + 0.99 * progress if growing else 1.0 - 0.99 * progress
+        layer_w, layer_h = int(w * scale), int(h * scale)
+        angle = 0.0
+        if self.kind == "fly":
+            if growing:
+                center_x, center_y = (w / 2) * progress, (h / 2) * progress
+            else:
+                center_x, center_y = (w / 2) + (w / 2) * progress, (h / 2) - (h / 2) * progress
+            return scale, angle, int(center_x - w * scale / 2), int(center_y - h * scale / 2)
+        if self.kind == "spin":
+            angle = 360 * (1 - progress) if growing else 360 * progress
+        # set_position('center'), truncated by moviepy's blit
+        return scale, angle, int((w - layer_w) / 2), int((h - layer_h) / 2)
+
+    def _transform(self, frame1, frame2, progress, out):
+        w, h = self.width, self.height
+        # Incoming clip grows over the outgoing one ('in'); outgoing shrinks away ('out')
+        if self.variant == 'in':
+            base, layer = frame1, frame2
+        else:
+            base, layer = frame2, frame1
+        np.copyto(out, base)
+        scale, angle, x, y = self.layer_geometry(progress)
+        layer_w, layer_h = int(w * scale), int(h * scale)
+        # Only the part of the layer that lands inside the frame is resampled
+        dst_x0, dst_y0 = max(0, x), max(0, y)
+        dst_x1, dst_y1 = min(w, x + layer_w), min(h, y + layer_h)
+        if dst_x1 <= dst_x0 or dst_y1 <= dst_y0:
+            return out
+        region = (dst_x1 - dst_x0, dst_y1 - dst_y0)
+        off_x, off_y = dst_x0 - x, dst_y0 - y
+        sx, sy = layer_w / w, layer_h / h
+        if layer.flags['C_CONTIGUOUS']:
+            source = Image.frombuffer("RGB", (w, h), layer, "raw", "RGB", 0, 1)
+        else:
+            source = Image.fromarray(np.ascontiguousarray(layer))
+        if angle % 360 == 0:
+            # Scale + translate: a filtered box resize of the visible window
+            box = (off_x / sx, off_y / sy, (off_x + region[0]) / sx, (off_y + region[1]) / sy)
+            warped = source.resize(region, Image.Resampling.BILINEAR, box=box)
+        else:
+            # Rotation about the frame center (PIL rotate, expand=False) composed
+            # with the scale and the crop offset into one inverse affine map
+            radians = -math.radians(angle % 360)
+            cos_a, sin_a = math.cos(radians), math.sin(radians)
+            a, b, d, e = cos_a / sx, sin_a / sy, -sin_a / sx, cos_a / sy
+            cx, cy = w / 2.0, h / 2.0
+            c = cx - cos_a * cx - sin_a * cy + a * off_x + b * off_y
+            f = cy + sin_a * cx - cos_a * cy + d * off_x + e * off_y
+            warped = source.transform(region, Image.Transform.AFFINE, (a, b, c, d, e, f),
+                                      resample=Image.Resampling.BILINEAR)
+        out[dst_y0:dst_y1, dst_x0:dst_x1] = np.asarray(warped)
+        return out
+
+
+def native_transition(clip1, clip2, duration, transition_type):
+    """VideoClip blending clip1 -> clip2 with TransitionCompositor."""
+    w, h = clip1.size
+    compositor = TransitionCompositor(transition_type, w, h, duration)
+    c1 = clip1.set_duration(duration)
+    c2 = clip2.set_duration(duration)
+
+    def make_frame(t):
+        return compositor.render(c1.get_frame(t), c2.get_frame(t), t)
+
+    return VideoClip(make_frame, duration=duration)
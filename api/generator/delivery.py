@@ -0,0 +1,61 @@
+"""Delivery of platform files that share one encoded format.
+
+Platforms with the same format get the same bitstream. Instead of a full
+copy per extra platform, the alias is a hardlink, or a reflink (copy-on-write
+clone) when hardlinks are not possible, and a plain copy only as the last
+resort. With settings.deliveryRemux each alias is instead remuxed with
+`-c copy` (no re-encode) to add +faststart and a per-platform comment tag.
+"""
+import os
+import shutil
+import subprocess as sp
+from moviepy.config import get_setting
+
+# Linux FICLONE ioctl (btrfs, xfs, overlayfs on those): clone extents, copy nothing
+FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    import fcntl
+    with open(src, 'rb') as source, open(dst, 'wb') as target:
+        fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+
+
+def link_alias(src, dst):
+    """Make dst an alias of src; returns "hardlink", "reflink" or "copy"."""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except (OSError, AttributeError):
+        pass
+    try:
+        _reflink(src, dst)
+        return "reflink"
+    except (OSError, ImportError):
+        if os.path.exists(dst):
+            os.remove(dst)
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def remux(src, dst, platform_label=None):
+    """Rewrite the container only (-c copy): moov atom up front, platform tag in the metadata."""
+    cmd = [get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error', '-i', src,
+           '-map', '0', '-c', 'copy', '-movflags', '+faststart']
+    if platform_label:
+        cmd.extend(['-metadata', f'comment={platform_label}'])
+    # Write beside dst and rename: dst may still be a hardlink of src from an earlier run
+    tmp_path = dst + ".remux.mp4"
+    cmd.append(tmp_path)
+    popen_params = {"stdout": sp.DEVNULL, "stderr": sp.PIPE}
+    if os.name == "nt":
+        popen_params["creationflags"] = 0x08000000  # CREATE_NO_WINDOW
+    proc = sp.run(cmd, **popen_params)
+    if proc.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise IOError(f"ffmpeg remux failed for {dst}: {proc.stderr.decode('utf-8', errors='replace').strip()}")
+    os.replace(tmp_path, dst)
+    return "remux"
@@ -0,0 +1,221 @@
+"""Which H.264 encoders work on this host, probed once and cached.
+
+Each candidate gets timed test encodes (lavfi test frames at the preset
+generate_format uses, to the null muxer) instead of being discovered by a
+failed full render. Two encodes of different length give the per-frame
+encode time with process and encoder start-up excluded (frameSeconds);
+libx264 is timed at every render profile's preset. working_encoders lists
+the codecs that passed, fastest first for the job's libx264 preset. Results
+are cached in a JSON file per (host, ffmpeg binary) for ENCODER_PROBE_TTL
+seconds (default one day). A codec that fails a real encode is marked broken
+in the cache, so later formats and jobs skip it, but only when a fresh probe
+fails as well: a failure the probe does not reproduce (e.g. NVENC's session
+limit while sibling workers encode) is treated as transient.
+
+FFMPEG_BINARY (moviepy's setting) picks the ffmpeg that is probed, so a stub
+script can stand in for it (benchmarks/check_encoder_fallback.py does).
+
+    python encoders.py            # cached results (probing when stale)
+    python encoders.py refresh    # probe again now
+    python encoders.py clear      # forget cached results
+"""
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import threading
+import subprocess as sp
+from moviepy.config import get_setting
+
+# Bump when the probe command or the result format changes
+PROBE_VERSION = 3
+CANDIDATES = ("h264_nvenc", "h264_qsv", "libx264")
+CPU_CODEC = "libx264"
+# Hardware presets generate_format encodes with
+PROBE_PRESETS = {"h264_nvenc": "p4", "h264_qsv": "medium"}
+# libx264 presets of the render profiles that may use hardware (generator.cpu_encode_options)
+CPU_PRESETS = ("veryfast", "faster", "medium")
+PROBE_SIZE = "1280x720"
+# Short and long encode; their difference is encode time without start-up
+PROBE_FRAMES = (5, 25)
+DEFAULT_TTL_SECONDS = 24 * 3600
+PROBE_TIMEOUT_SECONDS = 20
+
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "slideshow-encoder-probe.json")
+
+_lock = threading.Lock()
+# Results already read or probed by this process: {host key: entry}. The cache
+# file wins over it, since mark_broken usually runs in a pool worker.
+_memo = {}
+
+
+def cache_path():
+    return os.environ.get("ENCODER_PROBE_CACHE") or DEFAULT_CACHE_PATH
+
+
+def probe_ttl():
+    try:
+        return float(os.environ.get("ENCODER_PROBE_TTL", DEFAULT_TTL_SECONDS))
+    except ValueError:
+        return DEFAULT_TTL_SECONDS
+
+
+def ffmpeg_binary():
+    return get_setting("FFMPEG_BINARY")
+
+
+def host_key(ffmpeg):
+    """Cache key: this host plus the identity of the ffmpeg binary (a new build reprobes)."""
+    try:
+        st = os.stat(ffmpeg)
+        binary = f"{os.path.abspath(ffmpeg)}:{st.st_size}:{st.st_mtime_ns}"
+    except OSError:
+        binary = ffmpeg
+    return f"v{PROBE_VERSION}|{socket.gethostname()}|{binary}"
+
+
+def _run_probe(codec, ffmpeg, frames, preset=None):
+    cmd = [ffmpeg or ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-nostdin',
+           '-f', 'lavfi', '-i', f'testsrc2=s={PROBE_SIZE}:r=30', '-frames:v', str(frames),
+           '-c:v', codec]
+    if preset:
+        cmd.extend(['-preset', preset])
+    cmd.extend(['-pix_fmt', 'yuv420p', '-f', 'null', '-'])
+    started = time.perf_counter()
+    try:
+        proc = sp.run(cmd, stdout=sp.DEVNULL, stderr=sp.PIPE, timeout=PROBE_TIMEOUT_SECONDS)
+    except (OSError, sp.TimeoutExpired) as e:
+        return {"ok": False, "seconds": round(time.perf_counter() - started, 3), "error": str(e)[:200]}
+    error = proc.stderr.decode('utf-8', 'replace').strip().splitlines()
+    return {
+        "ok": proc.returncode == 0,
+        "seconds": round(time.perf_counter() - started, 3),
+        "error": None if proc.returncode == 0 else (error[-1] if error else f"exit code {proc.returncode}")[:200],
+    }
+
+
+def probe_encoder(codec, ffmpeg=None, preset=None):
+    """Test encodes with `codec`; returns {"ok", "seconds", "frameSeconds", "error"}.
+
+    frameSeconds is the encode time per frame with start-up excluded (the
+    long probe's time minus the short one's, per extra frame).
+    """
+    preset = preset or PROBE_PRESETS.get(codec)
+    short = _run_probe(codec, ffmpeg, PROBE_FRAMES[0], preset)
+    if not short["ok"]:
+        return dict(short, frameSeconds=None)
+    long = _run_probe(codec, ffmpeg, PROBE_FRAMES[1], preset)
+    if not long["ok"]:
+        return dict(long, frameSeconds=None)
+    per_frame = max(0.0, long["seconds"] - short["seconds"]) / (PROBE_FRAMES[1] - PROBE_FRAMES[0])
+    return {"ok": True, "seconds": long["seconds"], "frameSeconds": round(per_frame, 5), "error": None}
+
+
+def probe_cpu_encoder(ffmpeg=None):
+    """libx264 probed at every CPU_PRESETS preset; "presets" maps preset to frameSeconds."""
+    result = probe_encoder(CPU_CODEC, ffmpeg, CPU_PRESETS[0])
+    result["presets"] = {CPU_PRESETS[0]: result["frameSeconds"]}
+    if result["ok"]:
+        for preset in CPU_PRESETS[1:]:
+            result["presets"][preset] = probe_encoder(CPU_CODEC, ffmpeg, preset)["frameSeconds"]
+    return result
+
+
+def _read_cache():
+    try:
+        with open(cache_path(), "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(data):
+    path = cache_path()
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(data, handle, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: failed to write encoder probe cache {path}: {e}")
+
+
+def probe_encoders(ffmpeg=None, refresh=False, candidates=CANDIDATES):
+    """Probe results for this host, from the cache while they are fresher than the TTL."""
+    ffmpeg = ffmpeg or ffmpeg_binary()
+    key = host_key(ffmpeg)
+    with _lock:
+        entry = None if refresh else _read_cache().get(key) or _memo.get(key)
+        if entry and time.time() - entry.get("checked_at", 0) < probe_ttl() \
+                and all(codec in entry.get("encoders", {}) for codec in candidates):
+            _memo[key] = entry
+            return entry["encoders"]
+        results = {codec: probe_cpu_encoder(ffmpeg) if codec == CPU_CODEC else probe_encoder(codec, ffmpeg)
+                   for codec in candidates}
+        entry = {"checked_at": time.time(), "encoders": results}
+        data = _read_cache()
+        data[key] = entry
+        _write_cache(data)
+        _memo[key] = entry
+    print(f"DEBUG: encoder probe {json.dumps({c: r['ok'] for c, r in results.items()})}")
+    return results
+
+
+def working_encoders(ffmpeg=None, cpu_preset=None):
+    """Codecs that passed the probe, fastest first (CANDIDATES order on ties).
+
+    libx264 is ranked by its time at cpu_preset, the job's render profile
+    preset, when that preset was probed.
+    """
+    results = probe_encoders(ffmpeg)
+
+    def frame_seconds(codec):
+        result = results[codec]
+        if codec == CPU_CODEC and cpu_preset in (result.get("presets") or {}):
+            return result["presets"][cpu_preset] or 0
+        return result.get("frameSeconds") or 0
+
+    working = [codec for codec in CANDIDATES if results.get(codec, {}).get("ok")]
+    return sorted(working, key=frame_seconds)
+
+
+def mark_broken(codec, error, ffmpeg=None):
+    """A codec that passed the probe failed a real encode: skip it until the next probe.
+
+    The codec is probed again first; when that passes the failure is taken
+    as transient (e.g. too many concurrent hardware sessions) and nothing is
+    recorded. Returns whether the codec was marked broken.
+    """
+    ffmpeg = ffmpeg or ffmpeg_binary()
+    recheck = _run_probe(codec, ffmpeg, PROBE_FRAMES[0], PROBE_PRESETS.get(codec))
+    if recheck["ok"]:
+        print(f"Warning: {codec} failed an encode but passes its probe again; not marking it broken ({str(error)[:200]})")
+        return False
+    key = host_key(ffmpeg)
+    with _lock:
+        data = _read_cache()
+        entry = data.get(key) or _memo.get(key)
+        if not entry or codec not in entry.get("encoders", {}):
+            return False
+        entry["encoders"][codec] = {"ok": False, "seconds": 0, "frameSeconds": None, "error": str(error)[:200]}
+        data[key] = entry
+        _write_cache(data)
+        _memo[key] = entry
+    return True
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "show"
+    if command == "clear":
+        if os.path.exists(cache_path()):
+            os.remove(cache_path())
+        print(json.dumps({"cleared": cache_path()}))
+    elif command in ("show", "refresh"):
+        print(json.dumps(probe_encoders(refresh=command == "refresh"), indent=2))
+    else:
+        print(f"Unknown command: {command} (expected show, refresh or clear)")
+        sys.exit(1)
@@ -0,0 +1,369 @@
+"""Pipelined clip writer: frames are composited while ffmpeg encodes earlier ones.
+
+moviepy's write_videofile renders a frame, then blocks until ffmpeg has read
+all of it from the pipe, so compositing and encoding take turns. Here
+producer threads render into a bounded ring of preallocated uint8 frames and
+a writer thread streams finished slots to ffmpeg's stdin straight from
+their memory (no tobytes() copy), in frame order.
+
+The ffmpeg command line, frame times, temp audio handling and proglog
+progress calls match moviepy's, so MyBarLogger's ::PROGRESS:: lines and the
+output file are unchanged.
+
+Ranges of the timeline marked static (timeline.build_segments) can skip the
+pipe: with static_segments, each long enough static run is rendered once,
+written as a single raw frame that ffmpeg loops (-stream_loop) for the run's
+frame count, and the runs are joined with the concat demuxer like segment
+chunks. Every piece uses the same encoder options, so they concatenate with
+-c copy.
+"""
+import os
+import time
+import queue
+import shutil
+import tempfile
+import threading
+import subprocess as sp
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from moviepy.config import get_setting
+
+from timeline import still_runs
+from segments import concat_chunks
+
+DEFAULT_RING_FRAMES = 6
+# Shorter static runs are piped: a still piece costs an ffmpeg start and a keyframe
+MIN_STILL_SECONDS = 1.0
+
+
+def ffmpeg_command(out_path, size, fps, codec, preset, ffmpeg_params=None, threads=None, audio_path=None,
+                   still_path=None, still_frames=None):
+    """The command FFMPEG_VideoWriter builds for an rgb24 rawvideo stream on stdin.
+
+    With still_path (one raw rgb24 frame on disk) that frame is looped for
+    still_frames frames instead of reading stdin.
+    """
+    cmd = [get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error']
+    if still_path is not None:
+        cmd.extend(['-stream_loop', '-1'])
+    cmd.extend([
+        '-f', 'rawvideo',
+        '-vcodec', 'rawvideo',
+        '-s', '%dx%d' % (size[0], size[1]),
+        '-pix_fmt', 'rgb24',
+        '-r', '%.02f' % fps,
+        '-an', '-i', still_path if still_path is not None else '-',
+    ])
+    if still_path is not None:
+        cmd.extend(['-frames:v', str(still_frames)])
+    if audio_path is not None:
+        cmd.extend(['-i', audio_path, '-acodec', 'copy'])
+    cmd.extend(['-vcodec', codec, '-preset', preset])
+    if ffmpeg_params is not None:
+        cmd.extend(ffmpeg_params)
+    if threads is not None:
+        cmd.extend(['-threads', str(threads)])
+    if codec == 'libx264' and size[0] % 2 == 0 and size[1] % 2 == 0:
+        cmd.extend(['-pix_fmt', 'yuv420p'])
+    cmd.append(out_path)
+    return cmd
+
+
+def multi_output_command(outputs, size, fps, codec, preset, ffmpeg_params=None, threads=None, audio_path=None):
+    """One rgb24 stream on stdin, split into several outputs of the same aspect ratio.
+
+    `outputs` lists {"path", "size": (w, h), "overlay": RGBA PNG path or None};
+    each output is scaled to its size (lanczos, like preprocessing resizes) and
+    gets its own overlay, then the same encoder options.
+    """
+    width, height = size
+    cmd = [
+        get_setting("FFMPEG_BINARY"),
+        '-y',
+        '-loglevel', 'error',
+        '-f', 'rawvideo',
+        '-vcodec', 'rawvideo',
+        '-s', '%dx%d' % (width, height),
+        '-pix_fmt', 'rgb24',
+        '-r', '%.02f' % fps,
+        '-an', '-i', '-',
+    ]
+    overlay_inputs = {}
+    for index, output in enumerate(outputs):
+        if output.get("overlay"):
+            overlay_inputs[index] = len(overlay_inputs) + 1
+            cmd.extend(['-i', output["overlay"]])
+    audio_input = len(overlay_inputs) + 1
+    if audio_path is not None:
+        cmd.extend(['-i', audio_path])
+
+    graph = ['[0:v]split=%d%s' % (len(outputs), ''.join('[s%d]' % i for i in range(len(outputs))))]
+    for index, output in enumerate(outputs):
+        out_w, out_h = output["size"]
+        label = '[s%d]' % index
+        if (out_w, out_h) != (width, height):
+            graph.append('%sscale=%d:%d:flags=lanczos[c%d]' % (label, out_w, out_h, index))
+            label = '[c%d]' % index
+        if index in overlay_inputs:
+            # A single still input repeats its last frame; blend in RGB like StaticOverlay does
+            graph.append('%s[%d:v]overlay=0:0:format=rgb[v%d]' % (label, overlay_inputs[index], index))
+        else:
+            graph.append('%snull[v%d]' % (label, index))
+    cmd.extend(['-filter_complex', ';'.join(graph)])
+
+    for index, output in enumerate(outputs):
+        out_w, out_h = output["size"]
+        cmd.extend(['-map', '[v%d]' % index])
+        if audio_path is not None:
+            cmd.extend(['-map', '%d:a' % audio_input, '-acodec', 'copy'])
+        cmd.extend(['-vcodec', codec, '-preset', preset])
+        if ffmpeg_params is not None:
+            cmd.extend(ffmpeg_params)
+        if threads is not None:
+            cmd.extend(['-threads', str(threads)])
+        if codec == 'libx264' and out_w % 2 == 0 and out_h % 2 == 0:
+            cmd.extend(['-pix_fmt', 'yuv420p'])
+        cmd.append(output["path"])
+    return cmd
+
+
+def _write_all(fd, buffer):
+    view = memoryview(buffer).cast('B')
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+class FrameRing:
+    """Preallocated frame slots handed out by index; at most len(slots) frames in flight."""
+
+    def __init__(self, slots, shape):
+        self.buffers = [np.empty(shape, dtype=np.uint8) for _ in range(slots)]
+        self.free = queue.Queue()
+        for index in range(slots):
+            self.free.put(index)
+
+
+def write_clip(clip, out_path, fps, codec, preset, ffmpeg_params=None, threads=None, audio_codec=None,
+               logger=None, ring_frames=DEFAULT_RING_FRAMES, producers=1, frame_range=None, outputs=None, audio_file=None,
+               stats=None, static_segments=None):
+    """Encode `clip` to out_path; drop-in for clip.write_videofile with the options generate_format uses.
+
+    frame_range=(start, end) encodes only those frame indices (end None = to
+    the end), at the same frame times a full render uses; segment-parallel
+    chunks rely on this to concatenate into the full timeline.
+    outputs (see multi_output_command) writes several scaled outputs from
+    this one frame stream in a single ffmpeg process instead of out_path.
+    audio_file is an already encoded track (audio_track.prepare_track) that
+    is muxed as is, in place of encoding clip.audio.
+    stats (a dict) receives frames, renderSeconds (summed over producers),
+    pipeSeconds (time the writer was blocked on ffmpeg's stdin) and
+    encoderPeakRssMB (Linux only, else None); with still pieces also
+    stillFrames, the frames ffmpeg looped instead of reading the pipe.
+    static_segments (the clip's timeline segments) encodes static runs of at
+    least MIN_STILL_SECONDS as looped stills; not used with outputs, whose
+    filter graph reads the pipe.
+    Raises IOError with ffmpeg's stderr when the encoder fails (e.g. an
+    unavailable hardware codec), so callers can fall back to another codec.
+    """
+    audio_path = audio_file
+    temp_audio = None
+    if audio_path is None and audio_codec and clip.audio is not None:
+        # write_videofile writes the track first and muxes it with -acodec copy
+        audio_path = temp_audio = os.path.splitext(out_path)[0] + "_TEMP_wvf_snd.m4a"
+        clip.audio.write_audiofile(audio_path, 44100, 4, 2000, audio_codec, logger=logger)
+    try:
+        runs = None
+        if static_segments and not outputs:
+            first, last = frame_range if frame_range is not None else (0, None)
+            times = np.arange(0, clip.duration, 1.0 / fps)[first:last]
+            runs = still_runs(static_segments, times, first_frame=first, min_frames=max(2, int(MIN_STILL_SECONDS * fps)))
+        if runs and any(static for _, _, static in runs):
+            _encode_pieces(clip, out_path, fps, codec, preset, ffmpeg_params, threads, audio_path,
+                           logger, max(2, int(ring_frames)), max(1, int(producers)), runs, stats)
+        else:
+            _encode_frames(clip, out_path, fps, codec, preset, ffmpeg_params, threads, audio_path,
+                           logger, max(2, int(ring_frames)), max(1, int(producers)), frame_range, outputs, stats)
+    finally:
+        if temp_audio and os.path.exists(temp_audio):
+            os.remove(temp_audio)
+
+
+class _PieceLogger:
+    """Forwards one piece's frame progress as progress through the whole clip."""
+
+    def __init__(self, logger, offset):
+        self.logger = logger
+        self.offset = offset
+
+    def __call__(self, **changes):
+        if "t__index" in changes:
+            self.logger(t__index=self.offset + changes["t__index"])
+
+
+def _encode_still(clip, t, piece_path, still_path, frames, fps, codec, preset, ffmpeg_params, threads):
+    """Render the frame at t once and let ffmpeg loop it `frames` times; returns the render seconds."""
+    started = time.perf_counter()
+    frame = np.empty((clip.size[1], clip.size[0], 3), dtype=np.uint8)
+    np.copyto(frame, clip.get_frame(t), casting='unsafe')
+    with open(still_path, 'wb') as handle:
+        handle.write(frame.tobytes())
+    render_seconds = time.perf_counter() - started
+    cmd = ffmpeg_command(piece_path, clip.size, fps, codec, preset, ffmpeg_params, threads,
+                         still_path=still_path, still_frames=frames)
+    popen_params = {"stdout": sp.DEVNULL, "stderr": sp.PIPE, "stdin": sp.DEVNULL}
+    if os.name == "nt":
+        popen_params["creationflags"] = 0x08000000  # CREATE_NO_WINDOW
+    proc = sp.run(cmd, **popen_params)
+    if proc.returncode != 0:
+        raise IOError(f"ffmpeg failed writing {piece_path} (exit code {proc.returncode}): "
+                      f"{proc.stderr.decode('utf-8', errors='replace').strip()}")
+    return render_seconds
+
+
+def _encode_pieces(clip, out_path, fps, codec, preset, ffmpeg_params, threads, audio_path, logger, ring_frames, producers,
+                   runs, stats=None):
+    """Encode (start, end, static) frame runs as separate pieces and concatenate them into out_path."""
+    times = np.arange(0, clip.duration, 1.0 / fps)
+    total = sum(end - start for start, end, _ in runs)
+    totals = {"frames": 0, "renderSeconds": 0.0, "pipeSeconds": 0.0, "stillFrames": 0}
+    peaks = []
+    piece_dir = tempfile.mkdtemp(prefix="pieces_", dir=os.path.dirname(os.path.abspath(out_path)))
+    if logger is not None:
+        logger(t__total=total)
+        logger(t__index=0)
+    try:
+        piece_paths = []
+        for number, (start, end, static) in enumerate(runs):
+            piece_path = os.path.join(piece_dir, f"piece_{number}.mp4")
+            if static:
+                totals["renderSeconds"] += _encode_still(clip, times[start], piece_path, os.path.join(piece_dir, "still.rgb"),
+                                                         end - start, fps, codec, preset, ffmpeg_params, threads)
+                totals["frames"] += end - start
+                totals["stillFrames"] += end - start
+                if logger is not None:
+                    logger(t__index=totals["frames"])
+            else:
+                piece_stats = {}
+                _encode_frames(clip, piece_path, fps, codec, preset, ffmpeg_params, threads, None,
+                               _PieceLogger(logger, totals["frames"]) if logger is not None else None,
+                               ring_frames, producers, (start, end), stats=piece_stats)
+                for key in ("frames", "renderSeconds", "pipeSeconds"):
+                    totals[key] += piece_stats[key]
+                peaks.append(piece_stats["encoderPeakRssMB"])
+            piece_paths.append(piece_path)
+        concat_chunks(piece_paths, out_path, os.path.join(piece_dir, "pieces.txt"), audio_path=audio_path,
+                      durations=[(end - start) / float(fps) for start, end, _ in runs])
+    finally:
+        shutil.rmtree(piece_dir, ignore_errors=True)
+    if stats is not None:
+        known = [peak for peak in peaks if peak is not None]
+        stats.update(frames=totals["frames"], renderSeconds=round(totals["renderSeconds"], 3),
+                     pipeSeconds=round(totals["pipeSeconds"], 3), stillFrames=totals["stillFrames"],
+                     encoderPeakRssMB=max(known) if known else None)
+
+
+def _peak_rss_mb(pid):
+    """Peak resident memory of a running process from /proc (None where unavailable)."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as handle:
+            for line in handle:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _encode_frames(clip, out_path, fps, codec, preset, ffmpeg_params, threads, audio_path, logger, ring_frames, producers,
+                   frame_range=None, outputs=None, stats=None):
+    width, height = clip.size
+    times = np.arange(0, clip.duration, 1.0 / fps)
+    if frame_range is not None:
+        times = times[frame_range[0]:frame_range[1]]
+    ring = FrameRing(ring_frames, (height, width, 3))
+    # Bounded by the ring: the writer sees frames in order, each with its render future
+    pending = queue.Queue()
+    abort = threading.Event()
+    errors = []
+    timing_lock = threading.Lock()
+    timing = {"frames": 0, "renderSeconds": 0.0, "pipeSeconds": 0.0}
+
+    popen_params = {"stdout": sp.DEVNULL, "stdin": sp.PIPE}
+    if os.name == "nt":
+        popen_params["creationflags"] = 0x08000000  # CREATE_NO_WINDOW
+    stderr_log = tempfile.TemporaryFile()
+    popen_params["stderr"] = stderr_log
+    if outputs:
+        cmd = multi_output_command(outputs, (width, height), fps, codec, preset, ffmpeg_params, threads, audio_path)
+    else:
+        cmd = ffmpeg_command(out_path, (width, height), fps, codec, preset, ffmpeg_params, threads, audio_path)
+    proc = sp.Popen(cmd, **popen_params)
+
+    def render(slot, t):
+        started = time.perf_counter()
+        frame = clip.get_frame(t)
+        # Same conversion as iter_frames(dtype="uint8")
+        np.copyto(ring.buffers[slot], frame, casting='unsafe')
+        with timing_lock:
+            timing["renderSeconds"] += time.perf_counter() - started
+
+    def writer():
+        fd = proc.stdin.fileno()
+        written = 0
+        try:
+            while True:
+                item = pending.get()
+                if item is None:
+                    return
+                slot, future = item
+                future.result()
+                started = time.perf_counter()
+                _write_all(fd, ring.buffers[slot])
+                timing["pipeSeconds"] += time.perf_counter() - started
+                ring.free.put(slot)
+                written += 1
+                timing["frames"] = written
+                if logger is not None:
+                    logger(t__index=written)
+        except Exception as err:
+            errors.append(err)
+            abort.set()
+            # Unblock the dispatcher if it waits for a slot
+            for _ in range(ring_frames):
+                ring.free.put(None)
+
+    if logger is not None:
+        logger(t__total=len(times))
+        logger(t__index=0)
+    writer_thread = threading.Thread(target=writer, name="ffmpeg-writer", daemon=True)
+    writer_thread.start()
+    try:
+        with ThreadPoolExecutor(max_workers=producers, thread_name_prefix="frame-producer") as pool:
+            for t in times:
+                slot = ring.free.get()
+                if slot is None or abort.is_set():
+                    break
+                pending.put((slot, pool.submit(render, slot, t)))
+            pending.put(None)
+            writer_thread.join()
+    finally:
+        # ffmpeg has seen every frame; its memory peak is behind it
+        timing["encoderPeakRssMB"] = _peak_rss_mb(proc.pid)
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+        returncode = proc.wait()
+        stderr_log.seek(0)
+        ffmpeg_error = stderr_log.read().decode('utf-8', errors='replace')
+        stderr_log.close()
+
+    if stats is not None:
+        stats.update(frames=timing["frames"], renderSeconds=round(timing["renderSeconds"], 3),
+                     pipeSeconds=round(timing["pipeSeconds"], 3), encoderPeakRssMB=timing["encoderPeakRssMB"])
+    if errors or returncode != 0:
+        cause = errors[0] if errors else None
+        if isinstance(cause, (OSError, ValueError)) or cause is None:
+            raise IOError(f"ffmpeg failed writing {out_path} (exit code {returncode}): {ffmpeg_error.strip() or cause}")
+        raise cause
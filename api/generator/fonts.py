@@ -0,0 +1,184 @@
+import os
+import threading
+from functools import lru_cache
+from PIL import ImageFont
+
+PROJECT_FONT_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'public', 'fonts')
+
+# Resolved (family, key, script, size) -> FreeTypeFont entries kept per process.
+# Captions use a handful of sizes per format, so a few hundred covers a whole job.
+FONT_CACHE_SIZE = max(16, int(os.environ.get('FONT_CACHE_SIZE', '256')))
+
+FONT_FILE_MAP = {
+    'ka_notosansgeorgian': ['NotoSansGeorgian-Regular.ttf', 'NotoSansGeorgian.ttf', 'NotoSansGeorgian-Bold.ttf'],
+    'ka_notosansgeorgian_regular': ['NotoSansGeorgian-Regular.ttf', 'NotoSansGeorgian.ttf'],
+    'ka_bpg_glaho': ['BPG_Glaho.ttf', 'bpg-glaho-webfont.ttf', 'bpg_nino_mkhedruli_bold.otf'],
+    'ka_sylfaen': ['Sylfaen.ttf', 'sylfaen.ttf'],
+    'en_inter': ['Inter-Regular.ttf', 'Inter.ttf', 'Inter-VariableFont_slnt,wght.ttf', 'Inter-VariableFont_opsz,wght.ttf', 'Inter_24pt-Regular.ttf', 'Inter_18pt-Regular.ttf'],
+    'en_inter_regular': ['Inter-Regular.ttf', 'Inter.ttf', 'Inter-VariableFont_slnt,wght.ttf', 'Inter-VariableFont_opsz,wght.ttf', 'Inter_24pt-Regular.ttf', 'Inter_18pt-Regular.ttf'],
+    'en_roboto_bold': ['Roboto-Bold.ttf', 'Roboto-Bold.ttf'],
+    'en_playfairdisplay_regular': ['PlayfairDisplay-Regular.ttf', 'PlayfairDisplay.ttf'],
+    'ru_notosans': ['NotoSans-Regular.ttf', 'NotoSans.ttf', 'NotoSans-Bold.ttf'],
+    'ru_notosans_regular': ['NotoSans-Regular.ttf', 'NotoSans.ttf'],
+    'ru_roboto_regular': ['Roboto-Regular.ttf', 'Roboto.ttf'],
+    'ru_montserrat_regular': ['Montserrat-Regular.ttf', 'Montserrat.ttf'],
+    'noto sans georgian': ['NotoSansGeorgian-Regular.ttf', 'NotoSansGeorgian.ttf'],
+    'bpg glaho': ['BPG_Glaho.ttf', 'bpg-glaho-webfont.ttf', 'bpg_nino_mkhedruli_bold.otf'],
+    'sylfaen': ['Sylfaen.ttf', 'sylfaen.ttf'],
+    'inter': ['Inter-Regular.ttf', 'Inter.ttf', 'Inter-VariableFont_slnt,wght.ttf'],
+    'roboto': ['Roboto-Regular.ttf', 'Roboto-Bold.ttf', 'Roboto.ttf'],
+    'playfair display': ['PlayfairDisplay-Regular.ttf', 'PlayfairDisplay.ttf'],
+    'montserrat': ['Montserrat-Regular.ttf', 'Montserrat.ttf'],
+    'noto sans': ['NotoSans-Regular.ttf', 'NotoSans.ttf', 'NotoSans-Bold.ttf']
+}
+
+GEORGIAN_CANDIDATES = [
+    'NotoSansGeorgian-Regular.ttf',
+    'NotoSansGeorgian.ttf',
+    'NotoSansGeorgian-Bold.ttf',
+    'BPG_Glaho.ttf',
+    'bpg-glaho-webfont.ttf',
+    'Sylfaen.ttf',
+    'sylfaen.ttf',
+    'segoeui.ttf',
+    'segoeuib.ttf'
+]
+
+_index_lock = threading.Lock()
+_font_index = None
+_stats = {'index_builds': 0}
+
+
+def contains_georgian(value):
+    return any('\u10A0' <= ch <= '\u10FF' for ch in value or '')
+
+
+def script_for_text(value):
+    """Script bucket used for font resolution ('georgian' or 'latin')."""
+    return 'georgian' if contains_georgian(value) else 'latin'
+
+
+def get_font_index():
+    """Lower-cased file name -> path for everything under public/fonts, built once per process."""
+    global _font_index
+    if _font_index is not None:
+        return _font_index
+    with _index_lock:
+        if _font_index is None:
+            index = {}
+            if os.path.isdir(PROJECT_FONT_DIR):
+                for root, _, files in os.walk(PROJECT_FONT_DIR):
+                    for file_name in files:
+                        key_name = file_name.lower()
+                        if key_name not in index:
+                            index[key_name] = os.path.join(root, file_name)
+            _stats['index_builds'] += 1
+            _font_index = index
+    return _font_index
+
+
+def _candidate_paths(family, key, script):
+    candidates = []
+    font_dir = None
+    if os.name == 'nt':
+        windir = os.environ.get('WINDIR', 'C:\\Windows')
+        font_dir = os.path.join(windir, 'Fonts')
+    project_font_index = get_font_index()
+
+    def add_candidate(name):
+        if not name:
+            return
+        candidates.append(name)
+        if font_dir:
+            candidates.append(os.path.join(font_dir, name))
+        candidates.append(os.path.join(PROJECT_FONT_DIR, name))
+        match_path = project_font_index.get(name.lower())
+        if match_path:
+            candidates.append(match_path)
+
+    family_key = family.lower()
+    has_georgian = script == 'georgian'
+
+    if has_georgian:
+        for candidate in GEORGIAN_CANDIDATES:
+            add_candidate(candidate)
+
+    if family_key:
+        add_candidate(family)
+        add_candidate(f"{family}.ttf")
+        add_candidate(f"{family}.otf")
+
+    for name in FONT_FILE_MAP.get(key, []):
+        add_candidate(name)
+    for name in FONT_FILE_MAP.get(family_key, []):
+        add_candidate(name)
+
+    if has_georgian:
+        add_candidate('Sylfaen.ttf')
+        add_candidate('sylfaen.ttf')
+        add_candidate('segoeui.ttf')
+
+    add_candidate('segoeui.ttf')
+    add_candidate('segoeuib.ttf')
+    add_candidate('arial.ttf')
+    add_candidate('DejaVuSans.ttf')
+    return candidates
+
+
+@lru_cache(maxsize=None)
+def _resolve_font_path(family, key, script):
+    """First candidate FreeType can open, or None. Size independent, so cached unbounded."""
+    for candidate in _candidate_paths(family, key, script):
+        try:
+            ImageFont.truetype(candidate, 12)
+            return candidate
+        except Exception:
+            continue
+    if script == 'georgian':
+        print("Warning: Georgian text detected but no compatible font found. Falling back to default.")
+    return None
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _load_font_cached(family, key, script, size):
+    path = _resolve_font_path(family, key, script)
+    if path is None:
+        return ImageFont.load_default()
+    try:
+        return ImageFont.truetype(path, size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+def load_font(family, key, text_value, size):
+    """Resolve a font for the given family/key/text at `size`, memoized per process."""
+    return load_font_for_script(family, key, script_for_text(text_value), size)
+
+
+def load_font_for_script(family, key, script, size):
+    family = (family or '').strip()
+    key = (key or '').strip().lower()
+    return _load_font_cached(family, key, script, int(size))
+
+
+def font_cache_stats():
+    info = _load_font_cached.cache_info()
+    path_info = _resolve_font_path.cache_info()
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'max_size': info.maxsize,
+        'path_hits': path_info.hits,
+        'path_misses': path_info.misses,
+        'index_builds': _stats['index_builds'],
+        'indexed_files': len(_font_index or {}),
+    }
+
+
+def clear_font_cache():
+    global _font_index
+    _load_font_cached.cache_clear()
+    _resolve_font_path.cache_clear()
+    with _index_lock:
+        _font_index = None
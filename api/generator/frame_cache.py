@@ -0,0 +1,200 @@
+"""Persistent content-addressed cache of preprocessed frames.
+
+Entries are keyed by (source content hash, target w/h, preprocess variant) and
+live under <root>/v<PREPROCESS_VERSION>/, so bumping the version orphans every
+old entry at once. Writes go through a temp file + os.replace, which keeps
+concurrent format workers from ever seeing a partial frame. Hits refresh the
+entry's mtime; eviction drops the oldest entries until the cache fits its cap.
+
+    python frame_cache.py stats    # entries / bytes on disk
+    python frame_cache.py prune    # drop entries from older preprocess versions
+    python frame_cache.py clear    # drop everything
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from functools import lru_cache
+
+# Bump whenever preprocess_image produces different pixels for the same input
+PREPROCESS_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "slideshow-frame-cache")
+DEFAULT_MAX_MB = 1024
+
+
+@lru_cache(maxsize=512)
+def _hash_file(path, size, mtime_ns):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_hash(path):
+    """sha256 of a file's bytes, memoized per (path, size, mtime)."""
+    st = os.stat(path)
+    return _hash_file(os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+
+class FrameCache:
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.version_dir = os.path.join(root, f"v{PREPROCESS_VERSION}")
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+    def key(self, image_path, width, height, variant=""):
+        raw = f"{content_hash(image_path)}:{width}x{height}:{variant}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def path_for(self, key, ext=".jpg"):
+        return os.path.join(self.version_dir, key[:2], f"{key}{ext}")
+
+    def contains(self, key, ext=".jpg"):
+        return os.path.exists(self.path_for(key, ext))
+
+    def fetch(self, key, dest_path):
+        """Link (or copy) a cached frame to dest_path. Returns False on a miss.
+
+        The entry type (.jpg or .npy) follows dest_path's extension.
+        """
+        cached = self.path_for(key, os.path.splitext(dest_path)[1])
+        try:
+            os.utime(cached)
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            try:
+                os.link(cached, dest_path)
+            except OSError:
+                shutil.copyfile(cached, dest_path)
+        except FileNotFoundError:
+            # Never stored, or evicted by another worker in the meantime
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key, src_path):
+        cached = self.path_for(key, os.path.splitext(src_path)[1])
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cached), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as dst, open(src_path, 'rb') as src:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp_path, cached)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self.stores += 1
+
+    def _entries(self):
+        entries = []
+        for dirpath, _dirs, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith((".jpg", ".npy")):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Still open elsewhere (Windows); try again on the next batch
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self.evicted += removed
+        return removed
+
+    def prune(self):
+        """Drop entries written by older preprocess versions."""
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name != f"v{PREPROCESS_VERSION}" and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def stats(self, disk=False):
+        total = self.hits + self.misses
+        result = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evicted": self.evicted,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+        if disk:
+            entries = self._entries()
+            result["entries"] = len(entries)
+            result["bytes"] = sum(size for _, size, _ in entries)
+            result["max_bytes"] = self.max_bytes
+            result["root"] = self.root
+        return result
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_frame_cache():
+    """Process-wide cache configured from PREPROCESS_CACHE_DIR / PREPROCESS_CACHE_MAX_MB."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            root = os.environ.get('PREPROCESS_CACHE_DIR') or DEFAULT_CACHE_DIR
+            max_mb = int(os.environ.get('PREPROCESS_CACHE_MAX_MB', str(DEFAULT_MAX_MB)))
+            _cache = FrameCache(root, max_mb * 1024 * 1024)
+        return _cache
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = get_frame_cache()
+    if command == "clear":
+        cache.clear()
+        print(json.dumps({"cleared": cache.root}))
+    elif command == "prune":
+        print(json.dumps({"pruned_versions": cache.prune()}))
+    elif command == "stats":
+        print(json.dumps(cache.stats(disk=True)))
+    else:
+        print(f"Unknown command: {command} (expected stats, prune or clear)")
+        sys.exit(1)
@@ -4,7 +4,7 @@ import json
 import shutil
 import argparse
 import multiprocessing
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import numpy as np
 
 # Monkey patch for Pillow 10+ which removed ANTIALIAS
@@ -15,36 +15,30 @@ if not hasattr(Image, 'ANTIALIAS'):
         Image.ANTIALIAS = Image.LANCZOS
 
 from moviepy.editor import ImageClip, CompositeVideoClip, concatenate_videoclips, AudioFileClip, CompositeAudioClip
-from preprocess import preprocess_images
+from moviepy.audio.fx.all import audio_loop
+from preprocess import preprocess_images, frame_variant, frame_extension, HANDOFF_MODES
+from frame_cache import get_frame_cache
+from fonts import load_font, load_font_for_script, font_cache_stats
+from text_layout import get_glyph_metrics, stroke_layer, wrap_text
+from overlay import StaticOverlay, apply_static_overlay
+from compositor import NATIVE_TRANSITIONS, native_transition
+from timeline import build_segments, reuse_static_frames
+from panzoom import pan_zoom_clip, ZOOM_MODES, DEFAULT_ZOOM_AMOUNT
+from ffmpeg_writer import write_clip, DEFAULT_RING_FRAMES
+from encoders import working_encoders, mark_broken, CPU_CODEC
+from delivery import link_alias, remux
+from audio_track import prepare_track
+from segments import plan_parts, segment_costs, plan_chunks, SegmentProgressLogger, concat_chunks
+from progress import init_worker, report as report_progress
+from telemetry import emit as emit_telemetry, StageTimer, peak_rss_mb, hit_rate
+from resources import plan_resources, finalize_plan, task_settings, format_ffmpeg_threads
+from sources import decode_sources, load_source_array, source_size, reduced_decode_enabled, open_reduced
 from transitions import (
     slide_transition, zoom_transition, wipe_transition,
     circle_transition, pixelate_transition, spin_transition, 
     fly_transition, page_curl_transition, ripple_transition
 )
 
-FONT_FILE_MAP = {
-    'ka_notosansgeorgian': ['NotoSansGeorgian-Regular.ttf', 'NotoSansGeorgian.ttf', 'NotoSansGeorgian-Bold.ttf'],
-    'ka_notosansgeorgian_regular': ['NotoSansGeorgian-Regular.ttf', 'NotoSansGeorgian.ttf'],
-    'ka_bpg_glaho': ['BPG_Glaho.ttf', 'bpg-glaho-webfont.ttf', 'bpg_nino_mkhedruli_bold.otf'],
-    'ka_sylfaen': ['Sylfaen.ttf', 'sylfaen.ttf'],
-    'en_inter': ['Inter-Regular.ttf', 'Inter.ttf', 'Inter-VariableFont_slnt,wght.ttf', 'Inter-VariableFont_opsz,wght.ttf', 'Inter_24pt-Regular.ttf', 'Inter_18pt-Regular.ttf'],
-    'en_inter_regular': ['Inter-Regular.ttf', 'Inter.ttf', 'Inter-VariableFont_slnt,wght.ttf', 'Inter-VariableFont_opsz,wght.ttf', 'Inter_24pt-Regular.ttf', 'Inter_18pt-Regular.ttf'],
-    'en_roboto_bold': ['Roboto-Bold.ttf', 'Roboto-Bold.ttf'],
-    'en_playfairdisplay_regular': ['PlayfairDisplay-Regular.ttf', 'PlayfairDisplay.ttf'],
-    'ru_notosans': ['NotoSans-Regular.ttf', 'NotoSans.ttf', 'NotoSans-Bold.ttf'],
-    'ru_notosans_regular': ['NotoSans-Regular.ttf', 'NotoSans.ttf'],
-    'ru_roboto_regular': ['Roboto-Regular.ttf', 'Roboto.ttf'],
-    'ru_montserrat_regular': ['Montserrat-Regular.ttf', 'Montserrat.ttf'],
-    'noto sans georgian': ['NotoSansGeorgian-Regular.ttf', 'NotoSansGeorgian.ttf'],
-    'bpg glaho': ['BPG_Glaho.ttf', 'bpg-glaho-webfont.ttf', 'bpg_nino_mkhedruli_bold.otf'],
-    'sylfaen': ['Sylfaen.ttf', 'sylfaen.ttf'],
-    'inter': ['Inter-Regular.ttf', 'Inter.ttf', 'Inter-VariableFont_slnt,wght.ttf'],
-    'roboto': ['Roboto-Regular.ttf', 'Roboto-Bold.ttf', 'Roboto.ttf'],
-    'playfair display': ['PlayfairDisplay-Regular.ttf', 'PlayfairDisplay.ttf'],
-    'montserrat': ['Montserrat-Regular.ttf', 'Montserrat.ttf'],
-    'noto sans': ['NotoSans-Regular.ttf', 'NotoSans.ttf', 'NotoSans-Bold.ttf']
-}
-
 # Formats definition
 FORMATS = {
     "9x16": (1080, 1920),
@@ -67,6 +61,10 @@ ALLOWED_FORMATS = {
     "youtube": {"9x16", "16x9"}
 }
 
+# renderProfile "preview": short side in pixels and fps cap (previewResolution / previewFps)
+PREVIEW_RESOLUTION = 360
+PREVIEW_FPS = 12
+
 def clean_temp(path):
     if os.path.exists(path):
         try:
@@ -81,6 +79,8 @@ class MyBarLogger(ProgressBarLogger):
     def __init__(self, fmt):
         super().__init__()
         self.fmt = fmt
+        # Multi-output encodes report the same progress for every format they write
+        self.formats = list(fmt) if isinstance(fmt, (list, tuple)) else [fmt]
 
     def callback(self, **changes):
         pass
@@ -88,133 +88,37 @@ class MyBarLogger(ProgressBarLogger):
     def bars_callback(self, bar, attr, value, old_value=None):
         if bar == 't' and 'total' in self.bars[bar]:
              percentage = (value / self.bars[bar]['total']) * 100
-             # Print to stderr to capture in node
-             sys.stderr.write(f"::PROGRESS::{self.fmt}::{int(percentage)}\n")
-             sys.stderr.flush()
+             # stderr for node (or the service's event queue)
+             for fmt in self.formats:
+                 report_progress(fmt, percentage)
 
-def create_pil_text_clip(text, fontsize, color, stroke_width, width, height, align, position_y, position_x=None, font_family=None, font_key=None, letter_spacing=0, line_height=1.0, font_weight=None):
+def render_pil_text_image(text, fontsize, color, stroke_width, width, align, font_family=None, font_key=None, letter_spacing=0):
+    """Render one text line as a full-width RGBA PIL image (None on failure)."""
     try:
-        def contains_georgian(value):
-            return any('\u10A0' <= ch <= '\u10FF' for ch in value)
-
-        def load_font(family, size, text_value, key_value):
-            candidates = []
-            font_dir = None
-            project_font_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'public', 'fonts')
-            project_font_index = None
-            if project_font_dir and os.path.isdir(project_font_dir):
-                project_font_index = {}
-                for root, _, files in os.walk(project_font_dir):
-                    for file_name in files:
-                        key_name = file_name.lower()
-                        if key_name not in project_font_index:
-                            project_font_index[key_name] = os.path.join(root, file_name)
-            if os.name == 'nt':
-                windir = os.environ.get('WINDIR', 'C:\\Windows')
-                font_dir = os.path.join(windir, 'Fonts')
-
-            def add_candidate(name):
-                if not name:
-                    return
-                candidates.append(name)
-                if font_dir:
-                    candidates.append(os.path.join(font_dir, name))
-                if project_font_dir:
-                    candidates.append(os.path.join(project_font_dir, name))
-                    if project_font_index:
-                        match_path = project_font_index.get(name.lower())
-                        if match_path:
-                            candidates.append(match_path)
-
-            family_key = (family or '').strip().lower()
-            key_normalized = (key_value or '').strip().lower()
-            has_georgian = contains_georgian(text_value)
-
-            if has_georgian:
-                for candidate in [
-                    'NotoSansGeorgian-Regular.ttf',
-                    'NotoSansGeorgian.ttf',
-                    'NotoSansGeorgian-Bold.ttf',
-                    'Sylfaen.ttf',
-                    'sylfaen.ttf',
-                    'segoeui.ttf',
-                    'segoeuib.ttf'
-                ]:
-                    add_candidate(candidate)
-
-            if family_key:
-                add_candidate(family)
-                add_candidate(f"{family}.ttf")
-                add_candidate(f"{family}.otf")
-
-            for name in FONT_FILE_MAP.get(key_normalized, []):
-                add_candidate(name)
-            for name in FONT_FILE_MAP.get(family_key, []):
-                add_candidate(name)
-
-            if has_georgian:
-                add_candidate('Sylfaen.ttf')
-                add_candidate('sylfaen.ttf')
-                add_candidate('segoeui.ttf')
-
-            add_candidate('segoeui.ttf')
-            add_candidate('segoeuib.ttf')
-            add_candidate('arial.ttf')
-            add_candidate('DejaVuSans.ttf')
-
-            for candidate in candidates:
-                try:
-                    return ImageFont.truetype(candidate, size)
-                except Exception:
-                    continue
-            if has_georgian:
-                print("Warning: Georgian text detected but no compatible font found. Falling back to default.")
-            return ImageFont.load_default()
-
         def measure_text(draw_obj, value, font_obj, spacing):
             if spacing <= 0:
                 bbox = draw_obj.textbbox((0, 0), value, font=font_obj)
                 width = bbox[2] - bbox[0]
                 height = bbox[3] - bbox[1]
                 return width, height, bbox[1], bbox[3]
-            total_w = 0
-            min_y = 0
-            max_y = 0
-            first = True
-            for ch in value:
-                bbox = draw_obj.textbbox((0, 0), ch, font=font_obj)
-                ch_w = bbox[2] - bbox[0]
-                total_w += ch_w
-                if first:
-                    min_y = bbox[1]
-                    max_y = bbox[3]
-                    first = False
-                else:
-                    min_y = min(min_y, bbox[1])
-                    max_y = max(max_y, bbox[3])
-            total_w += spacing * max(0, len(value) - 1)
-            height = max_y - min_y if not first else 0
-            return total_w, height, min_y, max_y
-
-        def draw_text_with_spacing(draw_obj, value, start_x, start_y, font_obj, fill_color, stroke, stroke_fill, spacing):
+            metrics = get_glyph_metrics(font_obj)
+            total_w = metrics.measure(value, spacing)
+            min_y, max_y = metrics.vertical_extent(value)
+            return total_w, max_y - min_y, min_y, max_y
+
+        def draw_text_with_spacing(img_obj, draw_obj, value, start_x, start_y, font_obj, fill_color, stroke, stroke_fill, spacing):
+            if stroke > 0:
+                img_obj.alpha_composite(stroke_layer(img_obj.size, value, start_x, start_y, font_obj, spacing, stroke, stroke_fill))
             if spacing <= 0:
-                if stroke > 0:
-                    for offset_x in range(-stroke, stroke + 1):
-                        for offset_y in range(-stroke, stroke + 1):
-                            draw_obj.text((start_x + offset_x, start_y + offset_y), value, font=font_obj, fill=stroke_fill)
                 draw_obj.text((start_x, start_y), value, font=font_obj, fill=fill_color)
                 return
+            metrics = get_glyph_metrics(font_obj)
             current_x = start_x
             for ch in value:
-                if stroke > 0:
-                    for offset_x in range(-stroke, stroke + 1):
-                        for offset_y in range(-stroke, stroke + 1):
-                            draw_obj.text((current_x + offset_x, start_y + offset_y), ch, font=font_obj, fill=stroke_fill)
                 draw_obj.text((current_x, start_y), ch, font=font_obj, fill=fill_color)
-                bbox = draw_obj.textbbox((0, 0), ch, font=font_obj)
-                current_x += (bbox[2] - bbox[0]) + spacing
+                current_x += metrics.width(ch) + spacing
 
-        font = load_font(font_family, fontsize, text, font_key)
+        font = load_font(font_family, font_key, text, fontsize)
         temp_img = Image.new('RGBA', (10, 10), (0, 0, 0, 0))
         temp_draw = ImageDraw.Draw(temp_img)
         text_w, text_h, min_y, _ = measure_text(temp_draw, text, font, letter_spacing)
@@ -232,19 +136,36 @@ def create_pil_text_clip(text, fontsize, color, stroke_width, width, height, ali
             x = width - text_w - padding
 
         y = padding_y + stroke_width - min_y
-        draw_text_with_spacing(draw, text, x, y, font, color, stroke_width, 'black', letter_spacing)
-
-        x_pos = 'center' if position_x is None else position_x
-        return ImageClip(np.array(img)).set_position((x_pos, position_y))
+        draw_text_with_spacing(img, draw, text, x, y, font, color, stroke_width, 'black', letter_spacing)
+        return img
     except Exception as e:
         print(f"Error creating text clip: {e}")
         return None
 
-def create_text_overlay(clip, textOverlay, width, height):
-    """Add text and logo overlay to clip"""
+def create_pil_text_clip(text, fontsize, color, stroke_width, width, height, align, position_y, position_x=None, font_family=None, font_key=None, letter_spacing=0, line_height=1.0, font_weight=None):
+    img = render_pil_text_image(text, fontsize, color, stroke_width, width, align, font_family=font_family, font_key=font_key, letter_spacing=letter_spacing)
+    if img is None:
+        return None
+    x_pos = 'center' if position_x is None else position_x
+    return ImageClip(np.array(img)).set_position((x_pos, position_y))
+
+def create_text_overlay(clip, textOverlay, width, height, scale=1.0):
+    """Add text and logo overlay to clip.
+
+    `scale` is the render size over the format's full size (previews), for the
+    pixel sizes that do not follow width/height (logo, strokes, minimum size).
+    """
+    overlay = build_text_overlay(textOverlay, width, height, scale)
+    if overlay is None:
+        return clip
+    # Blend the flattened layer onto each frame; the clip keeps its duration/audio
+    return apply_static_overlay(clip, overlay.finalize())
+
+def build_text_overlay(textOverlay, width, height, scale=1.0):
+    """Text and logo flattened into one StaticOverlay, or None when there is nothing to draw."""
     if not textOverlay.get('enabled', False):
         print("DEBUG: Text overlay disabled")
-        return clip
+        return None
     
     text_value = textOverlay.get('text', '').strip()
     title = textOverlay.get('title', '')
@@ -326,121 +247,10 @@ def create_text_overlay(clip, textOverlay, width, height):
         text_scale_map = {1: 0.8, 2: 1.0, 3: 1.2, 4: 1.35, 5: 1.5, 6: 1.7}
         text_scale = text_scale_map.get(text_scale_preset, 1.0)
 
-    def load_font_for_measure(size, text_value):
-        candidates = []
-        font_dir = None
-        project_font_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'public', 'fonts')
-        project_font_index = None
-        if project_font_dir and os.path.isdir(project_font_dir):
-            project_font_index = {}
-            for root, _, files in os.walk(project_font_dir):
-                for file_name in files:
-                    key_name = file_name.lower()
-                    if key_name not in project_font_index:
-                        project_font_index[key_name] = os.path.join(root, file_name)
-        if os.name == 'nt':
-            windir = os.environ.get('WINDIR', 'C:\\Windows')
-            font_dir = os.path.join(windir, 'Fonts')
-
-        def add_candidate(name):
-            if not name:
-                return
-            candidates.append(name)
-            if font_dir:
-                candidates.append(os.path.join(font_dir, name))
-            if project_font_dir:
-                candidates.append(os.path.join(project_font_dir, name))
-                if project_font_index:
-                    match_path = project_font_index.get(name.lower())
-                    if match_path:
-                        candidates.append(match_path)
-
-        family_key = (font_family or '').strip().lower()
-        key_normalized = (font_key or '').strip().lower()
-        has_georgian = any('\u10A0' <= ch <= '\u10FF' for ch in text_value)
-
-        if has_georgian:
-            for candidate in [
-                'NotoSansGeorgian-Regular.ttf',
-                'NotoSansGeorgian.ttf',
-                'NotoSansGeorgian-Bold.ttf',
-                'BPG_Glaho.ttf',
-                'bpg-glaho-webfont.ttf',
-                'Sylfaen.ttf',
-                'sylfaen.ttf',
-                'segoeui.ttf',
-                'segoeuib.ttf'
-            ]:
-                add_candidate(candidate)
-
-        if family_key:
-            add_candidate(font_family)
-            add_candidate(f"{font_family}.ttf")
-            add_candidate(f"{font_family}.otf")
-
-        for name in FONT_FILE_MAP.get(key_normalized, []):
-            add_candidate(name)
-        for name in FONT_FILE_MAP.get(family_key, []):
-            add_candidate(name)
-
-        if has_georgian:
-            add_candidate('Sylfaen.ttf')
-            add_candidate('sylfaen.ttf')
-            add_candidate('segoeui.ttf')
-
-        add_candidate('arial.ttf')
-        add_candidate('DejaVuSans.ttf')
-
-        for candidate in candidates:
-            try:
-                return ImageFont.truetype(candidate, size)
-            except Exception:
-                continue
-        return ImageFont.load_default()
-
-    measure_image = Image.new('RGBA', (max(10, width), max(10, height)), (0, 0, 0, 0))
-    measure_draw = ImageDraw.Draw(measure_image)
-
-    def measure_text_width(value, size, spacing):
-        font = load_font_for_measure(size, value)
-        if spacing <= 0:
-            bbox = measure_draw.textbbox((0, 0), value, font=font)
-            return bbox[2] - bbox[0]
-        total_w = 0
-        for ch in value:
-            bbox = measure_draw.textbbox((0, 0), ch, font=font)
-            total_w += bbox[2] - bbox[0]
-        total_w += spacing * max(0, len(value) - 1)
-        return total_w
-
-    def wrap_text(value, size, spacing, max_width):
-        words = value.split()
-        if not words:
-            return []
-        lines = []
-        for i in range(0, len(words), 2):
-            lines.append(" ".join(words[i:i + 2]))
-        normalized = []
-        for line in lines:
-            if measure_text_width(line, size, spacing) <= max_width:
-                normalized.append(line)
-            else:
-                normalized.extend(wrap_by_chars(line, size, spacing, max_width))
-        return normalized
-
-    def wrap_by_chars(value, size, spacing, max_width):
-        lines = []
-        current = ''
-        for ch in value:
-            test = f"{current}{ch}"
-            if not current or measure_text_width(test, size, spacing) <= max_width:
-                current = test
-            else:
-                lines.append(current)
-                current = ch
-        if current:
-            lines.append(current)
-        return lines
+    def metrics_for(size):
+        return lambda georgian: get_glyph_metrics(
+            load_font_for_script(font_family, font_key, 'georgian' if georgian else 'latin', size)
+        )
 
     def get_size(key, default):
         value = font_sizes.get(key, default)
@@ -482,7 +292,7 @@ def create_text_overlay(clip, textOverlay, width, height):
     lines = []
     if text_value:
         max_width = int(width * 0.8)
-        wrapped = wrap_text(text_value, title_size, title_spacing, max_width)
+        wrapped = wrap_text(text_value, metrics_for(title_size), title_spacing, max_width)
         for line in wrapped:
             lines.append(('text', line, title_size, title_weight, title_spacing, 2))
     else:
@@ -495,7 +305,7 @@ def create_text_overlay(clip, textOverlay, width, height):
 
     if not lines:
         print("DEBUG: No text lines to render after validation")
-        return clip
+        return None
 
     def compute_total_height(lines_list, gap_value):
         total = 0
@@ -512,7 +322,7 @@ def create_text_overlay(clip, textOverlay, width, height):
         scale_factor = max_height / total_height
         scaled = []
         for kind, value, size, weight, spacing, stroke in lines:
-            scaled.append((kind, value, max(12, int(round(size * scale_factor))), weight, spacing * scale_factor, stroke))
+            scaled.append((kind, value, max(int(round(12 * scale)), int(round(size * scale_factor))), weight, spacing * scale_factor, stroke))
         lines = scaled
         line_gap = max(0, int(round(line_gap * scale_factor)))
         total_height = compute_total_height(lines, line_gap)
@@ -531,77 +341,87 @@ def create_text_overlay(clip, textOverlay, width, height):
     if vertical == 'custom':
         position_x_override = int((width * (position_x / 100.0)) - (width / 2))
     
-    # Build text clips
-    text_clips = []
+    # Flatten text lines + logo into one static layer
+    overlay = StaticOverlay(width, height)
     current_y = y_pos
 
     for index, (_, value, size, weight, spacing, stroke) in enumerate(lines):
-        clip_item = create_pil_text_clip(
+        line_img = render_pil_text_image(
             value,
             fontsize=size,
             color=text_color,
-            stroke_width=stroke,
+            stroke_width=max(1, int(round(stroke * scale))),
             width=width,
-            height=height,
             align=text_align,
-            position_y=current_y,
-            position_x=position_x_override,
             font_family=font_family,
             font_key=font_key,
-            letter_spacing=spacing,
-            line_height=line_height,
-            font_weight=weight
+            letter_spacing=spacing
         )
-        if clip_item:
-            clip_item = clip_item.set_duration(clip.duration)
-            text_clips.append(clip_item)
+        if line_img:
+            # Full-width line images are centered unless a custom X is set
+            line_x = position_x_override if position_x_override is not None else (width - line_img.width) // 2
+            overlay.add(line_img, line_x, current_y)
             line_height_px = int(max(size * line_height, size))
             if index < len(lines) - 1:
                 current_y += line_height_px + line_gap
     
     # Logo overlay (top-right)
     if show_logo:
-        logo_clip = create_pil_text_clip(
+        logo_img = render_pil_text_image(
             "LUMINAVIDS",
-            fontsize=30,
+            fontsize=int(round(30 * scale)),
             color='white',
             stroke_width=1,
             width=width,
-            height=height,
             align='right', # Force right align for logo
-            position_y=30,
             font_family=font_family,
             font_key=font_key
         )
-        if logo_clip:
-            # Override position for top-right specifically
-            logo_clip = logo_clip.set_position((width - 200, 30)).set_duration(clip.duration)
-            text_clips.append(logo_clip)
-    
-    if text_clips:
-        # Create a new composite clip where text overlays are added
-        # Important: set_duration must be called on the composite clip
-        final = CompositeVideoClip([clip] + text_clips, size=(width, height)).set_duration(clip.duration)
-        return final
-    
-    return clip
+        if logo_img:
+            overlay.add(logo_img, width - int(round(200 * scale)), int(round(30 * scale)))
+    return overlay
 
-def is_aspect_match(image_path, target_w, target_h, tolerance=0.03):
+def is_aspect_match(image_path, target_w, target_h, tolerance=0.03, source=None):
     try:
-        with Image.open(image_path) as img:
-            img_ratio = img.width / img.height
+        img_w, img_h = source_size(image_path, source)
+        img_ratio = img_w / img_h
         target_ratio = target_w / target_h
         return abs(img_ratio - target_ratio) <= tolerance
     except Exception:
         return True
 
-def make_panorama_clip(image_path, duration, target_w, target_h):
-    with Image.open(image_path) as img:
-        img_w, img_h = img.size
+def load_panorama_pixels(image_path, target_w, target_h, source=None, reduced_decode=False, zoom_amount=0.0):
+    """Source pixels for a pan/zoom clip; reduced decode plans for the zoom headroom too."""
+    if source:
+        # Shared job-level decode; size may be reduced by draft decoding
+        return load_source_array(source)
+    if reduced_decode:
+        needed = (int(target_w * (1 + zoom_amount)) + 1, int(target_h * (1 + zoom_amount)) + 1)
+        return np.asarray(open_reduced(image_path, [needed]))
+    return None
+
+def make_panorama_clip(image_path, duration, target_w, target_h, source=None, reduced_decode=False,
+                       native=True, pan=True, zoom="none", zoom_amount=DEFAULT_ZOOM_AMOUNT, subpixel=False):
+    zoom_amount = zoom_amount if zoom in ("in", "out") else 0.0
+    pixels = load_panorama_pixels(image_path, target_w, target_h, source, reduced_decode, zoom_amount)
+    if native or zoom_amount or subpixel:
+        if pixels is None:
+            with Image.open(image_path) as img:
+                pixels = img.convert("RGB")
+        return pan_zoom_clip(pixels, duration, target_w, target_h, pan=pan, zoom=zoom,
+                             zoom_amount=zoom_amount, subpixel=subpixel)
+
+    # Legacy moviepy path: resize once, animate with set_position in a composite
+    if pixels is None:
+        pixels = image_path
+        with Image.open(image_path) as img:
+            img_w, img_h = img.size
+    else:
+        img_h, img_w = pixels.shape[:2]
     scale = max(target_w / img_w, target_h / img_h)
     scaled_w = int(img_w * scale)
     scaled_h = int(img_h * scale)
-    base = ImageClip(image_path).resize((scaled_w, scaled_h)).set_duration(duration)
+    base = ImageClip(pixels).resize((scaled_w, scaled_h)).set_duration(duration)
     pan_x = max(0, scaled_w - target_w)
     pan_y = max(0, scaled_h - target_h)
     denom = duration if duration > 0 else 0.01
@@ -617,15 +437,113 @@ def make_panorama_clip(image_path, duration, target_w, target_h):
         return CompositeVideoClip([base.set_position(move)], size=(target_w, target_h)).set_duration(duration)
     return base
 
-def generate_format(fmt_key, dimensions, images, temp_base, property_id, output_dir, settings, platform_name=None):
+def is_preview(settings):
+    return str(settings.get("renderProfile", "")).lower() == "preview"
+
+def render_dimensions(fmt_key, settings):
+    """Output size of a format: FORMATS, or scaled down to previewResolution for previews."""
+    w, h = FORMATS[fmt_key]
+    if not is_preview(settings):
+        return (w, h)
+    scale = min(1.0, int(settings.get("previewResolution", PREVIEW_RESOLUTION)) / float(min(w, h)))
+    # yuv420 needs even sizes
+    return (max(2, int(round(w * scale / 2)) * 2), max(2, int(round(h * scale / 2)) * 2))
+
+def preview_settings(settings):
+    """Preview jobs cap fps and skip hardware encoders (their setup costs more than a 360p encode)."""
+    if not is_preview(settings):
+        return settings
+    fps = min(int(settings.get("fps", 30)), int(settings.get("previewFps", PREVIEW_FPS)))
+    return dict(settings, fps=max(1, fps), preferHardwareEncode=False)
+
+def cpu_encode_options(render_profile):
+    """libx264 (preset, crf) of a render profile."""
+    render_profile = str(render_profile or "fast_parallel").lower()
+    if render_profile == "final_quality":
+        return "medium", "20"
+    if render_profile == "balanced":
+        return "faster", "21"
+    if render_profile == "preview":
+        return "ultrafast", "28"
+    return "veryfast", "22"  # fast_parallel
+
+def warm_final_frames(settings):
+    """Whether a preview also caches full-size frames for the final render queued after it."""
+    return is_preview(settings) and bool(settings.get("warmFinalFrames", False))
+
+def output_filename(property_id, fmt_key, platform_name=None):
+    if platform_name:
+        return f"{property_id}_{platform_name.replace(' + ', '_')}_{fmt_key}.mp4"
+    return f"{property_id}_{fmt_key}.mp4"
+
+def slide_timing(settings):
+    """(seconds per image, transition seconds) as generate_format applies them."""
+    duration = float(settings.get("secondsPerImage", 3.0))
+    trans_duration = float(settings.get("transitionDuration", 0.8))
+    if duration <= trans_duration:
+        trans_duration = max(0.1, duration / 2)
+    return duration, trans_duration
+
+def format_segments(images, dimensions, settings, sources=None):
+    """Planned timeline segments of one format, laid out like generate_format builds them."""
+    w, h = dimensions
+    duration, trans_duration = slide_timing(settings)
+    sources = sources or {}
+    zooming = settings.get("panZoom", "none") in ("in", "out")
+    static_flags = [not zooming and is_aspect_match(img, w, h, source=sources.get(img)) for img in images]
+    is_cut = settings.get("transition", "cut") == "cut"
+    return build_segments(plan_parts(len(images), duration, trans_duration, is_cut, static_flags))
+
+def video_duration(image_count, settings):
+    """Length of the rendered timeline; the same for every format of a job."""
+    duration, trans_duration = slide_timing(settings)
+    is_cut = settings.get("transition", "cut") == "cut"
+    return sum(part[2] for part in plan_parts(image_count, duration, trans_duration, is_cut, [False] * image_count))
+
+def generate_format(fmt_key, dimensions, images, temp_base, property_id, output_dir, settings, platform_name=None, sources=None,
+                    segment=None, outputs=None):
+    """Render one format to output_dir and return its file name.
+
+    With `segment` (a chunk planned by generate_slideshow) only that frame
+    range is encoded, without audio, to segment["path"]; chunk 0 also writes
+    the audio track to segment["audio_path"] (or hands back settings.audioTrack).
+    Returns a dict describing the chunk.
+
+    settings.audioTrack is the job's music, already looped, volume-scaled and
+    encoded by generate_slideshow; it is muxed as is instead of being mixed here.
+
+    With `outputs` ([(fmt_key, (w, h), platform_name), ...], multiOutput mode)
+    this format is the master (largest member) of a same-aspect-ratio family:
+    its timeline is rendered once without text and one ffmpeg process scales
+    it to every output and overlays each output's own text layer. Returns the
+    list of file names.
+    """
     w, h = dimensions
     fps = int(settings.get("fps", 30))
     duration = float(settings.get("secondsPerImage", 3.0))
     transition_type = settings.get("transition", "cut") 
     music_file = settings.get("musicFile")
     music_volume = float(settings.get("musicVolume", 0.5))
+    audio_track = settings.get("audioTrack")
+    if audio_track and not os.path.exists(audio_track):
+        audio_track = None
     trans_duration = float(settings.get("transitionDuration", 0.8))
     text_overlay = settings.get("textOverlay", {})
+    use_native_transitions = bool(settings.get("nativeTransitions", True))
+    frame_cache = get_frame_cache() if settings.get("frameCache", True) else None
+    handoff = settings.get("frameHandoff", "memory")
+    if handoff not in HANDOFF_MODES:
+        handoff = "jpeg"
+    # Ken Burns: panoramas always pan; panZoom "in"/"out" also zooms every photo
+    pan_zoom = settings.get("panZoom", "none")
+    if pan_zoom not in ZOOM_MODES:
+        pan_zoom = "none"
+    pan_options = {
+        "native": bool(settings.get("nativePanZoom", True)),
+        "zoom": pan_zoom,
+        "zoom_amount": float(settings.get("panZoomAmount", DEFAULT_ZOOM_AMOUNT)),
+        "subpixel": bool(settings.get("smoothPan", False)),
+    }
     
     # DEBUG
     print(f"DEBUG generate_format: fmt_key={fmt_key}, platform_name={platform_name}")
@@ -634,29 +552,61 @@ def generate_format(fmt_key, dimensions, images, temp_base, property_id, output_
         trans_duration = max(0.1, duration / 2)
 
     print(f"Rendering {fmt_key} ({w}x{h})...")
+    # Stage timings and cache counters for this task's telemetry event
+    timer = StageTimer()
+    frames_before = (frame_cache.hits, frame_cache.misses) if frame_cache is not None else None
+    fonts_before = font_cache_stats()
     
     # 1. Preprocess images for this format
     platform_suffix = (platform_name or fmt_key).replace(" ", "").replace("+", "_").lower()
     fmt_temp_dir = os.path.join(temp_base, f"{fmt_key}_{platform_suffix}")
+    if segment is not None:
+        # Chunks of one format run concurrently; keep their frame files apart
+        fmt_temp_dir += f"_seg{segment['index']}"
     os.makedirs(fmt_temp_dir, exist_ok=True)
     
-    proc_images = preprocess_images(images, fmt_temp_dir, w, h)
+    sources = sources or {}
+    reduced_decode = reduced_decode_enabled(settings.get("reducedDecode"))
+    # Previews render below the format's full size and may downscale its cached frames;
+    # warmFinalFrames (autoFinal previews) caches those full-size frames for the final render
+    full_size = FORMATS.get(fmt_key, (w, h))
+    proc_images = preprocess_images(images, fmt_temp_dir, w, h, sources=sources, reduced_decode=reduced_decode, cache=frame_cache,
+                                    handoff=handoff, max_workers=settings.get("preprocessWorkers"),
+                                    parent_size=full_size if full_size != (w, h) else None,
+                                    warm_parent=warm_final_frames(settings))
+    if frame_cache is not None:
+        print(f"DEBUG: frame cache {frame_cache.stats()}")
+    timer.lap("preprocess")
     
     # 2. Create Clips logic
     main_clips = []
+    static_flags = []
     is_cut = transition_type == "cut"
     clip_duration = duration if is_cut else duration + (2 * trans_duration)
     
-    for index, (img_path, original_path) in enumerate(zip(proc_images, images)):
-        if not is_aspect_match(original_path, w, h):
-            clip = make_panorama_clip(original_path, clip_duration, w, h)
+    for index, (frame, original_path) in enumerate(zip(proc_images, images)):
+        source = sources.get(original_path)
+        if not is_aspect_match(original_path, w, h, source=source):
+            clip = make_panorama_clip(original_path, clip_duration, w, h, source=source,
+                                      reduced_decode=reduced_decode, **pan_options)
+            static_flags.append(False)
+        elif pan_zoom != "none":
+            clip = make_panorama_clip(original_path, clip_duration, w, h, source=source,
+                                      reduced_decode=reduced_decode, pan=False, **pan_options)
+            static_flags.append(False)
         else:
-            clip = ImageClip(img_path).set_duration(clip_duration)
+            # JPEG path or uint8 array, depending on the frame handoff
+            clip = ImageClip(frame).set_duration(clip_duration)
+            static_flags.append(True)
         main_clips.append(clip)
+    timer.lap("clips")
     
     # 3. Concatenate
+    # Playback-order (kind, index, duration, static) parts for frame reuse
+    timeline_parts = []
     if transition_type == "cut":
         final_clip = concatenate_videoclips(main_clips, method="compose")
+        timeline_parts = [("body", i, c.duration, static_flags[i]) for i, c in enumerate(main_clips)]
     else:
         # Custom transitions logic
         final_clips_sequence = []
@@ -666,6 +616,7 @@ def generate_format(fmt_key, dimensions, images, temp_base, property_id, output_
             if i == 0:
                 body = current_clip.subclip(0, duration)
                 final_clips_sequence.append(body)
+                timeline_parts.append(("body", i, body.duration, static_flags[i]))
             else:
                 prev_clip_ref = main_clips[i-1]
                 c1 = prev_clip_ref.subclip(duration, duration + trans_duration)
@@ -673,7 +624,9 @@ def generate_format(fmt_key, dimensions, images, temp_base, property_id, output_
                 
                 # Generate Transition
                 trans = None
-                if transition_type == "fade":
+                if use_native_transitions and transition_type in NATIVE_TRANSITIONS:
+                    trans = native_transition(c1, c2, trans_duration, transition_type)
+                elif transition_type == "fade":
                     trans = concatenate_videoclips([c1, c2], method="compose", padding=-trans_duration)
                 elif transition_type == "slide_left":
                     trans = slide_transition(c1, c2, trans_duration, 'left')
@@ -733,62 +686,95 @@ def generate_format(fmt_key, dimensions, images, temp_base, property_id, output_
                     trans = concatenate_videoclips([c1, c2])
 
                 final_clips_sequence.append(trans)
+                timeline_parts.append(("transition", i, trans.duration, False))
                 
                 start = trans_duration
                 end = trans_duration + duration
                 
                 body = current_clip.subclip(start, end)
                 final_clips_sequence.append(body)
+                timeline_parts.append(("body", i, body.duration, static_flags[i]))
         
         final_clip = concatenate_videoclips(final_clips_sequence, method="compose")
+    timer.lap("transitions")
     
     # 4. Add Text Overlay (if enabled)
     # Apply text overlay to the final concatenated clip instead of individual clips
     # This ensures text stays on top of transitions
-    final_clip_with_text = create_text_overlay(final_clip, text_overlay, w, h)
+    if outputs:
+        # Text goes on per output in the ffmpeg filter graph (placed for each output's size)
+        final_clip_with_text = final_clip
+    else:
+        final_clip_with_text = create_text_overlay(final_clip, text_overlay, w, h, scale=w / float(full_size[0]))
+    print(f"DEBUG: font cache {font_cache_stats()}")
+
+    # Still bodies under a static overlay render identical frames; compute one per segment
+    segments = build_segments(timeline_parts)
+    if bool(settings.get("reuseStaticFrames", True)):
+        final_clip_with_text, static_cache = reuse_static_frames(final_clip_with_text, segments)
+    else:
+        static_cache = None
+    timer.lap("overlay")
     
-    # 5. Add Music (if provided)
-    if music_file and os.path.exists(music_file):
+    # 5. Add Music (if provided). The job-level track is muxed by the writer;
+    #    moviepy only mixes it for write_videofile or when no track was prepared
+    if audio_track and not bool(settings.get("pipelinedWriter", True)) and segment is None and not outputs:
+        final_clip_with_text = final_clip_with_text.set_audio(
+            AudioFileClip(audio_track).subclip(0, final_clip_with_text.duration))
+    elif music_file and os.path.exists(music_file) and not audio_track:
         try:
             audio = AudioFileClip(music_file)
             if music_volume != 1.0:
                 audio = audio.volumex(music_volume)
             
-            video_duration = final_clip_with_text.duration
-            if audio.duration < video_duration:
-                audio = audio.loop(duration=video_duration)
+            clip_duration = final_clip_with_text.duration
+            if audio.duration < clip_duration:
+                audio = audio_loop(audio, duration=clip_duration)
             else:
-                audio = audio.subclip(0, video_duration)
+                audio = audio.subclip(0, clip_duration)
                 
             final_clip_with_text = final_clip_with_text.set_audio(audio)
         except Exception as e:
             print(f"Warning: Failed to add music: {e}")
+    timer.lap("audio")
 
     # 6. Write File
-    if platform_name:
-        out_filename = f"{property_id}_{platform_name.replace(' + ', '_')}_{fmt_key}.mp4"
-    else:
-        out_filename = f"{property_id}_{fmt_key}.mp4"
+    out_filename = output_filename(property_id, fmt_key, platform_name)
     out_path = os.path.join(output_dir, out_filename)
+    if segment is not None:
+        out_path = segment["path"]
+    multi_outputs = None
+    if outputs:
+        multi_outputs = []
+        for out_key, (out_w, out_h), out_platform in outputs:
+            overlay_path = None
+            overlay = build_text_overlay(text_overlay, out_w, out_h, scale=out_w / float(FORMATS.get(out_key, (out_w, out_h))[0]))
+            if overlay is not None and not overlay.is_empty:
+                overlay_path = os.path.join(fmt_temp_dir, f"overlay_{out_key}.png")
+                overlay.canvas.save(overlay_path)
+            multi_outputs.append({
+                "fmt_key": out_key,
+                "name": output_filename(property_id, out_key, out_platform),
+                "path": os.path.join(output_dir, output_filename(property_id, out_key, out_platform)),
+                "size": (out_w, out_h),
+                "overlay": overlay_path,
+            })
+        out_path = multi_outputs[0]["path"]
+        timer.lap("overlay")
     
     # Render tuning (4 parallel-friendly)
     render_profile = str(settings.get("renderProfile", "fast_parallel")).lower()
-    workers = max(1, int(settings.get("parallelWorkers", 4)))
-    cpu_total = max(1, os.cpu_count() or 1)
-    threads_per_proc = int(settings.get("ffmpegThreadsPerProcess", max(1, min(4, cpu_total // workers))))
+    threads_per_proc = format_ffmpeg_threads(settings, fmt_key, dimensions)
 
     # CPU profile defaults
-    if render_profile == "final_quality":
-        cpu_preset = "medium"
-        cpu_crf = "20"
-    elif render_profile == "balanced":
-        cpu_preset = "faster"
-        cpu_crf = "21"
-    else:  # fast_parallel / preview
-        cpu_preset = "veryfast"
-        cpu_crf = "22"
+    cpu_preset, cpu_crf = cpu_encode_options(render_profile)
 
     use_hw = bool(settings.get("preferHardwareEncode", True))
+    # Overlap compositing with encoding (ffmpeg_writer); false = moviepy's write_videofile
+    use_pipelined_writer = bool(settings.get("pipelinedWriter", True))
+    # Opt-in: static ranges go to ffmpeg as one looped frame instead of a frame per output
+    # frame (separate encodes joined by concat; benchmarks/check_still_loop.py compares)
+    still_segments = segments if bool(settings.get("stillLoopEncode", False)) else None
     encode_attempts = []
 
     # CPU attempt (stable baseline)
@@ -800,62 +786,183 @@ def generate_format(fmt_key, dimensions, images, temp_base, property_id, output_
     }
 
     if use_hw:
-        # Skip NVENC try when CUDA runtime is unavailable (saves failed-attempt overhead)
-        nvenc_available = os.path.exists(r"C:\Windows\System32\nvcuda.dll")
-
-        # In fast profile, keep CPU first for predictably low latency on this machine
+        # Only encoders that passed this host's cached probe (see encoders.py),
+        # fastest probe first, so a missing GPU never costs a failed partial render
+        working = settings.get("availableEncoders")
+        if working is None:
+            working = working_encoders(cpu_preset=cpu_preset)
+
+        # fast_parallel runs many encoders side by side: keep CPU first, so its workers
+        # never open hardware sessions all at once (NVENC limits concurrent sessions)
         if render_profile in ("fast_parallel", "preview"):
             encode_attempts.append(cpu_attempt)
 
-        if nvenc_available:
-            encode_attempts.append({
+        hardware_attempts = {
+            "h264_nvenc": {
                 "codec": "h264_nvenc",
                 "preset": "p4",
                 "ffmpeg_params": ["-cq", "23", "-rc", "vbr", "-b:v", "0"],
                 "threads": threads_per_proc,
-            })
-        else:
-            print("DEBUG: NVENC skipped (nvcuda.dll not found)")
-
-        # QSV fallback/alt hardware path
-        encode_attempts.append({
-            "codec": "h264_qsv",
-            "preset": "medium",
-            "ffmpeg_params": ["-global_quality", "23"],
-            "threads": threads_per_proc,
-        })
+            },
+            # QSV fallback/alt hardware path
+            "h264_qsv": {
+                "codec": "h264_qsv",
+                "preset": "medium",
+                "ffmpeg_params": ["-global_quality", "23"],
+                "threads": threads_per_proc,
+            },
+        }
+        for codec in working:
+            if codec == CPU_CODEC:
+                if cpu_attempt not in encode_attempts:
+                    encode_attempts.append(cpu_attempt)
+            elif codec in hardware_attempts:
+                encode_attempts.append(hardware_attempts[codec])
 
         # Ensure CPU exists as fallback
         if not any(a["codec"] == "libx264" for a in encode_attempts):
             encode_attempts.append(cpu_attempt)
+        print(f"DEBUG: encoders for {fmt_key}: {[a['codec'] for a in encode_attempts]} (probe: {working})")
     else:
         encode_attempts.append(cpu_attempt)
 
+    if segment is not None and segment.get("codec"):
+        # Re-render of a chunk: it must match the codec its siblings used
+        encode_attempts = [a for a in encode_attempts if a["codec"] == segment["codec"]] or [cpu_attempt]
+
+    write_stats = {}
+
+    def succeeded(attempt):
+        """After the encode that worked: update the encoder probe cache and report telemetry."""
+        timer.lap("encode")
+        if static_cache:
+            print(f"DEBUG: static frame reuse {static_cache.stats()}")
+        for codec, err in failed_hw:
+            mark_broken(codec, err)
+        fonts_after = font_cache_stats()
+        font_hits = fonts_after["hits"] - fonts_before["hits"]
+        font_misses = fonts_after["misses"] - fonts_before["misses"]
+        cache = {"fonts": {"hits": font_hits, "misses": font_misses, "hitRate": hit_rate(font_hits, font_misses)}}
+        if frames_before is not None:
+            frame_hits = frame_cache.hits - frames_before[0]
+            frame_misses = frame_cache.misses - frames_before[1]
+            cache["frames"] = {"hits": frame_hits, "misses": frame_misses, "hitRate": hit_rate(frame_hits, frame_misses)}
+        if static_cache:
+            cache["staticFrames"] = static_cache.stats()
+        frames = write_stats.get("frames") or int(round(final_clip_with_text.duration * fps))
+        seconds = timer.elapsed()
+        emit_telemetry({
+            "event": "format",
+            "format": fmt_key,
+            "size": [w, h],
+            "segment": segment["index"] if segment is not None else None,
+            "outputs": [o["fmt_key"] for o in multi_outputs] if multi_outputs else [fmt_key],
+            "frames": frames,
+            "seconds": seconds,
+            "renderFps": round(frames / seconds, 2) if seconds else None,
+            "encoder": attempt["codec"],
+            "stages": timer.stages,
+            "writer": {k: write_stats[k] for k in ("renderSeconds", "pipeSeconds", "stillFrames") if k in write_stats} if write_stats else None,
+            "peakRssMB": peak_rss_mb(),
+            "encoderPeakRssMB": write_stats.get("encoderPeakRssMB"),
+            "cache": cache,
+        })
+
     try:
         last_err = None
+        # Hardware codecs that failed here although a later attempt worked
+        failed_hw = []
         for attempt in encode_attempts:
             try:
                 print(f"DEBUG encode attempt: codec={attempt['codec']} preset={attempt['preset']} threads={attempt['threads']} profile={render_profile}")
-                final_clip_with_text.write_videofile(
-                    out_path,
-                    fps=fps,
-                    codec=attempt["codec"],
-                    audio_codec="aac" if music_file else None,
-                    audio=bool(music_file),
-                    preset=attempt["preset"],
-                    ffmpeg_params=attempt["ffmpeg_params"],
-                    threads=attempt["threads"],
-                    logger=MyBarLogger(fmt_key)
-                )
+                if segment is not None:
+                    audio_path = None
+                    if segment["index"] == 0 and audio_track:
+                        audio_path = audio_track
+                    elif segment["index"] == 0 and final_clip_with_text.audio is not None:
+                        audio_path = segment["audio_path"]
+                        final_clip_with_text.audio.write_audiofile(audio_path, 44100, 4, 2000, "aac", logger=None)
+                    write_clip(
+                        final_clip_with_text.without_audio(),
+                        out_path,
+                        fps=fps,
+                        codec=attempt["codec"],
+                        preset=attempt["preset"],
+                        ffmpeg_params=attempt["ffmpeg_params"],
+                        threads=attempt["threads"],
+                        logger=SegmentProgressLogger(fmt_key, segment["slot"], segment["format_slots"], segment["total_frames"]),
+                        ring_frames=int(settings.get("writerRingFrames", DEFAULT_RING_FRAMES)),
+                        producers=int(settings.get("frameProducers", 1)),
+                        frame_range=(segment["start_frame"], segment["end_frame"]),
+                        stats=write_stats,
+                        static_segments=still_segments,
+                    )
+                    succeeded(attempt)
+                    return {"fmt_key": fmt_key, "index": segment["index"], "path": out_path,
+                            "codec": attempt["codec"], "audio_path": audio_path, "frames": write_stats.get("frames")}
+                if multi_outputs:
+                    write_clip(
+                        final_clip_with_text,
+                        out_path,
+                        fps=fps,
+                        codec=attempt["codec"],
+                        preset=attempt["preset"],
+                        ffmpeg_params=attempt["ffmpeg_params"],
+                        threads=attempt["threads"],
+                        audio_codec="aac" if music_file else None,
+                        logger=MyBarLogger([o["fmt_key"] for o in multi_outputs]),
+                        ring_frames=int(settings.get("writerRingFrames", DEFAULT_RING_FRAMES)),
+                        producers=int(settings.get("frameProducers", 1)),
+                        outputs=multi_outputs,
+                        audio_file=audio_track,
+                        stats=write_stats,
+                    )
+                    succeeded(attempt)
+                    return [o["name"] for o in multi_outputs]
+                if use_pipelined_writer:
+                    write_clip(
+                        final_clip_with_text,
+                        out_path,
+                        fps=fps,
+                        codec=attempt["codec"],
+                        preset=attempt["preset"],
+                        ffmpeg_params=attempt["ffmpeg_params"],
+                        threads=attempt["threads"],
+                        audio_codec="aac" if music_file else None,
+                        logger=MyBarLogger(fmt_key),
+                        ring_frames=int(settings.get("writerRingFrames", DEFAULT_RING_FRAMES)),
+                        producers=int(settings.get("frameProducers", 1)),
+                        audio_file=audio_track,
+                        stats=write_stats,
+                        static_segments=still_segments,
+                    )
+                else:
+                    final_clip_with_text.write_videofile(
+                        out_path,
+                        fps=fps,
+                        codec=attempt["codec"],
+                        audio_codec="aac" if music_file else None,
+                        audio=bool(music_file),
+                        preset=attempt["preset"],
+                        ffmpeg_params=attempt["ffmpeg_params"],
+                        threads=attempt["threads"],
+                        logger=MyBarLogger(fmt_key)
+                    )
+                succeeded(attempt)
                 return out_filename
             except Exception as e:
                 last_err = e
                 print(f"Warning: encode attempt failed ({attempt['codec']}): {e}")
-                if os.path.exists(out_path):
-                    try:
-                        os.remove(out_path)
-                    except Exception:
-                        pass
+                emit_telemetry({"event": "encode_failed", "format": fmt_key, "codec": attempt["codec"],
+                                "segment": segment["index"] if segment is not None else None, "error": str(e)[:200]})
+                if attempt["codec"] != CPU_CODEC:
+                    failed_hw.append((attempt["codec"], e))
+                for failed_path in [o["path"] for o in multi_outputs] if multi_outputs else [out_path]:
+                    if os.path.exists(failed_path):
+                        try:
+                            os.remove(failed_path)
+                        except Exception:
+                            pass
         if last_err:
             raise last_err
     finally:
@@ -863,13 +970,38 @@ def generate_format(fmt_key, dimensions, images, temp_base, property_id, output_
         for c in main_clips:
             c.close()
 
-def generate_slideshow(images, property_id, output_dir, settings):
-    """Main generator function with deduplicated formats + multiprocessing."""
+class JobCanceled(Exception):
+    pass
+
+def check_canceled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCanceled("Job canceled")
+
+def run_pool_tasks(pool, tasks, cancel_event=None):
+    """pool.starmap(generate_format, tasks) that stops waiting once cancel_event is set."""
+    pending = pool.starmap_async(generate_format, tasks, chunksize=1)
+    while not pending.ready():
+        check_canceled(cancel_event)
+        pending.wait(0.2)
+    return pending.get()
+
+def generate_slideshow(images, property_id, output_dir, settings, pool_provider=None, cancel_event=None,
+                       telemetry_sink=None):
+    """Main generator function with deduplicated formats + multiprocessing.
+
+    The generator service passes `pool_provider(processes, progress_slots)`,
+    a context manager yielding a warm worker pool, and a `cancel_event` that
+    aborts the job with JobCanceled (the provider then discards the pool).
+    `telemetry_sink` receives the job-level telemetry event (default:
+    telemetry.emit); format workers report their own events.
+    """
+    timer = StageTimer()
     generated_files = []
     temp_base = os.path.join(output_dir, "temp_proc")
     os.makedirs(temp_base, exist_ok=True)
 
     print(f"DEBUG: Settings received: {json.dumps(settings, indent=2)}")
+    settings = preview_settings(settings)
 
     platforms = settings.get("platforms", {})
     selected_formats = settings.get("formats", {})
@@ -899,47 +1031,241 @@ def generate_slideshow(images, property_id, output_dir, settings):
         format_to_platforms = {}
         for platform_id, fmt_key in platform_format_map.items():
             format_to_platforms.setdefault(fmt_key, []).append(platform_id)
+        sizes = {fmt_key: render_dimensions(fmt_key, settings) for fmt_key in format_to_platforms}
+        if bool(settings.get("preferHardwareEncode", True)) and settings.get("availableEncoders") is None:
+            # Probe (or read the cached probe) once per job rather than in every worker
+            cpu_preset = cpu_encode_options(settings.get("renderProfile", "fast_parallel"))[0]
+            settings = dict(settings, availableEncoders=working_encoders(cpu_preset=cpu_preset))
+        if is_preview(settings):
+            print(f"DEBUG: preview render at {sizes}, fps={settings.get('fps')}")
+        timer.lap("setup")
+        audio_cache = None
+        music_file = settings.get("musicFile")
+        if music_file and os.path.exists(music_file) and bool(settings.get("audioCache", True)) \
+                and not settings.get("audioTrack"):
+            # Decode, loop, scale and encode the music once; every format muxes the same AAC track
+            try:
+                track, audio_cache = prepare_track(
+                    music_file, float(settings.get("musicVolume", 0.5)), video_duration(len(images), settings))
+                settings = dict(settings, audioTrack=track)
+            except Exception as e:
+                print(f"Warning: job audio track failed, formats will mix music themselves: {e}")
+        timer.lap("audio")
+
+        # One resource plan for the job: segments per format, processes and threads.
+        # Segment-parallel splits formats into time chunks when there are more
+        # cores than formats, so single-format jobs scale with core count.
+        # multiOutput: formats of the same aspect ratio are scaled from their largest
+        # member's timeline in one render + one ffmpeg process (family master -> members).
+        # Cover fits of different aspect ratios frame photos differently, so only the
+        # same ratio keeps every member identical in framing to its standalone render.
+        families = {}
+        if bool(settings.get("multiOutput", False)) and bool(settings.get("pipelinedWriter", True)):
+            by_aspect = {}
+            for fmt_key in format_to_platforms:
+                by_aspect.setdefault(round(sizes[fmt_key][0] / float(sizes[fmt_key][1]), 3), []).append(fmt_key)
+            for members in by_aspect.values():
+                if len(members) > 1:
+                    master = max(members, key=lambda k: sizes[k][0] * sizes[k][1])
+                    families[master] = [master] + [k for k in members if k != master]
+            if families:
+                print(f"DEBUG: multi-output families {families}")
+        family_members = {k for members in families.values() for k in members if k not in families}
+        render_sizes = {k: size for k, size in sizes.items() if k not in family_members}
+
+        plan = plan_resources(render_sizes, len(images), settings)
+        for master in families:
+            # A family master is not split in time (its chunks would need per-output joins)
+            plan["chunks"][master] = 1
+        chunk_count = max(plan["chunks"].values())
+
+        # Decode every source photo once per job and share it with all format
+        # workers through memory-mapped .npy files (auto: only when >1 worker)
+        shared_decode = settings.get("sharedDecode", "auto")
+        if shared_decode == "auto":
+            shared_decode = len(format_to_platforms) > 1 or chunk_count > 1
+        sources = None
+        if shared_decode:
+            reduced_decode = reduced_decode_enabled(settings.get("reducedDecode"))
+            zooming = settings.get("panZoom", "none") in ("in", "out")
+            decode_images = images
+            # Previews that warm the final's frames preprocess at full size too
+            warming = warm_final_frames(settings) and bool(settings.get("frameCache", True))
+            decode_sizes = {fmt_key: FORMATS[fmt_key] if warming else sizes[fmt_key] for fmt_key in format_to_platforms}
+            if settings.get("frameCache", True) and not zooming:
+                # Photos whose frames are all cached (and need no panorama) skip decoding;
+                # previews can also start from the full-size frame
+                frame_cache = get_frame_cache()
+                handoff = settings.get("frameHandoff", "memory")
+                if handoff not in HANDOFF_MODES:
+                    handoff = "jpeg"
+                variant = frame_variant(reduced_decode, handoff)
+                ext = frame_extension(handoff)
+                decode_images = [
+                    img for img in images
+                    if not all(
+                        is_aspect_match(img, *sizes[fmt_key])
+                        and any(frame_cache.contains(frame_cache.key(img, *size, variant), ext)
+                                for size in ({FORMATS[fmt_key]} if warming else {sizes[fmt_key], FORMATS[fmt_key]}))
+                        for fmt_key in format_to_platforms
+                    )
+                ]
+            # Decode planner: JPEGs only need the resolution of the largest format
+            target_sizes = None
+            if reduced_decode:
+                headroom = 1 + float(settings.get("panZoomAmount", DEFAULT_ZOOM_AMOUNT)) if zooming else 1.0
+                target_sizes = [
+                    (int(decode_sizes[fmt_key][0] * headroom) + 1, int(decode_sizes[fmt_key][1] * headroom) + 1) if zooming
+                    else decode_sizes[fmt_key]
+                    for fmt_key in format_to_platforms
+                ]
+            # Nothing else runs yet, so the shared decode may use every core
+            decode_workers = settings.get("preprocessWorkers") or os.environ.get("PREPROCESS_MAX_WORKERS") or plan["cpus"]
+            sources = decode_sources(decode_images, os.path.join(temp_base, "sources"), target_sizes,
+                                     max_workers=min(int(decode_workers), len(decode_images) or 1))
+            print(f"DEBUG: shared decode of {len(sources)} source images")
+        timer.lap("decode")
+
+        # Chunk plans: frame ranges cut at body/transition boundaries, balanced by estimated cost
+        fps = int(settings.get("fps", 30))
+        chunk_plans = {}
+        slot_count = 0
+        if chunk_count > 1:
+            segment_dir = os.path.join(temp_base, "segments")
+            os.makedirs(segment_dir, exist_ok=True)
+            for fmt_key in render_sizes:
+                if plan["chunks"][fmt_key] < 2:
+                    continue
+                segments = format_segments(images, sizes[fmt_key], settings, sources)
+                costs = segment_costs(segments, fps, settings.get("transition", "cut"),
+                                      bool(settings.get("nativeTransitions", True)))
+                ranges = plan_chunks(segments, costs, fps, plan["chunks"][fmt_key])
+                if len(ranges) < 2:
+                    continue
+                total_frames = len(np.arange(0, segments[-1]["end"], 1.0 / fps))
+                slots = list(range(slot_count, slot_count + len(ranges)))
+                slot_count += len(ranges)
+                chunk_plans[fmt_key] = [{
+                    "index": k,
+                    "start_frame": start,
+                    "end_frame": end,
+                    "path": os.path.join(segment_dir, f"{fmt_key}_{k}.mp4"),
+                    "audio_path": os.path.join(segment_dir, f"{fmt_key}_audio.m4a"),
+                    "slot": slots[k],
+                    "format_slots": slots,
+                    "total_frames": total_frames,
+                } for k, (start, end) in enumerate(ranges)]
+                print(f"DEBUG: {fmt_key} split into {len(ranges)} segments at frames {[r[0] for r in ranges[1:]]}")
 
         tasks = []
         for fmt_key, platforms_for_fmt in format_to_platforms.items():
-            dimensions = FORMATS[fmt_key]
+            if fmt_key in family_members:
+                continue
+            dimensions = sizes[fmt_key]
             # Use first platform label for primary render filename
             primary_label = platforms_for_fmt[0].upper()
-            tasks.append((fmt_key, dimensions, images, temp_base, property_id, output_dir, settings, primary_label))
-
-        # 3) Controlled parallelism (default 4 workers to keep 4 formats simultaneous)
-        requested_workers = int(settings.get("parallelWorkers", 4)) if isinstance(settings, dict) else 4
-        requested_workers = max(1, min(4, requested_workers))
-        num_processes = min(requested_workers, len(tasks), multiprocessing.cpu_count())
-        print(f"DEBUG: unique formats={len(tasks)}, workers={num_processes}")
-
-        with multiprocessing.Pool(processes=num_processes) as pool:
-            results = pool.starmap(generate_format, tasks)
-
-        # 4) Primary outputs
-        generated_files = [f for f in results if f]
-
-        # 5) Duplicate file only when multiple platforms share same format
-        #    (avoids re-rendering identical aspect ratio)
+            if fmt_key in families:
+                outputs = [(k, sizes[k], format_to_platforms[k][0].upper()) for k in families[fmt_key]]
+                tasks.append((fmt_key, dimensions, images, temp_base, property_id, output_dir, settings, primary_label,
+                              sources, None, outputs))
+            elif fmt_key in chunk_plans:
+                for segment in chunk_plans[fmt_key]:
+                    tasks.append((fmt_key, dimensions, images, temp_base, property_id, output_dir, settings, primary_label,
+                                  sources, segment))
+            else:
+                tasks.append((fmt_key, dimensions, images, temp_base, property_id, output_dir, settings, primary_label, sources))
+
+        # 3) Controlled parallelism: processes, ffmpeg threads and preprocessing threads from the plan
+        plan = finalize_plan(plan, [task[0] for task in tasks], settings)
+        tasks = [task[:6] + (task_settings(settings, plan, task[0]),) + task[7:] for task in tasks]
+        num_processes = plan["processes"]
+        print(f"DEBUG: unique formats={len(format_to_platforms)}, tasks={len(tasks)}, workers={num_processes}")
+        print(f"DEBUG: resource plan {json.dumps(plan)}")
+
+        check_canceled(cancel_event)
+        timer.lap("plan")
+        if pool_provider is None:
+            progress_counts = multiprocessing.Array('i', max(1, slot_count))
+            pool_context = multiprocessing.Pool(processes=num_processes, initializer=init_worker, initargs=(progress_counts,))
+        else:
+            pool_context = pool_provider(num_processes, slot_count)
+        with pool_context as pool:
+            results = run_pool_tasks(pool, tasks, cancel_event)
+
+            # Chunks must share one encoder to concatenate; re-render any that fell back to another
+            chunk_results = {}
+            for result in results:
+                if isinstance(result, dict):
+                    chunk_results.setdefault(result["fmt_key"], []).append(result)
+            retry = []
+            for fmt_key, chunks in chunk_results.items():
+                chunks.sort(key=lambda c: c["index"])
+                codec = chunks[0]["codec"]
+                for chunk in chunks[1:]:
+                    if chunk["codec"] != codec:
+                        print(f"Warning: {fmt_key} segment {chunk['index']} used {chunk['codec']}, re-rendering with {codec}")
+                        task = next(t for t in tasks if len(t) > 9 and t[0] == fmt_key and t[9]["index"] == chunk["index"])
+                        retry.append(task[:9] + (dict(task[9], codec=codec),))
+            for redone in run_pool_tasks(pool, retry, cancel_event) if retry else []:
+                chunks = chunk_results[redone["fmt_key"]]
+                chunks[redone["index"]] = dict(redone, audio_path=chunks[redone["index"]]["audio_path"])
+
+        check_canceled(cancel_event)
+        timer.lap("render")
+        # 4) Primary outputs (chunked formats are joined losslessly with the concat demuxer)
+        generated_files = []
+        for result in results:
+            if isinstance(result, list):
+                generated_files.extend(result)
+            elif result and not isinstance(result, dict):
+                generated_files.append(result)
+        for fmt_key, chunks in chunk_results.items():
+            out_filename = output_filename(property_id, fmt_key, format_to_platforms[fmt_key][0].upper())
+            concat_chunks([c["path"] for c in chunks], os.path.join(output_dir, out_filename),
+                          os.path.join(temp_base, "segments", f"{fmt_key}.txt"), audio_path=chunks[0]["audio_path"],
+                          durations=[(c.get("frames") or 0) / float(fps) for c in chunks])
+            print(f"DEBUG: joined {len(chunks)} segments into {out_filename}")
+            generated_files.append(out_filename)
+        timer.lap("concat")
+
+        # 5) Platforms sharing a format get the same bitstream: hardlink/reflink
+        #    aliases, or -c copy remuxes with settings.deliveryRemux (see delivery.py)
+        use_remux = bool(settings.get("deliveryRemux", False))
         for fmt_key, platforms_for_fmt in format_to_platforms.items():
             if len(platforms_for_fmt) <= 1:
                 continue
 
             primary_label = platforms_for_fmt[0].upper()
-            primary_name = f"{property_id}_{primary_label}_{fmt_key}.mp4"
+            primary_name = output_filename(property_id, fmt_key, primary_label)
             primary_path = os.path.join(output_dir, primary_name)
             if not os.path.exists(primary_path):
                 continue
 
             for platform_id in platforms_for_fmt[1:]:
                 label = platform_id.upper()
-                clone_name = f"{property_id}_{label}_{fmt_key}.mp4"
+                clone_name = output_filename(property_id, fmt_key, label)
                 clone_path = os.path.join(output_dir, clone_name)
                 try:
-                    shutil.copy2(primary_path, clone_path)
+                    method = remux(primary_path, clone_path, label) if use_remux else link_alias(primary_path, clone_path)
+                    print(f"DEBUG: {clone_name} delivered as {method} of {primary_name}")
                     generated_files.append(clone_name)
                 except Exception as copy_err:
                     print(f"Warning: failed to clone output for {label}/{fmt_key}: {copy_err}")
+        timer.lap("delivery")
+
+        (telemetry_sink or emit_telemetry)({
+            "event": "job",
+            "seconds": timer.elapsed(),
+            "stages": timer.stages,
+            "formats": list(format_to_platforms),
+            "files": len(generated_files),
+            "tasks": len(tasks),
+            "workers": num_processes,
+            "preview": is_preview(settings),
+            "encoders": settings.get("availableEncoders"),
+            "cache": {"audio": audio_cache},
+            "peakRssMB": peak_rss_mb(),
+        })
 
     finally:
         clean_temp(temp_base)
@@ -948,12 +1274,27 @@ def generate_slideshow(images, property_id, output_dir, settings):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--images", nargs="+", required=True)
-    parser.add_argument("--id", required=True)
-    parser.add_argument("--output", required=True)
-    parser.add_argument("--settings", required=True)
+    parser.add_argument("--images", nargs="+")
+    parser.add_argument("--id")
+    parser.add_argument("--output")
+    parser.add_argument("--settings")
+    # Warm service mode: NDJSON jobs on stdin (or a Unix socket), see service.py
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--socket")
+    parser.add_argument("--jobs", type=int, default=int(os.environ.get("GENERATOR_SERVICE_JOBS", "1")))
     
     args = parser.parse_args()
+
+    if args.serve:
+        from service import serve_stdin, serve_socket
+        if args.socket:
+            serve_socket(args.socket, args.jobs)
+        else:
+            serve_stdin(args.jobs)
+        sys.exit(0)
+    missing = [name for name in ("images", "id", "output", "settings") if not getattr(args, name)]
+    if missing:
+        parser.error("the following arguments are required: " + ", ".join("--" + name for name in missing))
     
     original_stdout = sys.stdout
     sys.stdout = sys.stderr
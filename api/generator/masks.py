@@ -0,0 +1,142 @@
+import math
+import threading
+from functools import lru_cache
+import numpy as np
+
+RIPPLE_AMPLITUDE = 20
+RIPPLE_WAVELENGTH = 20.0
+RIPPLE_SPEED = 10
+
+
+class MaskGeometry:
+    """Per-format fields shared by every masked transition of a render.
+
+    Fields are built lazily on first use and never change afterwards, so
+    per frame a mask is just a threshold written into a caller-owned buffer.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.cols = np.arange(width, dtype=np.int32)[np.newaxis, :]
+        self.rows = np.arange(height, dtype=np.int32)[:, np.newaxis]
+        self.max_radius = np.sqrt((width / 2) ** 2 + (height / 2) ** 2)
+        self._lock = threading.Lock()
+        self._dist_sq = None
+        self._diagonal = None
+        self._ripple_phase = None
+
+    @property
+    def dist_sq(self):
+        """Squared distance from the frame center. Values are exact multiples of 0.25."""
+        if self._dist_sq is None:
+            with self._lock:
+                if self._dist_sq is None:
+                    dx = (np.arange(self.width, dtype=np.float32) - np.float32(self.width / 2)) ** 2
+                    dy = (np.arange(self.height, dtype=np.float32) - np.float32(self.height / 2)) ** 2
+                    self._dist_sq = dy[:, np.newaxis] + dx[np.newaxis, :]
+        return self._dist_sq
+
+    @property
+    def diagonal(self):
+        """X + Y for every pixel."""
+        if self._diagonal is None:
+            with self._lock:
+                if self._diagonal is None:
+                    self._diagonal = self.rows + self.cols
+        return self._diagonal
+
+    @property
+    def ripple_phase(self):
+        """Row-wise phase table Y / wavelength."""
+        if self._ripple_phase is None:
+            self._ripple_phase = np.arange(self.height, dtype=np.float64) / RIPPLE_WAVELENGTH
+        return self._ripple_phase
+
+    def new_buffer(self, dtype=np.float32):
+        return np.zeros((self.height, self.width), dtype=dtype)
+
+    def wipe(self, direction, progress, out):
+        w, h = self.width, self.height
+        out.fill(0)
+        if direction == 'left':  # Reveal from right
+            out[:, int(w * (1 - progress)):] = 1
+        elif direction == 'right':
+            out[:, :int(w * progress)] = 1
+        elif direction == 'up':
+            out[int(h * (1 - progress)):, :] = 1
+        elif direction == 'down':
+            out[:int(h * progress), :] = 1
+        return out
+
+    def circle(self, mode, progress, out):
+        if mode == 'open':
+            # Reveal from center
+            r_sq = (self.max_radius * progress) ** 2
+            # dist_sq is quantized to 0.25, so snapping the threshold keeps the
+            # float32 comparison identical to a float64 one.
+            np.less_equal(self.dist_sq, np.float32(math.floor(r_sq * 4) / 4), out=out, casting='unsafe')
+        else:
+            # Close from edges
+            r_sq = (self.max_radius * (1 - progress)) ** 2
+            np.greater_equal(self.dist_sq, np.float32(math.ceil(r_sq * 4) / 4), out=out, casting='unsafe')
+        return out
+
+    def page_curl(self, limit, out):
+        # Integer X + Y < limit  <=>  X + Y < ceil(limit)
+        bound = self.width + self.height + 1
+        threshold = max(-bound, min(bound, math.ceil(limit)))
+        np.less(self.diagonal, np.int32(threshold), out=out, casting='unsafe')
+        return out
+
+    def ripple(self, progress, t, out):
+        limit = self.width * progress
+        wave = RIPPLE_AMPLITUDE * np.sin(self.ripple_phase + t * RIPPLE_SPEED)
+        thresholds = np.ceil(limit + wave).astype(np.int32)[:, np.newaxis]
+        np.less(self.cols, thresholds, out=out, casting='unsafe')
+        return out
+
+    # Row spans: every shaped mask above is a single [x0, x1) run per row (or
+    # its complement), which lets compositors copy slices instead of applying
+    # a full-frame boolean select. Results match the threshold masks exactly.
+
+    def _disc_spans(self, limit):
+        """Per-row [x0, x1) where (2x - w)^2 + (2y - h)^2 <= limit (4x dist_sq, integer)."""
+        w, h = self.width, self.height
+        dy = (2 * np.arange(h, dtype=np.int64) - h) ** 2
+        rem = int(limit) - dy
+        root = np.floor(np.sqrt(np.maximum(rem, 0))).astype(np.int64)
+        root -= root * root > rem
+        root += (root + 1) * (root + 1) <= rem
+        x0 = np.clip((w - root + 1) // 2, 0, w)
+        x1 = np.clip((w + root) // 2 + 1, 0, w)
+        empty = rem < 0
+        x0[empty] = 0
+        x1[empty] = 0
+        return x0, x1
+
+    def circle_spans(self, mode, progress):
+        """(x0, x1, inverted): the mask is the span, or everything but it when inverted."""
+        if mode == 'open':
+            r_sq = (self.max_radius * progress) ** 2
+            x0, x1 = self._disc_spans(math.floor(r_sq * 4))
+            return x0, x1, False
+        r_sq = (self.max_radius * (1 - progress)) ** 2
+        x0, x1 = self._disc_spans(math.ceil(r_sq * 4) - 1)
+        return x0, x1, True
+
+    def page_curl_spans(self, limit):
+        threshold = math.ceil(limit)
+        x1 = np.clip(threshold - self.rows[:, 0].astype(np.int64), 0, self.width)
+        return np.zeros_like(x1), x1, False
+
+    def ripple_spans(self, progress, t):
+        limit = self.width * progress
+        wave = RIPPLE_AMPLITUDE * np.sin(self.ripple_phase + t * RIPPLE_SPEED)
+        x1 = np.clip(np.ceil(limit + wave), 0, self.width).astype(np.int64)
+        return np.zeros_like(x1), x1, False
+
+
+@lru_cache(maxsize=8)
+def get_mask_geometry(width, height):
+    return MaskGeometry(width, height)
@@ -0,0 +1,78 @@
+import numpy as np
+from PIL import Image
+
+
+class StaticOverlay:
+    """Text/logo layers flattened once into a premultiplied RGBA patch.
+
+    The overlay never changes over time, so instead of letting moviepy
+    alpha-blend every layer onto every frame, the layers are composited once,
+    cropped to their bounding box and blended with a single integer op per
+    frame that only touches the covered rows/columns.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.canvas = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        self.box = None
+        self.premul = None
+        self.inv_alpha = None
+
+    def add(self, layer, x, y):
+        """Composite an RGBA layer with its top-left corner at (x, y), clipped to the frame."""
+        x = int(x)
+        y = int(y)
+        src_x = max(0, -x)
+        src_y = max(0, -y)
+        dest_x = max(0, x)
+        dest_y = max(0, y)
+        if dest_x >= self.width or dest_y >= self.height:
+            return
+        if src_x >= layer.width or src_y >= layer.height:
+            return
+        self.canvas.alpha_composite(layer, dest=(dest_x, dest_y), source=(src_x, src_y))
+        self.box = None
+
+    def finalize(self):
+        bbox = self.canvas.getchannel('A').getbbox()
+        if not bbox:
+            self.box = ()
+            return self
+        left, top, right, bottom = bbox
+        patch = np.asarray(self.canvas.crop(bbox), dtype=np.uint16)
+        alpha = patch[..., 3:4]
+        self.premul = patch[..., :3] * alpha
+        self.inv_alpha = 255 - alpha
+        self.box = (top, bottom, left, right)
+        return self
+
+    @property
+    def is_empty(self):
+        if self.box is None:
+            self.finalize()
+        return not self.box
+
+    def apply(self, frame):
+        """Return a copy of `frame` with the overlay blended in."""
+        if self.box is None:
+            self.finalize()
+        out = frame.astype(np.uint8, copy=True)
+        if not self.box:
+            return out
+        top, bottom, left, right = self.box
+        region = out[top:bottom, left:right]
+        blended = region * self.inv_alpha
+        blended += self.premul
+        # Rounded division by 255 without leaving uint16.
+        blended += 128
+        blended += blended >> 8
+        blended >>= 8
+        region[...] = blended
+        return out
+
+
+def apply_static_overlay(clip, overlay):
+    if overlay.is_empty:
+        return clip
+    return clip.fl_image(overlay.apply)
@@ -0,0 +1,106 @@
+import numpy as np
+from PIL import Image
+from moviepy.editor import VideoClip
+
+ZOOM_MODES = ("none", "in", "out")
+DEFAULT_ZOOM_AMOUNT = 0.1
+
+
+def cover_size(img_w, img_h, target_w, target_h, zoom_amount=0.0):
+    """Size of the image scaled to cover the target, enlarged for the zoom headroom."""
+    scale = max(target_w / img_w, target_h / img_h) * (1 + zoom_amount)
+    return int(img_w * scale), int(img_h * scale)
+
+
+class PanZoomSource:
+    """Ken Burns frame source over one image that is scaled exactly once.
+
+    Without zoom, frames follow the same integer pan positions the old
+    set_position/CompositeVideoClip path produced and are returned as
+    zero-copy views into the scaled image. Zoom and sub-pixel motion crop a
+    float window and resample it in one bilinear pass (a scale + translate
+    affine warp via PIL's box resize).
+    """
+
+    def __init__(self, pixels, target_w, target_h, duration, pan=True, zoom="none",
+                 zoom_amount=DEFAULT_ZOOM_AMOUNT, subpixel=False):
+        self.target_w = target_w
+        self.target_h = target_h
+        self.denom = duration if duration > 0 else 0.01
+        self.zoom = zoom if zoom in ZOOM_MODES else "none"
+        self.zoom_amount = max(0.0, float(zoom_amount)) if self.zoom != "none" else 0.0
+        self.warp = self.zoom != "none" or bool(subpixel)
+
+        img = pixels if isinstance(pixels, Image.Image) else Image.fromarray(np.asarray(pixels))
+        # Pan axis comes from the unzoomed cover size, like make_panorama_clip
+        base_w, base_h = cover_size(img.width, img.height, target_w, target_h)
+        self.pan_x = max(0, base_w - target_w) if pan else 0
+        self.pan_y = max(0, base_h - target_h) if pan and not self.pan_x else 0
+
+        scaled_w, scaled_h = cover_size(img.width, img.height, target_w, target_h, self.zoom_amount)
+        # Same LANCZOS resize moviepy's resizer applied (ANTIALIAS is LANCZOS)
+        self.image = img.resize((scaled_w, scaled_h), Image.Resampling.LANCZOS)
+        self.scaled = np.asarray(self.image)
+        self.scaled_w = scaled_w
+        self.scaled_h = scaled_h
+
+    def frame(self, t):
+        if self.warp:
+            return self._warped_frame(t)
+        return self._integer_frame(t)
+
+    __call__ = frame
+
+    def _integer_frame(self, t):
+        tw, th = self.target_w, self.target_h
+        sw, sh = self.scaled_w, self.scaled_h
+        # Positions as the old lambdas computed them, truncated like moviepy's blit
+        if self.pan_x > 0:
+            px = int(0 + (-self.pan_x) * (t / self.denom))
+            py = int((th - sh) // 2)
+        elif self.pan_y > 0:
+            px = int((tw - sw) // 2)
+            py = int(0 + (-self.pan_y) * (t / self.denom))
+        else:
+            px = int((tw - sw) / 2)
+            py = int((th - sh) / 2)
+        x0, y0 = -px, -py
+        if 0 <= x0 and x0 + tw <= sw and 0 <= y0 and y0 + th <= sh:
+            return self.scaled[y0:y0 + th, x0:x0 + tw]
+        # Window runs off the image (rounding at the edges): blit onto black
+        canvas = np.zeros((th, tw, 3), dtype=np.uint8)
+        src_x0, src_y0 = max(0, x0), max(0, y0)
+        dst_x0, dst_y0 = max(0, -x0), max(0, -y0)
+        width = min(sw - src_x0, tw - dst_x0)
+        height = min(sh - src_y0, th - dst_y0)
+        if width > 0 and height > 0:
+            canvas[dst_y0:dst_y0 + height, dst_x0:dst_x0 + width] = \
+                self.scaled[src_y0:src_y0 + height, src_x0:src_x0 + width]
+        return canvas
+
+    def _zoom_at(self, progress):
+        if self.zoom == "in":
+            return 1 + self.zoom_amount * progress
+        if self.zoom == "out":
+            return 1 + self.zoom_amount * (1 - progress)
+        return 1.0
+
+    def _warped_frame(self, t):
+        tw, th = self.target_w, self.target_h
+        progress = min(1.0, max(0.0, t / self.denom))
+        # Source pixels per output pixel; 1.0 at full zoom
+        step = (1 + self.zoom_amount) / self._zoom_at(progress)
+        win_w = min(self.scaled_w, tw * step)
+        win_h = min(self.scaled_h, th * step)
+        range_x = self.scaled_w - win_w
+        range_y = self.scaled_h - win_h
+        x0 = range_x * progress if self.pan_x > 0 else range_x / 2
+        y0 = range_y * progress if self.pan_y > 0 else range_y / 2
+        box = (x0, y0, x0 + win_w, y0 + win_h)
+        return np.asarray(self.image.resize((tw, th), Image.Resampling.BILINEAR, box=box))
+
+
+def pan_zoom_clip(pixels, duration, target_w, target_h, **options):
+    """VideoClip of a PanZoomSource; options are PanZoomSource keyword arguments."""
+    source = PanZoomSource(pixels, target_w, target_h, duration, **options)
+    return VideoClip(source.frame, duration=duration)
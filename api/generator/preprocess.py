@@ -1,22 +1,112 @@
 import os
+import threading
 from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from PIL import Image
+from sources import open_source_image, plan_decode_size, REDUCING_GAP
 
-def preprocess_image(image_path, output_dir, target_width, target_height):
+# Frame handoff modes: "jpeg" writes processed_*.jpg (legacy), "memory" hands
+# uint8 arrays to the clips and spills to memory-mapped .npy past the budget.
+HANDOFF_MODES = ("memory", "jpeg")
+DEFAULT_MEMORY_BUDGET_MB = 512
+
+class MemoryBudget:
+    """Byte budget for frames kept in RAM by one format worker."""
+
+    def __init__(self, limit_bytes):
+        self.limit = limit_bytes
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, nbytes):
+        with self._lock:
+            if self.used + nbytes > self.limit:
+                return False
+            self.used += nbytes
+            return True
+
+def memory_budget_from_env():
+    return MemoryBudget(int(os.environ.get('PREPROCESS_MEMORY_BUDGET_MB', str(DEFAULT_MEMORY_BUDGET_MB))) * 1024 * 1024)
+
+def frame_variant(reduced_decode, handoff="jpeg"):
+    """Frame cache variant tag for the preprocessing options that change pixels."""
+    variant = "reduced" if reduced_decode else "full"
+    return variant if handoff == "jpeg" else f"{variant}-raw"
+
+def frame_extension(handoff):
+    return ".jpg" if handoff == "jpeg" else ".npy"
+
+def cached_parent_frame(cache, image_path, parent_size, variant, ext):
+    """A cached frame of the same photo at a larger size of the same aspect, or None."""
+    parent_path = cache.path_for(cache.key(image_path, parent_size[0], parent_size[1], variant), ext)
+    try:
+        if ext == ".jpg":
+            with Image.open(parent_path) as parent:
+                return parent.convert("RGB")
+        return Image.fromarray(np.load(parent_path))
+    except (FileNotFoundError, OSError, ValueError):
+        return None
+
+def warm_parent_frame(cache, image_path, output_dir, parent_size, source=None, reduced_decode=False, handoff="jpeg"):
+    """Cache the frame at parent_size (what the final render of a preview looks up), unless it already is."""
+    variant = frame_variant(reduced_decode, handoff)
+    if cache.contains(cache.key(image_path, parent_size[0], parent_size[1], variant), frame_extension(handoff)):
+        return
+    # A shared decode reduced for preview sizes is too small; decode again then
+    if source:
+        needed = plan_decode_size(tuple(source["size"]), [parent_size]) or tuple(source["size"])
+        decoded = tuple(source["decoded_size"])
+        if decoded[0] < needed[0] or decoded[1] < needed[1]:
+            source = None
+    parent_dir = os.path.join(output_dir, "parent")
+    os.makedirs(parent_dir, exist_ok=True)
+    preprocess_image(image_path, parent_dir, parent_size[0], parent_size[1], source=source, reduced_decode=reduced_decode,
+                     cache=cache, handoff=handoff)
+
+def preprocess_image(image_path, output_dir, target_width, target_height, source=None, reduced_decode=False, cache=None,
+                     handoff="jpeg", budget=None, parent_size=None, warm_parent=False):
     """
     Preprocess a single image:
     - No cropping allowed (contain mode).
     - Background: same image, cover mode.
     - Upscale maximum 2x only.
     - Save to output_dir.
+    - `source` is the job-level decoded copy (see sources.decode_sources), if any.
+    - `reduced_decode` decodes JPEGs at the smallest DCT scale that still covers
+      the target and lets the final resize use reduce() first.
+    - `cache` (frame_cache.FrameCache) skips decode and resize for frames
+      rendered by an earlier job.
+    - `handoff` "jpeg" returns a JPEG path; "memory" returns a uint8 array, kept
+      in RAM while `budget` allows and memory-mapped from a .npy otherwise.
+    - `parent_size` (preview renders) is the full output size of the format: a
+      cached frame at that size is downscaled instead of decoding the source.
+      With `warm_parent` that frame is computed and cached first when missing,
+      so the final render queued after a preview hits the cache.
     """
     try:
         filename = os.path.basename(image_path)
         stem, _ext = os.path.splitext(filename)
-        # Always write JPEG temp frames for much faster encode pipeline
-        output_path = os.path.join(output_dir, f"processed_{stem}.jpg")
+        # JPEG temp frame (legacy handoff) or .npy spill / cache file
+        output_path = os.path.join(output_dir, f"processed_{stem}{frame_extension(handoff)}")
+
+        if cache is not None and parent_size and warm_parent:
+            warm_parent_frame(cache, image_path, output_dir, parent_size, source, reduced_decode, handoff)
+
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key(image_path, target_width, target_height, frame_variant(reduced_decode, handoff))
+            if cache.fetch(cache_key, output_path):
+                if handoff == "jpeg":
+                    return output_path
+                return np.load(output_path, mmap_mode='r')
 
-        img = Image.open(image_path).convert("RGB")
+        img = None
+        if cache is not None and parent_size:
+            img = cached_parent_frame(cache, image_path, parent_size, frame_variant(reduced_decode, handoff),
+                                      frame_extension(handoff))
+        if img is None:
+            target_sizes = [(target_width, target_height)] if reduced_decode else None
+            img = open_source_image(image_path, source, target_sizes)
         img_w, img_h = img.size
         target_ratio = target_width / target_height
         img_ratio = img_w / img_h
@@ -25,28 +115,55 @@ def preprocess_image(image_path, output_dir, target_width, target_height):
         bg_scale = max(target_width / img_w, target_height / img_h)
         bg_w = int(img_w * bg_scale)
         bg_h = int(img_h * bg_scale)
-        bg = img.resize((bg_w, bg_h), Image.Resampling.LANCZOS)
+        bg = img.resize((bg_w, bg_h), Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP if reduced_decode else None)
         left = max(0, (bg_w - target_width) // 2)
         top = max(0, (bg_h - target_height) // 2)
         bg = bg.crop((left, top, left + target_width, top + target_height))
 
-        # JPEG temp with high quality and fast write
-        bg.save(output_path, format='JPEG', quality=92, optimize=False, progressive=False, subsampling=0)
-        return output_path
+        if handoff == "jpeg":
+            # JPEG temp with high quality and fast write
+            bg.save(output_path, format='JPEG', quality=92, optimize=False, progressive=False, subsampling=0)
+            frame = output_path
+        else:
+            # Lossless handoff: no JPEG encode/decode between preprocessing and the clip
+            frame = np.asarray(bg)
+            in_memory = budget is None or budget.reserve(frame.nbytes)
+            if cache_key or not in_memory:
+                np.save(output_path, frame)
+            if not in_memory:
+                frame = np.load(output_path, mmap_mode='r')
+        if cache_key:
+            try:
+                cache.store(cache_key, output_path)
+            except OSError as cache_err:
+                print(f"Warning: failed to cache frame for {image_path}: {cache_err}")
+        return frame
 
     except Exception as e:
         print(f"Error processing {image_path}: {str(e)}")
         raise
 
-def preprocess_images(image_paths, temp_dir, width, height):
+def preprocess_images(image_paths, temp_dir, width, height, sources=None, reduced_decode=False, cache=None,
+                      handoff="jpeg", budget=None, max_workers=None, parent_size=None, warm_parent=False):
+    """Preprocess every image for one format; returns JPEG paths or arrays (see preprocess_image)."""
     if not image_paths:
         return []
 
-    # Keep preprocessing thread count low; generator already runs 4 parallel formats.
-    # High thread counts here create CPU/RAM thrashing.
-    configured = int(os.environ.get('PREPROCESS_MAX_WORKERS', '2'))
+    # Thread count comes from the job's resource plan; without one keep it low,
+    # since several formats preprocess at once and more threads thrash CPU/RAM.
+    configured = int(max_workers or os.environ.get('PREPROCESS_MAX_WORKERS', '2'))
     max_workers = max(1, min(configured, len(image_paths)))
+    sources = sources or {}
+    if handoff != "jpeg" and budget is None:
+        budget = memory_budget_from_env()
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(preprocess_image, p, temp_dir, width, height) for p in image_paths]
-        return [future.result() for future in futures]
+        futures = [
+            executor.submit(preprocess_image, p, temp_dir, width, height, sources.get(p), reduced_decode, cache, handoff, budget,
+                            parent_size, warm_parent)
+            for p in image_paths
+        ]
+        results = [future.result() for future in futures]
+    if cache is not None:
+        cache.evict()
+    return results
@@ -0,0 +1,38 @@
+"""Where render workers send ::PROGRESS:: updates.
+
+By default progress goes to stderr as ::PROGRESS::<format>::<percent> lines,
+which the Node server parses. The pool initializer can also install a
+multiprocessing queue (the generator service turns its items into progress
+events) and the shared per-chunk frame counters used by segment rendering.
+telemetry.py sends its JSON events through the same queue when one is set.
+"""
+import sys
+
+# Installed in every pool worker by init_worker
+_progress_counts = None
+_events = None
+
+
+def init_worker(progress_counts=None, events=None):
+    global _progress_counts, _events
+    _progress_counts = progress_counts
+    _events = events
+
+
+def progress_counts():
+    return _progress_counts
+
+
+def event_queue():
+    return _events
+
+
+def report(fmt, percentage):
+    if _events is not None:
+        try:
+            _events.put_nowait((fmt, int(percentage)))
+            return
+        except Exception:
+            pass
+    sys.stderr.write(f"::PROGRESS::{fmt}::{int(percentage)}\n")
+    sys.stderr.flush()
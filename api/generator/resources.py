@@ -0,0 +1,195 @@
+"""Job-wide resource plan: render processes, ffmpeg threads and preprocessing threads.
+
+generate_slideshow asks for one plan per job instead of letting each knob
+guess on its own. The plan looks at the unique formats (and their pixel
+counts), the cores this process may use and the free memory, then picks:
+
+- how many time segments each format is split into (more for bigger formats),
+- how many worker processes run at once (capped so their estimated peak
+  memory fits in what is free),
+- ffmpeg threads per format (the cores left per process, weighted by pixels),
+- preprocessing threads per worker.
+
+Explicit settings (parallelWorkers, ffmpegThreadsPerProcess,
+preprocessWorkers, segmentsPerFormat) and PREPROCESS_MAX_WORKERS win over
+the planner. cpuBudget / memoryBudgetMB (granted by the Node scheduler when
+several jobs run at once) shrink the cores and memory the plan may use.
+"""
+import os
+
+MB = 1024 * 1024
+# Interpreter + moviepy + fonts, before any frames
+BASE_WORKER_MB = 300
+# Frames a worker keeps besides the preprocessed photos: writer ring, static frame, overlay
+EXTRA_FRAMES = 8
+# yuv420 frames x264 keeps for lookahead and references
+ENCODER_FRAMES = 16
+# Share of free memory the workers may plan to use
+MEMORY_HEADROOM = 0.8
+# x264 gains little beyond this many threads on one stream
+MAX_FFMPEG_THREADS = 16
+MAX_PREPROCESS_WORKERS = 8
+
+
+def available_cpus():
+    """Cores this process may run on (affinity/cgroup aware where the OS reports it)."""
+    if hasattr(os, "sched_getaffinity"):
+        try:
+            return max(1, len(os.sched_getaffinity(0)))
+        except OSError:
+            pass
+    return max(1, os.cpu_count() or 1)
+
+
+def available_memory():
+    """Free physical memory in bytes, or None when it cannot be determined."""
+    try:
+        import psutil
+        return int(psutil.virtual_memory().available)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def worker_memory(width, height, image_count, handoff="memory"):
+    """Estimated peak bytes of one render process for a format."""
+    frame = width * height * 3
+    photos = image_count if handoff == "memory" else 0
+    return BASE_WORKER_MB * MB + frame * (photos + EXTRA_FRAMES) + int(width * height * 1.5) * ENCODER_FRAMES
+
+
+def _setting_int(settings, key):
+    value = settings.get(key)
+    if value in (None, "", "auto"):
+        return None
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def plan_resources(formats, image_count, settings, cpus=None, free_memory=None):
+    """First pass: segments per format and the process cap.
+
+    `formats` maps fmt_key -> (width, height). Call finalize_plan once the
+    tasks are known to size processes and threads.
+    """
+    cpus = cpus or available_cpus()
+    if free_memory is None:
+        free_memory = available_memory()
+    cpu_budget = _setting_int(settings, "cpuBudget")
+    if cpu_budget:
+        cpus = min(cpus, cpu_budget)
+    memory_budget = _setting_int(settings, "memoryBudgetMB")
+    if memory_budget:
+        free_memory = min(free_memory, memory_budget * MB) if free_memory else memory_budget * MB
+    handoff = settings.get("frameHandoff", "memory")
+    pixels = {fmt_key: w * h for fmt_key, (w, h) in formats.items()}
+    total_pixels = sum(pixels.values()) or 1
+
+    per_worker = max(worker_memory(w, h, image_count, handoff) for w, h in formats.values())
+    memory_cap = cpus
+    if free_memory:
+        memory_cap = max(1, int(free_memory * MEMORY_HEADROOM // per_worker))
+    process_cap = min(cpus, memory_cap)
+    explicit_workers = _setting_int(settings, "parallelWorkers")
+    if explicit_workers:
+        process_cap = min(process_cap, explicit_workers)
+
+    chunks = {fmt_key: 1 for fmt_key in formats}
+    mode = settings.get("segmentParallel", "auto")
+    segmenting = mode is not False and mode != "off" and bool(settings.get("pipelinedWriter", True))
+    requested_chunks = _setting_int(settings, "segmentsPerFormat")
+    if segmenting and requested_chunks:
+        chunks = {fmt_key: requested_chunks for fmt_key in formats}
+    elif segmenting and process_cap > len(formats):
+        # Spare process slots go to the formats with the most pixels to render
+        for fmt_key in formats:
+            chunks[fmt_key] = max(1, int(round(process_cap * pixels[fmt_key] / total_pixels)))
+
+    return {
+        "cpus": cpus,
+        "free_memory_mb": int(free_memory / MB) if free_memory else None,
+        "worker_memory_mb": int(per_worker / MB),
+        "process_cap": process_cap,
+        "memory_cap": memory_cap,
+        "pixels": pixels,
+        "chunks": chunks,
+    }
+
+
+def finalize_plan(plan, task_formats, settings):
+    """Second pass: processes, ffmpeg threads per format and preprocessing threads.
+
+    `task_formats` lists the fmt_key of every pool task (one per chunk).
+    Returns the plan with "processes", "ffmpeg_threads" ({fmt_key: n}),
+    "preprocess_workers" and the estimated "cpu_utilization".
+    """
+    cpus = plan["cpus"]
+    processes = max(1, min(plan["process_cap"], len(task_formats)))
+    cores_per_process = max(1, cpus // processes)
+
+    explicit_threads = _setting_int(settings, "ffmpegThreadsPerProcess")
+    ffmpeg_threads = {}
+    formats = list(dict.fromkeys(task_formats))
+    mean_pixels = sum(plan["pixels"][f] for f in formats) / max(1, len(formats))
+    for fmt_key in formats:
+        if explicit_threads:
+            ffmpeg_threads[fmt_key] = explicit_threads
+            continue
+        # Bigger formats get proportionally more of the per-process cores
+        weighted = cores_per_process * plan["pixels"][fmt_key] / mean_pixels
+        ffmpeg_threads[fmt_key] = max(1, min(MAX_FFMPEG_THREADS, cpus, int(round(weighted))))
+
+    env_workers = os.environ.get("PREPROCESS_MAX_WORKERS")
+    preprocess_workers = _setting_int(settings, "preprocessWorkers")
+    if not preprocess_workers and env_workers:
+        preprocess_workers = max(1, int(env_workers))
+    if not preprocess_workers:
+        # Preprocessing runs before encoding starts, so it may use the process's share of cores
+        preprocess_workers = max(1, min(MAX_PREPROCESS_WORKERS, cores_per_process))
+
+    # One compositing thread per process plus its ffmpeg threads, over the first wave of tasks
+    running = task_formats[:processes]
+    busy = sum(1 + ffmpeg_threads[f] for f in running)
+    plan.update({
+        "processes": processes,
+        "ffmpeg_threads": ffmpeg_threads,
+        "preprocess_workers": preprocess_workers,
+        "tasks": len(task_formats),
+        "cpu_utilization": round(min(1.0, busy / cpus), 2),
+        "planned_memory_mb": processes * plan["worker_memory_mb"],
+    })
+    return plan
+
+
+def task_settings(settings, plan, fmt_key):
+    """Settings for one pool task with the planned thread counts filled in."""
+    return dict(
+        settings,
+        ffmpegThreadsPerProcess=plan["ffmpeg_threads"][fmt_key],
+        preprocessWorkers=plan["preprocess_workers"],
+    )
+
+
+def format_ffmpeg_threads(settings, fmt_key, size):
+    """ffmpeg threads for one format, for callers that render it outside a job plan.
+
+    Pool tasks get the planned count through task_settings; anything else
+    plans the format as a one-task job, so both use the same rules.
+    """
+    explicit = _setting_int(settings, "ffmpegThreadsPerProcess")
+    if explicit:
+        return explicit
+    plan = finalize_plan(plan_resources({fmt_key: size}, 0, settings), [fmt_key], settings)
+    return plan["ffmpeg_threads"][fmt_key]
@@ -0,0 +1,160 @@
+"""Segment-parallel rendering of one format.
+
+The coordinator cuts a format's timeline at body/transition boundaries into
+chunks of roughly equal estimated cost. Each chunk is rendered by its own
+worker process as a frame range of the full clip (same frame times as a
+single render, same encoder settings). The chunks are then joined with
+ffmpeg's concat demuxer (-c copy), and the separately encoded audio track
+is muxed in the same pass.
+"""
+import os
+import math
+import subprocess as sp
+from proglog import ProgressBarLogger
+from moviepy.config import get_setting
+
+from compositor import NATIVE_TRANSITIONS
+from progress import progress_counts, report
+
+# Relative per-frame cost estimates (1.0 = encode a frame that is composited once)
+STATIC_FRAME_COST = 1.0
+PAN_FRAME_COST = 1.6
+TRANSITION_FRAME_COSTS = {
+    "fade": 1.8,
+    "slide": 1.4,
+    "wipe": 1.3,
+    "circle": 1.5,
+    "page_curl": 1.5,
+    "ripple": 1.5,
+    "zoom": 2.5,
+    "spin": 2.5,
+    "fly": 2.5,
+}
+# moviepy CompositeVideoClip paths (pixelate/glitch, or nativeTransitions off)
+LEGACY_TRANSITION_FRAME_COST = 4.0
+# Every chunk pays process start-up, preprocessing and overlay setup
+MIN_CHUNK_SECONDS = 2.0
+
+
+def plan_parts(image_count, duration, trans_duration, is_cut, static_flags):
+    """(kind, index, duration, static) parts in playback order, as generate_format lays clips out."""
+    parts = []
+    for i in range(image_count):
+        if is_cut:
+            parts.append(("body", i, duration, static_flags[i]))
+            continue
+        if i > 0:
+            parts.append(("transition", i, trans_duration, False))
+        parts.append(("body", i, duration, static_flags[i]))
+    return parts
+
+
+def transition_frame_cost(transition_type, native=True):
+    if transition_type == "cut":
+        return STATIC_FRAME_COST
+    if native and transition_type in NATIVE_TRANSITIONS:
+        return TRANSITION_FRAME_COSTS.get(NATIVE_TRANSITIONS[transition_type][0], LEGACY_TRANSITION_FRAME_COST)
+    return LEGACY_TRANSITION_FRAME_COST
+
+
+def segment_costs(segments, fps, transition_type, native=True):
+    """Estimated cost of each timeline segment (frames x per-frame weight)."""
+    costs = []
+    for seg in segments:
+        frames = (seg["end"] - seg["start"]) * fps
+        if seg["kind"] == "transition":
+            weight = transition_frame_cost(transition_type, native)
+        elif seg["static"]:
+            weight = STATIC_FRAME_COST
+        else:
+            weight = PAN_FRAME_COST
+        costs.append(frames * weight)
+    return costs
+
+
+def plan_chunks(segments, costs, fps, chunks):
+    """Split the timeline into at most `chunks` frame ranges of balanced cost.
+
+    Cuts are only placed on segment boundaries. Returns (start_frame,
+    end_frame) pairs; the last end is None, meaning "to the end of the clip",
+    so float drift in the total duration can never drop a frame.
+    """
+    if not segments:
+        return [(0, None)]
+    total_seconds = segments[-1]["end"]
+    chunks = max(1, min(int(chunks), int(total_seconds // MIN_CHUNK_SECONDS) or 1))
+    total_cost = sum(costs)
+    boundaries = []
+    running = 0.0
+    for seg, cost in zip(segments[:-1], costs[:-1]):
+        running += cost
+        boundaries.append((running, seg["end"]))
+
+    cut_times = []
+    for k in range(1, chunks):
+        goal = total_cost * k / chunks
+        candidates = [b for b in boundaries if not cut_times or b[1] > cut_times[-1]]
+        if not candidates:
+            break
+        _, cut_time = min(candidates, key=lambda b: abs(b[0] - goal))
+        if cut_time - (cut_times[-1] if cut_times else 0.0) < MIN_CHUNK_SECONDS / 2:
+            continue
+        cut_times.append(cut_time)
+
+    frames = [int(math.ceil(t * fps - 1e-6)) for t in cut_times]
+    frames = sorted(set(f for f in frames if f > 0))
+    starts = [0] + frames
+    ends = frames + [None]
+    return list(zip(starts, ends))
+
+
+class SegmentProgressLogger(ProgressBarLogger):
+    """Reports one ::PROGRESS:: percentage per format across all of its chunk workers."""
+
+    def __init__(self, fmt, slot, format_slots, total_frames):
+        super().__init__()
+        self.fmt = fmt
+        self.slot = slot
+        self.format_slots = format_slots
+        self.total_frames = max(1, total_frames)
+        self.last_percentage = -1
+
+    def callback(self, **changes):
+        pass
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        counts = progress_counts()
+        if bar != 't' or attr != 'index' or counts is None:
+            return
+        counts[self.slot] = value
+        done = sum(counts[s] for s in self.format_slots)
+        percentage = min(100, int(done * 100 / self.total_frames))
+        if percentage != self.last_percentage:
+            self.last_percentage = percentage
+            report(self.fmt, percentage)
+
+
+def concat_chunks(chunk_paths, out_path, list_path, audio_path=None, durations=None):
+    """Join encoded chunks without re-encoding and mux the audio track, if any.
+
+    durations (seconds per chunk, from its frame count) pin where each next
+    chunk starts; a -c copy output's container duration can be short by its
+    last frames, which would make the following chunk overlap it.
+    """
+    with open(list_path, 'w', encoding='utf-8') as handle:
+        for index, path in enumerate(chunk_paths):
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            handle.write(f"file '{escaped}'\n")
+            if durations and durations[index]:
+                handle.write(f"duration {durations[index]:.6f}\n")
+    cmd = [get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error',
+           '-f', 'concat', '-safe', '0', '-i', list_path]
+    if audio_path:
+        cmd.extend(['-i', audio_path, '-map', '0:v', '-map', '1:a'])
+    cmd.extend(['-c', 'copy', out_path])
+    popen_params = {"stdout": sp.DEVNULL, "stderr": sp.PIPE}
+    if os.name == "nt":
+        popen_params["creationflags"] = 0x08000000  # CREATE_NO_WINDOW
+    proc = sp.run(cmd, **popen_params)
+    if proc.returncode != 0:
+        raise IOError(f"ffmpeg concat failed for {out_path}: {proc.stderr.decode('utf-8', errors='replace').strip()}")
@@ -0,0 +1,318 @@
+"""Long-lived generator service (`python generator.py --serve`).
+
+Keeps the interpreter, imports, fonts and a worker pool warm between jobs.
+Jobs and events are newline-delimited JSON, over stdin/stdout by default or
+over each connection of a local Unix socket (--socket PATH).
+
+Requests:
+    {"type": "job", "id": "...", "images": [...], "propertyId": "...", "output": "...", "settings": {...}}
+    {"type": "cancel", "id": "..."}
+    {"type": "ping"}
+    {"type": "shutdown"}
+
+Events:
+    {"type": "ready", "pid": 123}
+    {"type": "accepted", "id": "...", "position": 0}
+    {"type": "started", "id": "..."}
+    {"type": "progress", "id": "...", "format": "9x16", "percent": 42}
+    {"type": "telemetry", "id": "...", "event": "format" | "encode_failed" | "job", ...} (see telemetry.py)
+    {"type": "result", "id": "...", "status": "success", "files": [...]}
+    {"type": "result", "id": "...", "status": "error" | "canceled", "message": "..."}
+    {"type": "pong"} / {"type": "error", "message": "..."} for bad requests
+
+Jobs start in arrival order, up to --jobs at once (each on its own warm
+pool; the Node scheduler decides how many cores each may use through
+cpuBudget). Canceling a running job terminates its pool's workers (the next
+job on that runner starts a fresh pool).
+"""
+import os
+import sys
+import json
+import queue
+import socket
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+from generator import generate_slideshow, JobCanceled
+from progress import init_worker
+from telemetry import envelope
+
+# Frame counters shared with the warm pool (one per segment task of a job)
+PROGRESS_SLOTS = 1024
+
+
+def pool_context():
+    """forkserver where available: forking this threaded process directly can
+    leave a worker stuck on a lock another runner held at fork time."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Workers fork from a server that has already imported the generator
+        context.set_forkserver_preload(["generator"])
+        return context
+    return multiprocessing.get_context()
+
+
+class WarmPool:
+    """A worker pool reused across jobs while the job's process count stays the same."""
+
+    def __init__(self):
+        self.context = pool_context()
+        self.pool = None
+        self.processes = 0
+        self.counts = self.context.Array('i', PROGRESS_SLOTS)
+        self.events = self.context.Queue()
+
+    def _start(self, processes):
+        self.close()
+        self.pool = self.context.Pool(processes=processes, initializer=init_worker,
+                                      initargs=(self.counts, self.events))
+        self.processes = processes
+        print(f"DEBUG: service started a pool of {processes} workers")
+
+    @contextmanager
+    def lease(self, processes, slots):
+        if slots > PROGRESS_SLOTS:
+            # Oversized job: a one-off pool with its own counters
+            counts = self.context.Array('i', slots)
+            with self.context.Pool(processes=processes, initializer=init_worker,
+                                   initargs=(counts, self.events)) as pool:
+                yield pool
+            return
+        if self.pool is None or self.processes != processes:
+            self._start(processes)
+        for index in range(min(slots, PROGRESS_SLOTS)):
+            self.counts[index] = 0
+        try:
+            yield self.pool
+        except BaseException:
+            # Canceled or failed mid-job: workers may still be rendering, drop them
+            self.terminate()
+            raise
+
+    def terminate(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+            self.processes = 0
+            # A queue can be left corrupted by killed writers
+            self.events = self.context.Queue()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+            self.processes = 0
+
+
+class JobRunner:
+    """Runs one job at a time on its own warm pool and relays that job's progress."""
+
+    def __init__(self, service, index):
+        self.service = service
+        self.warm_pool = WarmPool()
+        self.current = None
+        self.thread = threading.Thread(target=self._run_jobs, name=f"job-runner-{index}", daemon=True)
+        self.relay = threading.Thread(target=self._relay_progress, name=f"progress-relay-{index}", daemon=True)
+        self.thread.start()
+        self.relay.start()
+
+    def _run_jobs(self):
+        service = self.service
+        while True:
+            job = service.jobs.get()
+            if job is None:
+                return
+            message = job["message"]
+            job_id = message["id"]
+            with service.lock:
+                service.pending.pop(job_id, None)
+                self.current = job
+            emit = job["emit"]
+            try:
+                if job["cancel"].is_set():
+                    raise JobCanceled("Job canceled")
+                emit({"type": "started", "id": job_id})
+                files = generate_slideshow(message["images"], message["propertyId"], message["output"],
+                                           message.get("settings") or {}, pool_provider=self.warm_pool.lease,
+                                           cancel_event=job["cancel"],
+                                           telemetry_sink=lambda event: emit(dict(envelope(event), type="telemetry", id=job_id)))
+                emit({"type": "result", "id": job_id, "status": "success", "files": files})
+            except JobCanceled as canceled:
+                emit({"type": "result", "id": job_id, "status": "canceled", "message": str(canceled)})
+            except Exception as e:
+                emit({"type": "result", "id": job_id, "status": "error", "message": str(e)})
+            finally:
+                with service.lock:
+                    self.current = None
+
+    def _relay_progress(self):
+        while True:
+            try:
+                item = self.warm_pool.events.get(timeout=0.2)
+            except queue.Empty:
+                if not self.service.running and self.current is None:
+                    return
+                continue
+            except (EOFError, OSError, ValueError):
+                continue
+            job = self.current
+            if job is None:
+                continue
+            if isinstance(item, dict):
+                # Telemetry event from a worker (telemetry.emit)
+                job["emit"](dict(item, type="telemetry", id=job["message"]["id"]))
+            else:
+                fmt, percent = item
+                job["emit"]({"type": "progress", "id": job["message"]["id"], "format": fmt, "percent": percent})
+
+
+class GeneratorService:
+    """Job queue shared by all clients, drained by `jobs` concurrent runners."""
+
+    def __init__(self, jobs=1):
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.running = True
+        self.runners = [JobRunner(self, index) for index in range(max(1, int(jobs)))]
+
+    def handle(self, message, emit):
+        kind = message.get("type")
+        if kind == "job":
+            self.submit(message, emit)
+        elif kind == "cancel":
+            self.cancel(message.get("id"))
+        elif kind == "ping":
+            emit({"type": "pong"})
+        elif kind == "shutdown":
+            self.shutdown()
+        else:
+            emit({"type": "error", "message": f"Unknown request type: {kind}"})
+
+    def submit(self, message, emit):
+        job_id = message.get("id")
+        missing = [key for key in ("id", "images", "propertyId", "output") if not message.get(key)]
+        if missing:
+            emit({"type": "error", "id": job_id, "message": f"Job is missing {', '.join(missing)}"})
+            return
+        job = {"message": message, "emit": emit, "cancel": threading.Event()}
+        with self.lock:
+            self.pending[job_id] = job
+            position = self.jobs.qsize()
+        self.jobs.put(job)
+        emit({"type": "accepted", "id": job_id, "position": position})
+
+    def _active(self):
+        return [runner.current for runner in self.runners if runner.current is not None]
+
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.pending.get(job_id)
+            if job is None:
+                job = next((active for active in self._active() if active["message"]["id"] == job_id), None)
+        if job is not None:
+            job["cancel"].set()
+
+    def shutdown(self):
+        self.running = False
+        with self.lock:
+            jobs = list(self.pending.values()) + self._active()
+        for job in jobs:
+            job["cancel"].set()
+        for _ in self.runners:
+            self.jobs.put(None)
+
+    def wait(self):
+        for runner in self.runners:
+            runner.thread.join()
+            runner.warm_pool.close()
+
+
+def line_writer(stream):
+    """emit() for one client: JSON lines, serialized across threads, errors ignored."""
+    lock = threading.Lock()
+
+    def emit(event):
+        line = json.dumps(event) + "\n"
+        with lock:
+            try:
+                stream.write(line)
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+    return emit
+
+
+def read_requests(lines, service, emit):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            message = json.loads(line)
+        except ValueError as e:
+            emit({"type": "error", "message": f"Invalid JSON: {e}"})
+            continue
+        if not isinstance(message, dict):
+            emit({"type": "error", "message": "Request must be a JSON object"})
+            continue
+        service.handle(message, emit)
+        if not service.running:
+            return
+
+
+def serve_stdin(jobs=1):
+    # The protocol owns stdout through a private (non-inheritable) copy of the
+    # descriptor; fd 1 itself now points at stderr, so prints from this
+    # process, pool workers and ffmpeg cannot corrupt the event stream
+    sys.stdout.flush()
+    emit = line_writer(os.fdopen(os.dup(1), 'w', encoding='utf-8'))
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    # Forked pool workers close sys.stdin on start; if that is the stream this
+    # thread is blocked reading, they inherit its held lock and hang
+    requests = sys.stdin
+    sys.stdin = open(os.devnull, 'r')
+    service = GeneratorService(jobs)
+    emit({"type": "ready", "pid": os.getpid()})
+    read_requests(requests, service, emit)
+    # EOF (the server went away) or shutdown: stop whatever is still queued
+    if service.running:
+        service.shutdown()
+    service.wait()
+
+
+def serve_socket(path, jobs=1):
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("Unix sockets are not available on this platform; use --serve without --socket")
+    sys.stdout = sys.stderr
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    server.settimeout(0.5)
+    service = GeneratorService(jobs)
+    print(f"DEBUG: generator service listening on {path}")
+
+    def client(conn):
+        with conn, conn.makefile('r', encoding='utf-8') as reader, conn.makefile('w', encoding='utf-8') as writer:
+            emit = line_writer(writer)
+            emit({"type": "ready", "pid": os.getpid()})
+            read_requests(reader, service, emit)
+
+    try:
+        while service.running:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                continue
+            threading.Thread(target=client, args=(conn,), name="service-client", daemon=True).start()
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.remove(path)
+        service.wait()
@@ -0,0 +1,106 @@
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+# Final LANCZOS resizes first shrink by whole factors with reduce() while the
+# remaining downscale stays >= this gap (Pillow's reducing_gap).
+REDUCING_GAP = 3.0
+
+
+def reduced_decode_enabled(setting=None):
+    """settings.reducedDecode wins; otherwise REDUCED_DECODE env (default on)."""
+    if setting is not None:
+        return bool(setting)
+    return os.environ.get('REDUCED_DECODE', '1') not in ('0', 'false', 'no')
+
+
+def plan_decode_size(src_size, target_sizes):
+    """Smallest (w, h) a source must be decoded at to cover every target without upscaling.
+
+    Every output (preprocessed frame or panorama) scales the source with cover
+    semantics, max(tw / w, th / h), so the largest such scale over all targets
+    bounds the useful resolution. Returns None when no reduction is possible.
+    """
+    img_w, img_h = src_size
+    if not target_sizes or img_w <= 0 or img_h <= 0:
+        return None
+    scale = max(max(tw / img_w, th / img_h) for tw, th in target_sizes)
+    if scale >= 1.0:
+        return None
+    return (max(1, int(img_w * scale + 0.999)), max(1, int(img_h * scale + 0.999)))
+
+
+def open_reduced(image_path, target_sizes=None):
+    """Open a source as RGB, letting JPEG skip resolution no target needs (draft mode)."""
+    img = Image.open(image_path)
+    if target_sizes and img.format == 'JPEG':
+        needed = plan_decode_size(img.size, target_sizes)
+        if needed:
+            img.draft('RGB', needed)
+    return img.convert("RGB")
+
+
+def _cache_name(image_path):
+    digest = hashlib.sha1(os.path.abspath(image_path).encode('utf-8')).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    return f"src_{stem}_{digest}.npy"
+
+
+def decode_source(image_path, cache_dir, target_sizes=None):
+    """Decode one source photo to RGB and store it as a .npy file.
+
+    With `target_sizes`, JPEG decoding skips DCT detail that none of those
+    output sizes needs (see plan_decode_size).
+    """
+    with Image.open(image_path) as img:
+        original_size = img.size
+        needed = plan_decode_size(original_size, target_sizes) if target_sizes else None
+        if needed and img.format == 'JPEG':
+            img.draft('RGB', needed)
+        rgb = img.convert("RGB")
+    array = np.asarray(rgb)
+    npy_path = os.path.join(cache_dir, _cache_name(image_path))
+    tmp_path = npy_path + ".tmp"
+    with open(tmp_path, 'wb') as handle:
+        np.save(handle, array)
+    os.replace(tmp_path, npy_path)
+    return {
+        "npy": npy_path,
+        "size": original_size,
+        "decoded_size": (array.shape[1], array.shape[0]),
+    }
+
+
+def decode_sources(image_paths, cache_dir, target_sizes=None, max_workers=None):
+    """Decode every source once per job; returns {image_path: entry} for the format workers."""
+    if not image_paths:
+        return {}
+    os.makedirs(cache_dir, exist_ok=True)
+    configured = int(max_workers or os.environ.get('PREPROCESS_MAX_WORKERS', '2'))
+    max_workers = max(1, min(configured, len(image_paths)))
+    unique_paths = list(dict.fromkeys(image_paths))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {p: executor.submit(decode_source, p, cache_dir, target_sizes) for p in unique_paths}
+        return {p: future.result() for p, future in futures.items()}
+
+
+def load_source_array(entry):
+    """Read-only memory map of a decoded source; pages are shared between workers."""
+    return np.load(entry["npy"], mmap_mode='r')
+
+
+def open_source_image(image_path, entry=None, target_sizes=None):
+    """RGB PIL image for a source, from the shared decode when available."""
+    if entry:
+        return Image.fromarray(load_source_array(entry))
+    return open_reduced(image_path, target_sizes)
+
+
+def source_size(image_path, entry=None):
+    """Original (w, h) of a source without decoding pixels."""
+    if entry:
+        return tuple(entry["size"])
+    with Image.open(image_path) as img:
+        return img.size
@@ -0,0 +1,105 @@
+"""Structured render telemetry: one JSON object per event.
+
+Where events go, in order:
+- the pool's event queue when one is installed (generator service; relayed to
+  the client as {"type": "telemetry", "id": job, ...}),
+- the file descriptor in GENERATOR_TELEMETRY_FD (the Node server opens a pipe
+  as fd 3 for spawned generators; pool workers inherit it),
+- stderr as ::TELEMETRY::<json> lines when neither is available.
+
+Events (every event also carries "v", "pid" and "ts"):
+    {"event": "format", "format": "9x16", "size": [1080, 1920], "segment": 0 | null,
+     "outputs": [...], "frames": 360, "seconds": 12.4, "renderFps": 29.0, "encoder": "libx264",
+     "stages": {"preprocess", "clips", "transitions", "overlay", "audio", "encode"},
+     "writer": {"renderSeconds", "pipeSeconds", "stillFrames"}, "peakRssMB": 410, "encoderPeakRssMB": 95,
+     "cache": {"frames": {...}, "fonts": {...}, "staticFrames": {...}}}
+    {"event": "encode_failed", "format": "9x16", "segment": null, "codec": "h264_nvenc", "error": "..."}
+    {"event": "job", "seconds": 30.1, "formats": [...], "files": 4, "tasks": 4, "workers": 2,
+     "stages": {"setup", "audio", "decode", "plan", "render", "concat", "delivery"},
+     "preview": false, "encoders": [...], "cache": {"audio": "hit" | "miss" | null}, "peakRssMB": 220}
+
+Stage seconds are wall clock. moviepy clips are lazy, so frame compositing is
+part of "encode"; writer.renderSeconds is the share spent producing frames and
+writer.pipeSeconds the time blocked on ffmpeg (writer.stillFrames: frames
+ffmpeg looped from a single still instead). peakRssMB is the worker's peak
+since it started (warm pool workers keep theirs across jobs); encoderPeakRssMB
+is the pipelined writer's ffmpeg process (Linux /proc only).
+"""
+import os
+import sys
+import json
+import time
+from progress import event_queue
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TELEMETRY_VERSION = 1
+
+
+def _fd():
+    try:
+        return int(os.environ.get("GENERATOR_TELEMETRY_FD", ""))
+    except ValueError:
+        return None
+
+
+def envelope(event):
+    """Copy of event with the fields every event carries (v, pid, ts)."""
+    return dict(event, v=TELEMETRY_VERSION, pid=os.getpid(), ts=round(time.time(), 3))
+
+
+def emit(event):
+    event = envelope(event)
+    events = event_queue()
+    if events is not None:
+        try:
+            events.put_nowait(event)
+            return
+        except Exception:
+            pass
+    line = json.dumps(event, separators=(",", ":")) + "\n"
+    fd = _fd()
+    if fd is not None:
+        try:
+            # One write per event: lines under PIPE_BUF never interleave between workers
+            os.write(fd, line.encode("utf-8"))
+            return
+        except OSError:
+            pass
+    sys.stderr.write("::TELEMETRY::" + line)
+    sys.stderr.flush()
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process, None if unknown."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss / scale, 1)
+
+
+def hit_rate(hits, misses):
+    total = hits + misses
+    return round(hits / total, 3) if total else 0.0
+
+
+class StageTimer:
+    """Wall-clock seconds per stage: lap("name") books the time since the previous lap."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.stages = {}
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.stages[name] = round(self.stages.get(name, 0.0) + now - self._last, 3)
+        self._last = now
+
+    def elapsed(self):
+        return round(time.perf_counter() - self.started, 3)
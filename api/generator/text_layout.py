@@ -0,0 +1,237 @@
+import weakref
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
+
+# Advance/kerning sums can drift from a full textbbox by a pixel or so (hinting,
+# shaping). Candidates whose estimate lands this close to the limit are re-measured.
+EXACT_MARGIN_PX = 2.0
+
+_metrics_by_font = weakref.WeakKeyDictionary()
+_measure_draw = None
+
+
+def _get_measure_draw():
+    global _measure_draw
+    if _measure_draw is None:
+        _measure_draw = ImageDraw.Draw(Image.new('RGBA', (10, 10), (0, 0, 0, 0)))
+    return _measure_draw
+
+
+def is_georgian_char(ch):
+    return '\u10A0' <= ch <= '\u10FF'
+
+
+class GlyphMetrics:
+    """Per-font cache of glyph bboxes, advances and kerning pairs."""
+
+    def __init__(self, font):
+        self.font = font
+        self.draw = _get_measure_draw()
+        self._bbox = {}
+        self._advance = {}
+        self._kerning = {}
+        self.hits = 0
+        self.misses = 0
+
+    def bbox(self, ch):
+        value = self._bbox.get(ch)
+        if value is None:
+            self.misses += 1
+            value = self.draw.textbbox((0, 0), ch, font=self.font)
+            self._bbox[ch] = value
+        else:
+            self.hits += 1
+        return value
+
+    def width(self, ch):
+        bbox = self.bbox(ch)
+        return bbox[2] - bbox[0]
+
+    def advance(self, ch):
+        value = self._advance.get(ch)
+        if value is None:
+            try:
+                value = self.font.getlength(ch)
+            except Exception:
+                value = self.width(ch)
+            self._advance[ch] = value
+        return value
+
+    def kerning(self, left, right):
+        pair = left + right
+        value = self._kerning.get(pair)
+        if value is None:
+            try:
+                value = self.font.getlength(pair) - self.advance(left) - self.advance(right)
+            except Exception:
+                value = 0.0
+            self._kerning[pair] = value
+        return value
+
+    def text_width(self, value):
+        """Exact ink width of `value` as drawn in one call (same as textbbox)."""
+        bbox = self.draw.textbbox((0, 0), value, font=self.font)
+        return bbox[2] - bbox[0]
+
+    def measure(self, value, spacing):
+        """Width of `value`; per-glyph sum when letter spacing is applied."""
+        if spacing <= 0:
+            return self.text_width(value)
+        return sum(self.width(ch) for ch in value) + spacing * max(0, len(value) - 1)
+
+    def vertical_extent(self, value):
+        """(min_y, max_y) over the glyphs of `value`, for per-glyph spaced drawing."""
+        min_y = None
+        max_y = None
+        for ch in value:
+            bbox = self.bbox(ch)
+            min_y = bbox[1] if min_y is None else min(min_y, bbox[1])
+            max_y = bbox[3] if max_y is None else max(max_y, bbox[3])
+        return (min_y or 0), (max_y or 0)
+
+
+def get_glyph_metrics(font):
+    metrics = _metrics_by_font.get(font)
+    if metrics is None:
+        metrics = GlyphMetrics(font)
+        _metrics_by_font[font] = metrics
+    return metrics
+
+
+class _LineState:
+    """Running width of the line being built, so each added glyph costs O(1)."""
+
+    def __init__(self, metrics_for, spacing, georgian=False):
+        self.metrics_for = metrics_for
+        self.spacing = spacing
+        self.georgian = georgian
+        self.metrics = metrics_for(georgian)
+        self.text = ''
+        self.pen = 0.0
+        self.ink = 0
+
+    def _replay_as_georgian(self):
+        # The font follows the script of the whole line, so once a Georgian glyph
+        # joins, the prefix has to be re-measured with the Georgian font.
+        state = _LineState(self.metrics_for, self.spacing, georgian=True)
+        for ch in self.text:
+            state.append(ch)
+        return state
+
+    def estimate(self, ch):
+        """(metrics, estimated width) of the line with `ch` appended."""
+        if not self.georgian and is_georgian_char(ch):
+            return self._replay_as_georgian().estimate(ch)
+        metrics = self.metrics
+        if self.spacing > 0:
+            return metrics, self.ink + metrics.width(ch) + self.spacing * len(self.text)
+        origin = self.pen + metrics.kerning(self.text[-1], ch)
+        return metrics, origin + metrics.bbox(ch)[2] - metrics.bbox(self.text[0])[0]
+
+    def append(self, ch):
+        if not self.georgian and is_georgian_char(ch):
+            replay = self._replay_as_georgian()
+            self.georgian = True
+            self.metrics = replay.metrics
+            self.pen = replay.pen
+            self.ink = replay.ink
+        metrics = self.metrics
+        if self.spacing > 0:
+            self.ink += metrics.width(ch)
+        else:
+            if self.text:
+                self.pen += metrics.kerning(self.text[-1], ch)
+            self.pen += metrics.advance(ch)
+        self.text += ch
+
+
+def wrap_by_chars(value, metrics_for, spacing, max_width):
+    """Greedy per-character wrap; same breaks as re-measuring every prefix.
+
+    `metrics_for(georgian)` returns the GlyphMetrics used for a line with or
+    without Georgian glyphs. Widths are tracked incrementally and only
+    candidates within EXACT_MARGIN_PX of `max_width` get a full textbbox, so
+    wrapping stays linear in caption length.
+    """
+    lines = []
+    state = _LineState(metrics_for, spacing)
+    for ch in value:
+        if not state.text:
+            state.append(ch)
+            continue
+        metrics, width = state.estimate(ch)
+        if spacing <= 0 and abs(width - max_width) <= EXACT_MARGIN_PX:
+            width = metrics.text_width(state.text + ch)
+        if width <= max_width:
+            state.append(ch)
+        else:
+            lines.append(state.text)
+            state = _LineState(metrics_for, spacing)
+            state.append(ch)
+    if state.text:
+        lines.append(state.text)
+    return lines
+
+
+def wrap_text(value, metrics_for, spacing, max_width):
+    """Two words per line, falling back to character wrapping for lines that overflow."""
+    words = value.split()
+    if not words:
+        return []
+    lines = []
+    for i in range(0, len(words), 2):
+        lines.append(" ".join(words[i:i + 2]))
+    normalized = []
+    for line in lines:
+        metrics = metrics_for(any(is_georgian_char(ch) for ch in line))
+        if metrics.measure(line, spacing) <= max_width:
+            normalized.append(line)
+        else:
+            normalized.extend(wrap_by_chars(line, metrics_for, spacing, max_width))
+    return normalized
+
+
+def draw_text_mask(size, value, start_x, start_y, font, spacing, pad=0):
+    """Coverage mask ('L') of `value` drawn once, on a canvas grown by `pad` on every side."""
+    width, height = size
+    mask = Image.new('L', (width + 2 * pad, height + 2 * pad), 0)
+    draw = ImageDraw.Draw(mask)
+    if spacing <= 0:
+        draw.text((start_x + pad, start_y + pad), value, font=font, fill=255)
+        return mask
+    metrics = get_glyph_metrics(font)
+    current_x = start_x + pad
+    for ch in value:
+        draw.text((current_x, start_y + pad), ch, font=font, fill=255)
+        current_x += metrics.width(ch) + spacing
+    return mask
+
+
+def dilate_alpha(mask, radius):
+    """Union of `mask` shifted to every offset in a (2r+1)² square.
+
+    Drawing the same glyphs at each offset composites coverage as
+    1 - prod(1 - a); the product is separable, so it is done as one
+    horizontal and one vertical pass. `mask` is padded by `radius`, the result is not.
+    """
+    inv = 1.0 - np.asarray(mask, dtype=np.float32) * (1.0 / 255.0)
+    out_h = inv.shape[0] - 2 * radius
+    out_w = inv.shape[1] - 2 * radius
+    rows = inv[:, 0:out_w].copy()
+    for dx in range(1, 2 * radius + 1):
+        rows *= inv[:, dx:dx + out_w]
+    acc = rows[0:out_h].copy()
+    for dy in range(1, 2 * radius + 1):
+        acc *= rows[dy:dy + out_h]
+    return ((1.0 - acc) * 255.0 + 0.5).astype(np.uint8)
+
+
+def stroke_layer(size, value, start_x, start_y, font, spacing, radius, stroke_fill):
+    """RGBA outline for `value`: one rasterization plus a dilation of its alpha."""
+    mask = draw_text_mask(size, value, start_x, start_y, font, spacing, pad=radius)
+    alpha = dilate_alpha(mask, radius)
+    layer = np.zeros((alpha.shape[0], alpha.shape[1], 4), dtype=np.uint8)
+    covered = alpha > 0
+    layer[covered, :3] = ImageColor.getrgb(stroke_fill)[:3]
+    layer[..., 3] = alpha
+    return Image.fromarray(layer, 'RGBA')
@@ -0,0 +1,112 @@
+import bisect
+import threading
+
+# Keep lookups away from the exact clip boundaries, where moviepy's
+# concatenation may resolve t to either neighbour.
+BOUNDARY_EPSILON = 1e-4
+
+
+def build_segments(parts):
+    """Timeline of the slideshow as a list of segment dicts.
+
+    `parts` are (kind, index, duration, static) tuples in playback order, where
+    kind is 'body' or 'transition' and static means every frame in the range
+    is identical (a still body under a static overlay).
+    """
+    segments = []
+    current = 0.0
+    for kind, index, duration, is_static in parts:
+        segments.append({
+            "kind": kind,
+            "index": index,
+            "start": current,
+            "end": current + duration,
+            "static": bool(is_static),
+        })
+        current += duration
+    return segments
+
+
+class StaticFrameCache:
+    """Clip filter that computes one frame per static range and reuses it.
+
+    Only the most recent range is kept, so memory stays at one frame.
+    """
+
+    def __init__(self, segments):
+        ranges = [
+            (seg["start"] + BOUNDARY_EPSILON, seg["end"] - BOUNDARY_EPSILON)
+            for seg in segments
+            if seg["static"] and seg["end"] - seg["start"] > 2 * BOUNDARY_EPSILON
+        ]
+        self.starts = [start for start, _ in ranges]
+        self.ranges = ranges
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._cached_range = None
+        self._cached_frame = None
+
+    def range_for(self, t):
+        pos = bisect.bisect_right(self.starts, t) - 1
+        if pos < 0:
+            return None
+        start, end = self.ranges[pos]
+        return pos if t < end else None
+
+    def __call__(self, get_frame, t):
+        pos = self.range_for(t)
+        if pos is None:
+            return get_frame(t)
+        with self._lock:
+            if self._cached_range == pos:
+                self.hits += 1
+                return self._cached_frame
+        frame = get_frame(t)
+        with self._lock:
+            self.misses += 1
+            self._cached_range = pos
+            self._cached_frame = frame
+        return frame
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "static_ranges": len(self.ranges),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+def reuse_static_frames(clip, segments):
+    """Wrap `clip` so frames inside static segments are computed once per segment."""
+    cache = StaticFrameCache(segments)
+    if not cache.ranges:
+        return clip, cache
+    return clip.fl(cache), cache
+
+
+def still_runs(segments, times, first_frame=0, min_frames=1):
+    """Frames as (start, end, static) index runs; times[k] is the time of frame first_frame + k.
+
+    A static run covers frames that all fall inside one static segment, so a
+    single rendered frame stands for the whole run; static runs shorter than
+    min_frames are folded into the neighbouring dynamic runs.
+    """
+    lookup = StaticFrameCache(segments)
+    runs = []
+    for index, t in enumerate(times, start=first_frame):
+        pos = lookup.range_for(t)
+        if runs and runs[-1][2] == pos:
+            runs[-1][1] = index + 1
+        else:
+            runs.append([index, index + 1, pos])
+    merged = []
+    for start, end, pos in runs:
+        static = pos is not None and end - start >= min_frames
+        if merged and not static and not merged[-1][2]:
+            merged[-1] = (merged[-1][0], end, False)
+        else:
+            merged.append((start, end, static))
+    return merged
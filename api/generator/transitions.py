@@ -1,6 +1,20 @@
+import threading
 import numpy as np
 from moviepy.editor import CompositeVideoClip, VideoClip, ImageClip
 from PIL import Image
+from masks import get_mask_geometry
+
+
+def mask_buffers(geometry):
+    """Per-thread mask buffer for one transition clip: frame producer threads
+    render frames of the same clip concurrently, so they cannot share one."""
+    local = threading.local()
+
+    def buffer():
+        if not hasattr(local, 'mask'):
+            local.mask = geometry.new_buffer()
+        return local.mask
+    return buffer
 
 def slide_transition(clip1, clip2, duration=1.0, direction='left'):
     w, h = clip1.size
@@ -50,22 +64,11 @@ def wipe_transition(clip1, clip2, duration=1.0, direction='left'):
     c1 = clip1.set_duration(duration)
     c2 = clip2.set_duration(duration)
     
+    geometry = get_mask_geometry(w, h)
+    mask = mask_buffers(geometry)
+
     def make_mask_frame(t):
-        progress = t / duration
-        mask = np.zeros((h, w), dtype=float)
-        if direction == 'left': # Reveal from right
-            start_x = int(w * (1 - progress))
-            mask[:, start_x:] = 1.0
-        elif direction == 'right':
-            end_x = int(w * progress)
-            mask[:, :end_x] = 1.0
-        elif direction == 'up':
-            start_y = int(h * (1 - progress))
-            mask[start_y:, :] = 1.0
-        elif direction == 'down':
-            end_y = int(h * progress)
-            mask[:end_y, :] = 1.0
-        return mask
+        return geometry.wipe(direction, t / duration, mask())
 
     mask_clip = VideoClip(make_mask_frame, duration=duration, ismask=True)
     c2_masked = c2.set_mask(mask_clip)
@@ -76,23 +79,12 @@ def circle_transition(clip1, clip2, duration=1.0, mode='open'):
     c1 = clip1.set_duration(duration)
     c2 = clip2.set_duration(duration)
     
-    max_radius = np.sqrt((w/2)**2 + (h/2)**2)
+    geometry = get_mask_geometry(w, h)
+    mask = mask_buffers(geometry)
 
     def make_mask_frame(t):
-        progress = t / duration
-        Y, X = np.ogrid[:h, :w]
-        dist_sq = (X - w/2)**2 + (Y - h/2)**2
-        
-        if mode == 'open':
-            # Reveal c2 from center
-            r = max_radius * progress
-            mask = (dist_sq <= r**2).astype(float)
-        else: 
-            # Close c2 from edges
-            r = max_radius * (1 - progress)
-            mask = (dist_sq >= r**2).astype(float)
-            
-        return mask
+        # open: reveal c2 from center, close: c2 closes in from edges
+        return geometry.circle(mode, t / duration, mask())
 
     mask_clip = VideoClip(make_mask_frame, duration=duration, ismask=True)
     c2_masked = c2.set_mask(mask_clip)
@@ -172,12 +164,13 @@ def page_curl_transition(clip1, clip2, duration=1.0):
     c1 = clip1.set_duration(duration)
     c2 = clip2.set_duration(duration)
     
+    geometry = get_mask_geometry(w, h)
+    mask = mask_buffers(geometry)
+
     def make_mask(t):
         p = t / duration
         limit = (w + h) * (1 - p * 1.5) + (w+h)*0.25
-        Y, X = np.ogrid[:h, :w]
-        mask = (X + Y < limit).astype(float)
-        return mask
+        return geometry.page_curl(limit, mask())
         
     mask_clip = VideoClip(make_mask, duration=duration, ismask=True)
     c1_masked = c1.set_mask(mask_clip)
@@ -188,13 +181,11 @@ def ripple_transition(clip1, clip2, duration=1.0):
     c1 = clip1.set_duration(duration)
     c2 = clip2.set_duration(duration)
     
+    geometry = get_mask_geometry(w, h)
+    mask = mask_buffers(geometry)
+
     def make_mask(t):
-        p = t / duration
-        Y, X = np.ogrid[:h, :w]
-        limit = w * p
-        wave = 20 * np.sin(Y / 20.0 + t * 10)
-        mask = (X < (limit + wave)).astype(float)
-        return mask
+        return geometry.ripple(t / duration, t, mask())
         
     mask_clip = VideoClip(make_mask, duration=duration, ismask=True)
     c2_masked = c2.set_mask(mask_clip)
@@ -0,0 +1,115 @@
+/**
+ * Client for the warm python generator service (`generator.py --serve`).
+ * Jobs are written to its stdin as JSON lines; progress and results come back
+ * on stdout as JSON lines (see api/generator/service.py for the protocol).
+ */
+import { spawn, type ChildProcessWithoutNullStreams } from 'child_process';
+import readline from 'readline';
+import type { TelemetryEvent } from './telemetry.js';
+
+export type GeneratorEvent = {
+  type: string;
+  id?: string;
+  format?: string;
+  percent?: number;
+  status?: 'success' | 'error' | 'canceled';
+  files?: string[];
+  message?: string;
+  pid?: number;
+};
+
+export type GeneratorJobRequest = {
+  id: string;
+  images: string[];
+  propertyId: string;
+  output: string;
+  settings: unknown;
+};
+
+type JobHandlers = {
+  onProgress: (format: string, percent: number) => void;
+  onTelemetry?: (event: TelemetryEvent) => void;
+  onResult: (event: GeneratorEvent) => void;
+};
+
+export class GeneratorService {
+  private child?: ChildProcessWithoutNullStreams;
+  private handlers = new Map<string, JobHandlers>();
+
+  constructor(private command: string, private args: string[]) {}
+
+  private start() {
+    console.log(`Starting generator service: ${this.command} ${[...this.args, '--serve'].join(' ')}`);
+    const child = spawn(this.command, [...this.args, '--serve']);
+    this.child = child;
+
+    readline.createInterface({ input: child.stdout }).on('line', (line) => {
+      let event: GeneratorEvent;
+      try {
+        event = JSON.parse(line);
+      } catch {
+        console.log(`[Generator] ${line}`);
+        return;
+      }
+      this.dispatch(event);
+    });
+    readline.createInterface({ input: child.stderr }).on('line', (line) => {
+      if (line.trim()) console.error(`[Generator ERR] ${line.trim()}`);
+    });
+
+    const fail = (reason: string) => {
+      if (this.child !== child) return;
+      this.child = undefined;
+      // Jobs still in flight die with the service; the next submit restarts it
+      for (const [id, handlers] of this.handlers) {
+        handlers.onResult({ type: 'result', id, status: 'error', message: reason });
+      }
+      this.handlers.clear();
+    };
+    child.on('error', (err) => fail(`Generator service failed: ${err.message}`));
+    child.on('exit', (code, signal) => fail(`Generator service exited (code ${code}, signal ${signal})`));
+  }
+
+  private dispatch(event: GeneratorEvent) {
+    if (event.type === 'ready') {
+      console.log(`Generator service ready (pid ${event.pid})`);
+      return;
+    }
+    const handlers = event.id ? this.handlers.get(event.id) : undefined;
+    if (!handlers) {
+      if (event.type === 'error') console.error(`[Generator] ${event.message}`);
+      return;
+    }
+    if (event.type === 'progress' && event.format !== undefined && event.percent !== undefined) {
+      handlers.onProgress(event.format, event.percent);
+    } else if (event.type === 'telemetry') {
+      handlers.onTelemetry?.(event as unknown as TelemetryEvent);
+    } else if (event.type === 'result') {
+      this.handlers.delete(event.id!);
+      handlers.onResult(event);
+    } else if (event.type === 'error') {
+      this.handlers.delete(event.id!);
+      handlers.onResult({ ...event, type: 'result', status: 'error' });
+    }
+  }
+
+  private send(message: object) {
+    if (!this.child) this.start();
+    this.child!.stdin.write(JSON.stringify(message) + '\n');
+  }
+
+  submit(job: GeneratorJobRequest, handlers: JobHandlers) {
+    this.handlers.set(job.id, handlers);
+    this.send({ type: 'job', ...job });
+  }
+
+  cancel(id: string) {
+    if (this.child && this.handlers.has(id)) this.send({ type: 'cancel', id });
+  }
+
+  stop() {
+    if (!this.child) return;
+    this.child.stdin.write(JSON.stringify({ type: 'shutdown' }) + '\n');
+    this.child.stdin.end();
+  }
+}
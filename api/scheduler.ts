@@ -0,0 +1,302 @@
+/**
+ * Resource-aware job scheduler for the render queue.
+ *
+ * Several jobs run at once as long as the cores and memory granted to them
+ * fit the machine's budget. Each job's grant is passed to the generator as
+ * cpuBudget / memoryBudgetMB so its own resource plan stays inside it.
+ *
+ * Ordering: priority first (previews before finals), then round-robin
+ * across owners (fewest running jobs, least recently served), then FIFO.
+ * Smaller jobs may backfill past a head job that does not fit yet, until
+ * that head has waited longer than maxWaitMs. A job starts once it can get
+ * its useful cores or a fair share (cores / maxJobs), whichever is fewer.
+ */
+import os from 'os';
+
+export type JobPriority = 'high' | 'normal' | 'low';
+
+const PRIORITY_RANK: Record<JobPriority, number> = { high: 0, normal: 1, low: 2 };
+
+// Output sizes and platform defaults, as in api/generator/generator.py
+const FORMAT_SIZES: Record<string, [number, number]> = {
+  '9x16': [1080, 1920],
+  '1x1': [1080, 1080],
+  '4x5': [1080, 1350],
+  '16x9': [1920, 1080],
+};
+const DEFAULT_FORMATS: Record<string, string> = {
+  tiktok: '9x16',
+  instagram: '4x5',
+  facebook: '1x1',
+  youtube: '16x9',
+};
+
+// renderProfile "preview" defaults (generator.PREVIEW_RESOLUTION / PREVIEW_FPS)
+const PREVIEW_RESOLUTION = 360;
+const PREVIEW_FPS = 12;
+
+// Per-worker memory model, mirrored from api/generator/resources.py
+const BASE_WORKER_MB = 300;
+const EXTRA_FRAMES = 8;
+const ENCODER_FRAMES = 16;
+// Shortest time segment worth its own worker (segments.MIN_CHUNK_SECONDS)
+const MIN_CHUNK_SECONDS = 2;
+
+export type CostSettings = {
+  fps?: number;
+  secondsPerImage?: number;
+  transition?: string;
+  transitionDuration?: number;
+  platforms?: Record<string, boolean>;
+  formats?: Record<string, string>;
+  frameHandoff?: string;
+  renderProfile?: string;
+  previewResolution?: number;
+  previewFps?: number;
+};
+
+export type JobCost = {
+  formats: string[];
+  videoSeconds: number;
+  // Megapixels x frames over all formats: the work the job has to render
+  work: number;
+  // Most cores the job can keep busy (one worker per format time segment)
+  usefulCores: number;
+  // Estimated peak memory of one worker for the job's largest format
+  workerMemoryMB: number;
+};
+
+export function estimateJobCost(imageCount: number, settings: CostSettings, cores: number): JobCost {
+  const preview = settings.renderProfile === 'preview';
+  let fps = Number(settings.fps) || 30;
+  if (preview) fps = Math.min(fps, Number(settings.previewFps) || PREVIEW_FPS);
+  const secondsPerImage = Number(settings.secondsPerImage) || 3;
+  let transitionDuration = Number(settings.transitionDuration ?? 0.8);
+  if (secondsPerImage <= transitionDuration) transitionDuration = Math.max(0.1, secondsPerImage / 2);
+  const transitions = (settings.transition ?? 'cut') === 'cut' ? 0 : Math.max(0, imageCount - 1);
+  const videoSeconds = imageCount * secondsPerImage + transitions * transitionDuration;
+
+  const formats = new Set<string>();
+  for (const [platform, enabled] of Object.entries(settings.platforms ?? {})) {
+    if (!enabled) continue;
+    const fmt = settings.formats?.[platform] ?? DEFAULT_FORMATS[platform];
+    if (fmt && FORMAT_SIZES[fmt]) formats.add(fmt);
+  }
+  if (formats.size === 0) formats.add('9x16');
+
+  let work = 0;
+  let workerMemoryMB = 0;
+  const photos = settings.frameHandoff === 'jpeg' ? 0 : imageCount;
+  for (const fmt of formats) {
+    let [w, h] = FORMAT_SIZES[fmt];
+    if (preview) {
+      const scale = Math.min(1, (Number(settings.previewResolution) || PREVIEW_RESOLUTION) / Math.min(w, h));
+      w = Math.round(w * scale);
+      h = Math.round(h * scale);
+    }
+    work += (w * h / 1e6) * fps * videoSeconds;
+    const bytes = w * h * 3 * (photos + EXTRA_FRAMES) + w * h * 1.5 * ENCODER_FRAMES;
+    workerMemoryMB = Math.max(workerMemoryMB, BASE_WORKER_MB + bytes / (1024 * 1024));
+  }
+  const segments = Math.max(1, Math.floor(videoSeconds / MIN_CHUNK_SECONDS));
+  const usefulCores = Math.max(1, Math.min(cores, formats.size * segments));
+  return {
+    formats: [...formats],
+    videoSeconds: Math.round(videoSeconds * 10) / 10,
+    work: Math.round(work),
+    usefulCores,
+    workerMemoryMB: Math.round(workerMemoryMB),
+  };
+}
+
+export type Admission = {
+  id: string;
+  cores: number;
+  memoryMB: number;
+  waitedMs: number;
+  reason: string;
+};
+
+type Entry = {
+  id: string;
+  owner: string;
+  priority: JobPriority;
+  cost: JobCost;
+  enqueuedAt: number;
+  lastDecision?: string;
+};
+
+type Running = Entry & { admission: Admission; startedAt: number };
+
+export type SchedulerOptions = {
+  cores?: number;
+  memoryMB?: number;
+  maxJobs?: number;
+  maxWaitMs?: number;
+};
+
+export class JobScheduler {
+  readonly cores: number;
+  readonly memoryMB: number;
+  readonly maxJobs: number;
+  readonly maxWaitMs: number;
+  // Cores that normal/low jobs leave free so a preview can start right away
+  readonly reservedCores: number;
+
+  private queue: Entry[] = [];
+  private running = new Map<string, Running>();
+  private lastServed = new Map<string, number>();
+  private serveCounter = 0;
+  private totals = { admitted: 0, completed: 0, waitMs: 0, runMs: 0 };
+
+  constructor(options: SchedulerOptions = {}) {
+    this.cores = Math.max(1, options.cores ?? os.cpus().length);
+    this.memoryMB = Math.max(256, options.memoryMB ?? Math.floor(os.totalmem() / (1024 * 1024) * 0.75));
+    this.maxJobs = Math.max(1, options.maxJobs ?? Math.max(1, Math.floor(this.cores / 2)));
+    this.maxWaitMs = options.maxWaitMs ?? 120_000;
+    this.reservedCores = Math.floor(this.cores / 4);
+  }
+
+  enqueue(id: string, owner: string, priority: JobPriority, cost: JobCost) {
+    this.queue.push({ id, owner, priority, cost, enqueuedAt: Date.now() });
+  }
+
+  /** Drop a queued job (canceled before it started). */
+  remove(id: string) {
+    this.queue = this.queue.filter((entry) => entry.id !== id);
+  }
+
+  /** A running job finished (any status); frees its grant. */
+  release(id: string) {
+    const job = this.running.get(id);
+    if (!job) return;
+    this.running.delete(id);
+    this.totals.completed += 1;
+    this.totals.runMs += Date.now() - job.startedAt;
+  }
+
+  private used() {
+    let cores = 0;
+    let memoryMB = 0;
+    for (const job of this.running.values()) {
+      cores += job.admission.cores;
+      memoryMB += job.admission.memoryMB;
+    }
+    return { cores, memoryMB };
+  }
+
+  private ordered(): Entry[] {
+    const runningByOwner = new Map<string, number>();
+    for (const job of this.running.values()) {
+      runningByOwner.set(job.owner, (runningByOwner.get(job.owner) ?? 0) + 1);
+    }
+    return [...this.queue].sort((a, b) =>
+      PRIORITY_RANK[a.priority] - PRIORITY_RANK[b.priority]
+      || (runningByOwner.get(a.owner) ?? 0) - (runningByOwner.get(b.owner) ?? 0)
+      || (this.lastServed.get(a.owner) ?? -1) - (this.lastServed.get(b.owner) ?? -1)
+      || a.enqueuedAt - b.enqueuedAt);
+  }
+
+  /** Grant for a job if it can start now, otherwise the reason it waits. */
+  private fit(entry: Entry): Admission | string {
+    if (this.running.size >= this.maxJobs) return `waiting: ${this.maxJobs} jobs already running`;
+    const waitedMs = Date.now() - entry.enqueuedAt;
+    if (this.running.size === 0) {
+      // An idle machine always takes the next job, however large
+      const cores = Math.min(entry.cost.usefulCores, this.cores);
+      return { id: entry.id, cores, memoryMB: cores * entry.cost.workerMemoryMB, waitedMs, reason: 'idle machine' };
+    }
+    const used = this.used();
+    const reserve = entry.priority === 'high' ? 0 : this.reservedCores;
+    const freeCores = this.cores - reserve - used.cores;
+    const freeMemoryMB = this.memoryMB - used.memoryMB;
+    const memoryCores = Math.floor(freeMemoryMB / entry.cost.workerMemoryMB);
+    const cores = Math.min(entry.cost.usefulCores, freeCores, memoryCores);
+    if (freeCores < 1) return `waiting for cores (${used.cores}/${this.cores} granted, ${reserve} reserved for previews)`;
+    if (memoryCores < 1) return `waiting for memory (${used.memoryMB}/${this.memoryMB} MB granted)`;
+    // A grant holds for the whole job: rather than start a big job on a sliver
+    // of the machine, wait for a fair share (unless it has waited long enough)
+    const fairShare = Math.min(entry.cost.usefulCores, Math.max(1, Math.floor(this.cores / this.maxJobs)));
+    if (cores < fairShare && waitedMs <= this.maxWaitMs) {
+      return `waiting for ${fairShare} cores (${cores} free now)`;
+    }
+    return {
+      id: entry.id,
+      cores,
+      memoryMB: cores * entry.cost.workerMemoryMB,
+      waitedMs,
+      reason: `${cores} of ${entry.cost.usefulCores} useful cores free`,
+    };
+  }
+
+  /** Admit every job that fits now; returns their grants in start order. */
+  admit(): Admission[] {
+    const admitted: Admission[] = [];
+    for (;;) {
+      const ordered = this.ordered();
+      if (ordered.length === 0) break;
+      let next: Admission | undefined;
+      for (const [index, entry] of ordered.entries()) {
+        const result = this.fit(entry);
+        if (typeof result !== 'string') {
+          next = result;
+          break;
+        }
+        entry.lastDecision = result;
+        // No backfilling past a head that has waited too long, or it could starve
+        if (index === 0 && Date.now() - entry.enqueuedAt > this.maxWaitMs) break;
+      }
+      if (!next) break;
+      const entry = this.queue.find((e) => e.id === next!.id)!;
+      this.queue = this.queue.filter((e) => e.id !== entry.id);
+      this.running.set(entry.id, { ...entry, admission: next, startedAt: Date.now() });
+      this.lastServed.set(entry.owner, ++this.serveCounter);
+      this.totals.admitted += 1;
+      this.totals.waitMs += next.waitedMs;
+      admitted.push(next);
+    }
+    return admitted;
+  }
+
+  /** Queue position and scheduler decision for one job (undefined when unknown). */
+  describe(id: string) {
+    const running = this.running.get(id);
+    if (running) {
+      return { state: 'running', priority: running.priority, owner: running.owner, cost: running.cost, admission: running.admission };
+    }
+    const ordered = this.ordered();
+    const position = ordered.findIndex((entry) => entry.id === id);
+    if (position < 0) return undefined;
+    const entry = ordered[position];
+    return {
+      state: 'queued',
+      priority: entry.priority,
+      owner: entry.owner,
+      cost: entry.cost,
+      queuePosition: position,
+      waitingMs: Date.now() - entry.enqueuedAt,
+      decision: entry.lastDecision,
+    };
+  }
+
+  stats() {
+    const used = this.used();
+    return {
+      capacity: { cores: this.cores, memoryMB: this.memoryMB, maxJobs: this.maxJobs, reservedCores: this.reservedCores },
+      used,
+      running: [...this.running.values()].map((job) => ({
+        id: job.id, owner: job.owner, priority: job.priority, cores: job.admission.cores,
+        memoryMB: job.admission.memoryMB, runningMs: Date.now() - job.startedAt,
+      })),
+      queued: this.ordered().map((entry, position) => ({
+        id: entry.id, owner: entry.owner, priority: entry.priority, position,
+        waitingMs: Date.now() - entry.enqueuedAt, work: entry.cost.work, decision: entry.lastDecision,
+      })),
+      totals: {
+        ...this.totals,
+        avgWaitMs: this.totals.admitted ? Math.round(this.totals.waitMs / this.totals.admitted) : 0,
+        avgRunMs: this.totals.completed ? Math.round(this.totals.runMs / this.totals.completed) : 0,
+      },
+    };
+  }
+}
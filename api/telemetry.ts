@@ -0,0 +1,123 @@
+/**
+ * Generator telemetry collected per job.
+ *
+ * The generator reports JSON events (see api/generator/telemetry.py): one
+ * "format" event per render task (a format, a time segment of one, or a
+ * multi-output family), "encode_failed" for encoder fallbacks and one "job"
+ * event at the end. Spawned generators write them to fd 3 (stderr
+ * ::TELEMETRY:: lines where fd 3 is unavailable); the warm service sends them
+ * as {"type": "telemetry"} events.
+ */
+
+export const TELEMETRY_FD = 3;
+const LINE_PREFIX = '::TELEMETRY::';
+// Events kept per job; a job has one format event per task, so this is generous
+const MAX_EVENTS = 256;
+
+export type TelemetryEvent = {
+  event: string;
+  format?: string;
+  segment?: number | null;
+  outputs?: string[];
+  frames?: number;
+  seconds?: number;
+  encoder?: string;
+  codec?: string;
+  error?: string;
+  stages?: Record<string, number>;
+  writer?: { renderSeconds?: number; pipeSeconds?: number; stillFrames?: number } | null;
+  peakRssMB?: number | null;
+  encoderPeakRssMB?: number | null;
+  cache?: Record<string, unknown>;
+  [key: string]: unknown;
+};
+
+export type FormatSummary = {
+  tasks: number;
+  frames: number;
+  // Longest task: segments of one format run side by side
+  seconds: number;
+  renderFps: number;
+  encoders: string[];
+  stages: Record<string, number>;
+  peakRssMB?: number;
+  encoderPeakRssMB?: number;
+  frameCacheHitRate?: number;
+};
+
+export type JobTelemetry = {
+  job?: TelemetryEvent;
+  formats: TelemetryEvent[];
+  encodeFailures: TelemetryEvent[];
+};
+
+export function emptyTelemetry(): JobTelemetry {
+  return { formats: [], encodeFailures: [] };
+}
+
+/** A telemetry event from one output line (fd 3 JSON or a ::TELEMETRY:: stderr line). */
+export function parseTelemetryLine(line: string): TelemetryEvent | undefined {
+  const start = line.indexOf(LINE_PREFIX);
+  const json = start >= 0 ? line.slice(start + LINE_PREFIX.length) : line;
+  if (!json.trim()) return undefined;
+  try {
+    const event = JSON.parse(json);
+    return event && typeof event.event === 'string' ? event : undefined;
+  } catch {
+    return undefined;
+  }
+}
+
+export function recordTelemetry(telemetry: JobTelemetry, event: TelemetryEvent) {
+  if (event.event === 'job') {
+    telemetry.job = event;
+  } else if (event.event === 'format') {
+    if (telemetry.formats.length < MAX_EVENTS) telemetry.formats.push(event);
+  } else if (event.event === 'encode_failed') {
+    if (telemetry.encodeFailures.length < MAX_EVENTS) telemetry.encodeFailures.push(event);
+  }
+}
+
+const maxOf = (values: (number | null | undefined)[]) => {
+  const known = values.filter((v): v is number => typeof v === 'number');
+  return known.length ? Math.max(...known) : undefined;
+};
+
+/** Per-format totals over a job's format events (segments and family outputs folded in). */
+export function summarizeTelemetry(telemetry: JobTelemetry): Record<string, FormatSummary> {
+  const summary: Record<string, FormatSummary> = {};
+  const grouped = new Map<string, TelemetryEvent[]>();
+  for (const event of telemetry.formats) {
+    const key = (event.outputs ?? [event.format ?? 'unknown']).join('+');
+    grouped.set(key, [...(grouped.get(key) ?? []), event]);
+  }
+  for (const [key, events] of grouped) {
+    const stages: Record<string, number> = {};
+    let hits = 0;
+    let lookups = 0;
+    for (const event of events) {
+      for (const [stage, seconds] of Object.entries(event.stages ?? {})) {
+        stages[stage] = Math.round(((stages[stage] ?? 0) + seconds) * 1000) / 1000;
+      }
+      const frames = event.cache?.frames as { hits?: number; misses?: number } | undefined;
+      if (frames) {
+        hits += frames.hits ?? 0;
+        lookups += (frames.hits ?? 0) + (frames.misses ?? 0);
+      }
+    }
+    const frames = events.reduce((sum, event) => sum + (event.frames ?? 0), 0);
+    const seconds = maxOf(events.map((event) => event.seconds)) ?? 0;
+    summary[key] = {
+      tasks: events.length,
+      frames,
+      seconds,
+      renderFps: seconds ? Math.round((frames / seconds) * 100) / 100 : 0,
+      encoders: [...new Set(events.map((event) => event.encoder).filter((e): e is string => !!e))],
+      stages,
+      peakRssMB: maxOf(events.map((event) => event.peakRssMB)),
+      encoderPeakRssMB: maxOf(events.map((event) => event.encoderPeakRssMB)),
+      frameCacheHitRate: lookups ? Math.round((hits / lookups) * 1000) / 1000 : undefined,
+    };
+  }
+  return summary;
+}